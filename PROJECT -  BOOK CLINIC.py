@@ -4,24 +4,21 @@ from tkcalendar import DateEntry
 from PIL import Image, ImageTk
 import json
 import os
-from datetime import datetime
-
-users = {}
+import queue
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+import clinic_trace
+import clinic_watchdog
+from clinic_service import BookingService, BookingError
+from clinic_storage import parse_appointment_date
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-
-USERS_FILE = os.path.join(BASE_DIR, "booking_data", "users.txt")
-BOOKINGS_FILE = os.path.join(BASE_DIR, "booking_data", "bookings.txt")
-FORGOT_PASSWORD_FILE = os.path.join(BASE_DIR, "booking_data", "forgot_password.txt")
-CANCELLATIONS_FILE = os.path.join(BASE_DIR, "booking_data", "cancellations.txt")
-
-services = {    
-    "Dental Cleaning": 1000,
-    "Physical Therapy": 1500,
-    "Eye Check-up": 1000
-}
+BOOKING_ROW_HEIGHT = 250
 
 MAIN_BG = "#00B7FF"
 CARD_BG = "#FFFFFF"
@@ -29,362 +26,434 @@ ACCENT = "#FF0000"
 BUTTON_COLOR = "#FF8BA7"
 TEXT_COLOR = "#4A4A4A"
 
+IMAGE_CACHE_MAX_BYTES = 96 * 1024 * 1024
+IMAGE_LOADER_WORKERS = 2
+IMAGE_POLL_MS = 15
 
-def load_users():
-    """Load users from users.txt file."""
-    global users
-    users = {}
-    
-  
-    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-    
-    
-    if not os.path.exists(USERS_FILE):
-        try:
-            with open(USERS_FILE, 'w', encoding='utf-8') as f:
-                pass
-            print("Created new empty users file")
-            return users
-        except Exception as e:
-            print(f"Failed to create users file: {e}")
-            return users
-    
-    
-    try:
-        with open(USERS_FILE, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    user_data = json.loads(line)
-                    if 'username' in user_data and 'password' in user_data:
-                        users[user_data['username']] = user_data['password']
-                except (json.JSONDecodeError, KeyError) as e:
-                    print(f"Error parsing user data: {e}")
-                    continue
-    except Exception as e:
-        print(f"Error reading users file: {e}")
-    
-    print(f"Loaded {len(users)} users from file")
-    return users
+THUMBNAIL_DIR = os.path.join(BASE_DIR, "thumbnails")
+THUMBNAIL_PREWARM_DELAY_MS = 200
+PREWARM_IMAGES = os.environ.get("CLINIC_PREWARM_IMAGES", "1") != "0"
+DEFAULT_WINDOW_SIZE = (1600, 900)
+PAGE_BACKGROUNDS = {"welcome": "#0B8FA3", "login": "#E8E8E8", "register": "#E8E8E8", "main": "#E8E8E8"}
+PAGES_SIZED_TO_WINDOW = ("welcome", "login", "register")
+SERVICE_CARD_IMAGES = ["dental clinic.jpg", "physical theraphy 1.jpg", "EYES CHECK UP.png"]
+BACKGROUND_IMAGES = ["background of the GUI log in page.jpg"]
 
 
-def save_user(username, password):
-    """Save a new user to users.txt file."""
-    try:
-        print(f"Attempting to save user: {username}")
-        
-        #
-        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-        print(f"Directory exists or created: {os.path.dirname(USERS_FILE)}")
-        
-        
-        user_data = {
-            "username": username,
-            "password": password,
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        
-        print(f"Writing to file: {USERS_FILE}")
-        
-        
-        try:
-            with open(USERS_FILE, 'a', encoding='utf-8') as f:
-                json_str = json.dumps(user_data)
-                print(f"Writing JSON: {json_str}")
-                f.write(json_str + '\n')
-                f.flush()  
-                os.fsync(f.fileno())  
-                print("Write successful")
-        except IOError as e:
-            print(f"IOError writing to file: {e}")
-            
-            try:
-                with open(USERS_FILE, 'w', encoding='utf-8') as f:
-                    json_str = json.dumps(user_data)
-                    f.write(json_str + '\n')
-                    print("Created new file and wrote user data")
-            except Exception as e2:
-                print(f"Failed to create new file: {e2}")
-                return False
-        
-        
-        users[username] = password
-        print(f"User {username} saved successfully")
-        return True
-        
-    except Exception as e:
-        print(f"Error saving user {username}: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        return False
-    except Exception as e:
-        print(f"Error saving user: {e}")
-
-
-def save_booking(patient_name, appointment_date, services_list, total_amount):
-    """Save booking record to bookings.txt file."""
-    try:
-        print(f"\n{'='*50}")
-        print(f"SAVE_BOOKING DEBUG - Starting to save booking")
-        print(f"Patient: {patient_name}")
-        print(f"Appointment Date: {appointment_date}")
-        print(f"Total Amount: {total_amount}")
-        print(f"Services List: {services_list}")
-        print(f"Type of services_list: {type(services_list)}")
-        
-        
-        os.makedirs(os.path.dirname(BOOKINGS_FILE), exist_ok=True)
-        print(f"Directory verified: {os.path.dirname(BOOKINGS_FILE)}")
-        
-        
-        serializable_services = []
-        for service in services_list:
-            if isinstance(service, (list, tuple)) and len(service) >= 3:
-                
-                service_dict = {
-                    'service_name': str(service[0]),
-                    'quantity': int(service[1]),
-                    'subtotal': float(service[2])
-                }
-                serializable_services.append(service_dict)
-            elif isinstance(service, dict):
-                
-                service_dict = {
-                    'service_name': str(service.get('service_name', 'Unknown Service')),
-                    'quantity': int(service.get('quantity', 1)),
-                    'subtotal': float(service.get('subtotal', 0))
-                }
-                serializable_services.append(service_dict)
-            else:
-                print(f"Warning: Invalid service format: {service}")
-        
-        
-        booking_data = {
-            "booking_id": f"BK-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "patient_name": str(patient_name),
-            "appointment_date": str(appointment_date),
-            "services": serializable_services,
-            "total_amount": float(total_amount),
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "status": "confirmed"
-        }
-        
-        print(f"Prepared booking data: {booking_data}")
-        
-        
-        print(f"Attempting to write to: {BOOKINGS_FILE}")
-        
-        try:
-            
-            try:
-                with open(BOOKINGS_FILE, 'a', encoding='utf-8') as f:
-                    json_str = json.dumps(booking_data, ensure_ascii=False)
-                    print(f"Writing JSON: {json_str}")
-                    f.write(json_str + '\n')
-                    f.flush()
-                    os.fsync(f.fileno())
-                    print("Successfully wrote to existing file")
-                    return True
-                    
-            except (IOError, json.JSONEncodeError) as e:
-                print(f"Error writing to file (will try to create new file): {e}")
-                
-            
-                with open(BOOKINGS_FILE, 'w', encoding='utf-8') as f:
-                    json_str = json.dumps(booking_data, ensure_ascii=False)
-                    print(f"Creating new file with data: {json_str}")
-                    f.write(json_str + '\n')
-                    print("Successfully created new file and wrote data")
-                    return True
-                    
-        except Exception as e:
-            print(f"Critical error saving booking: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-            
-    except Exception as e:
-        print(f"Unexpected error in save_booking: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
-
-def load_bookings_for_user(username):
-    """Load all bookings for a specific user from bookings.txt file."""
-    bookings = []
-    if os.path.exists(BOOKINGS_FILE):
-        try:
-            with open(BOOKINGS_FILE, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        booking_data = json.loads(line)
-                        
-                        
-                        if 'services' in booking_data and isinstance(booking_data['services'], list):
-                            services = []
-                            for service in booking_data['services']:
-                                if isinstance(service, dict):
-                                    services.append((
-                                        str(service.get('service_name', 'Unknown Service')),
-                                        int(service.get('quantity', 1)),
-                                        float(service.get('subtotal', 0))
-                                    ))
-                                elif isinstance(service, (list, tuple)) and len(service) >= 3:
-                                    services.append((
-                                        str(service[0]),
-                                        int(service[1]),
-                                        float(service[2])
-                                    ))
-                            booking_data['services'] = services
-                        
-                        if booking_data.get('patient_name') == username:
-                            
-                            if 'booking_id' not in booking_data:
-                                booking_data['booking_id'] = f"BK-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                            if 'created_at' not in booking_data:
-                                booking_data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                            if 'status' not in booking_data:
-                                booking_data['status'] = "confirmed"
-                                
-                            bookings.append(booking_data)
-                            
-                    except json.JSONDecodeError as je:
-                        print(f"Error parsing JSON on line {line_num}: {je}")
-                        print(f"Problematic line: {line}")
-                    except Exception as e:
-                        print(f"Error processing booking on line {line_num}: {e}")
-                        import traceback
-                        traceback.print_exc()
-                        
-        except Exception as e:
-            print(f"Error reading bookings file: {e}")
-            import traceback
-            traceback.print_exc()
-            
-    return sorted(bookings, key=lambda x: x.get('appointment_date', ''), reverse=True)
+class ImageCache:
+    """LRU cache of ready PhotoImages keyed by (path, target size, resample filter).
 
+    Each asset is decoded and resampled once per size; entries are evicted least
+    recently used first once their decoded pixels exceed `max_bytes`. `load_async`
+    does the decode and resize on worker threads and hands the PhotoImage back on
+    the Tk thread, since PhotoImages may only be created there.
+    """
 
-def load_bookings_for_user(username):
-    """Load all bookings for a specific user from bookings.txt file."""
-    bookings = []
-    if os.path.exists(BOOKINGS_FILE):
+    def __init__(self, root, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._photos = OrderedDict()
+        self._source_sizes = {}
+        self._pending = {}
+        self._ready = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=IMAGE_LOADER_WORKERS, thread_name_prefix="image-loader")
+        self._polling = False
+
+    def get(self, path, size=None, resample=Image.LANCZOS):
+        """Return a PhotoImage of `path`, resized to `size` (width, height) unless it is None."""
+        key = (path, size, resample)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        return self._store(key, _decode_image(path, size, resample))
+
+    def load_async(self, path, size, callback, resample=Image.LANCZOS):
+        """Call callback(photo) on the Tk thread once `path` has been decoded and resized off it."""
+        key = (path, size, resample)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            callback(photo)
+            return
+        if key in self._pending:
+            self._pending[key].append(callback)
+            return
+        
+        self._pending[key] = [callback]
+        self._executor.submit(self._decode_in_worker, key)
+        if not self._polling:
+            self._polling = True
+            self.root.after(IMAGE_POLL_MS, self._deliver_ready)
+
+    def _decode_in_worker(self, key):
         try:
-            with open(BOOKINGS_FILE, 'r', encoding='utf-8') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    try:
-                        booking_data = json.loads(line)
-                        
-                        if 'services' in booking_data and isinstance(booking_data['services'], list):
-                            services = []
-                            for service in booking_data['services']:
-                                if isinstance(service, dict):
-                                    services.append((
-                                        service.get('service_name', ''),
-                                        service.get('quantity', 0),
-                                        service.get('subtotal', 0)
-                                    ))
-                                else:
-                                    services.append(service)
-                            booking_data['services'] = services
-                        
-                        if booking_data.get('patient_name') == username:
-                            bookings.append(booking_data)
-                            
-                    except json.JSONDecodeError as je:
-                        print(f"Error parsing JSON on line {line_num}: {je}")
-                        print(f"Problematic line: {line}")
-                    except Exception as e:
-                        print(f"Error processing booking on line {line_num}: {e}")
-                        
+            self._ready.put((key, _decode_image(*key), None))
         except Exception as e:
-            print(f"Error reading bookings file: {e}")
-            import traceback
-            traceback.print_exc()
-            
-    return bookings
-
+            self._ready.put((key, None, e))
 
-def save_forgot_password_record(username, new_password):
-    """Save forgot password reset record to forgot_password.txt file."""
-    os.makedirs("booking_data", exist_ok=True)
-    try:
-        reset_record = {
-            "reset_id": f"RST-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "username": username,
-            "reset_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "status": "completed"
+    def _deliver_ready(self):
+        while True:
+            try:
+                key, img, error = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            callbacks = self._pending.pop(key, [])
+            if error is not None:
+                clinic_trace.error("Error loading image %s: %s", key[0], error)
+                continue
+            photo = self._store(key, img)
+            for callback in callbacks:
+                callback(photo)
+        
+        if self._pending:
+            self.root.after(IMAGE_POLL_MS, self._deliver_ready)
+        else:
+            self._polling = False
+
+    def _store(self, key, img):
+        photo = ImageTk.PhotoImage(img)
+        self._photos[key] = photo
+        self.current_bytes += photo.width() * photo.height() * 4
+        self._evict()
+        return photo
+
+    def fit_size(self, path, max_width, max_height):
+        """Return the size of `path` scaled to fit inside max_width x max_height, keeping its aspect ratio."""
+        img_width, img_height = self.source_size(path)
+        if img_width <= 0 or img_height <= 0:
+            return None
+        scale = min(max_width / img_width, max_height / img_height)
+        return (int(img_width * scale), int(img_height * scale))
+
+    def source_size(self, path):
+        """Return the original pixel size of `path`, reading only the file header."""
+        if path not in self._source_sizes:
+            with Image.open(path) as img:
+                self._source_sizes[path] = img.size
+        return self._source_sizes[path]
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and len(self._photos) > 1:
+            _, photo = self._photos.popitem(last=False)
+            self.current_bytes -= photo.width() * photo.height() * 4
+
+    def clear(self):
+        self._photos.clear()
+        self.current_bytes = 0
+
+
+class ThumbnailPack:
+    """Pre-resized PNG copies of the UI assets at the exact sizes the screens draw them.
+
+    The manifest maps "path|WxH" to the packed file and the source file's mtime, so
+    an entry is ignored as soon as its original asset changes. It is read lazily on
+    the first lookup.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_file = os.path.join(directory, "manifest.json")
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(path, size):
+        return f"{path}|{size[0]}x{size[1]}"
+
+    def _load(self):
+        with self._lock:
+            if self._entries is None:
+                try:
+                    with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+                except (OSError, ValueError):
+                    self._entries = {}
+            return self._entries
+
+    def lookup(self, path, size):
+        """Return the packed thumbnail file for `path` at `size`, or None if it is missing or stale."""
+        if size is None:
+            return None
+        entry = self._load().get(self._key(path, size))
+        if entry is None:
+            return None
+        try:
+            if os.path.getmtime(path) != entry['source_mtime']:
+                return None
+        except OSError:
+            return None
+        return os.path.join(self.directory, entry['file'])
+
+    def is_stale(self, specs):
+        """Return True if any (path, size) in `specs` whose source exists has no fresh thumbnail."""
+        return any(os.path.exists(path) and self.lookup(path, size) is None for path, size in specs)
+
+    @clinic_trace.traced("image.build_thumbnails")
+    def build(self, specs):
+        """Resize every (path, size) in `specs` once and write the pack and its manifest."""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = {}
+        for path, size in specs:
+            try:
+                with Image.open(path) as img:
+                    thumb = img.resize(size, Image.LANCZOS)
+                if thumb.mode not in ("RGB", "RGBA"):
+                    thumb = thumb.convert("RGBA")
+                stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+                file_name = f"{stem}_{size[0]}x{size[1]}.png"
+                thumb.save(os.path.join(self.directory, file_name), optimize=True)
+                entries[self._key(path, size)] = {"file": file_name, "source_mtime": os.path.getmtime(path)}
+            except Exception as e:
+                clinic_trace.warning("Skipping thumbnail for %s at %s: %s", path, size, e)
+        
+        temp_file = self.manifest_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=1)
+        os.replace(temp_file, self.manifest_file)
+        with self._lock:
+            self._entries = entries
+        clinic_trace.info("Built thumbnail pack with %s images in %s", len(entries), self.directory)
+        return len(entries)
+
+
+thumbnail_pack = ThumbnailPack(THUMBNAIL_DIR)
+
+
+def thumbnail_specs(background_sizes=()):
+    """Return the (path, size) pairs the UI draws: service cards, logos, error icon and backgrounds."""
+    specs = [(path, (180, 160)) for path in SERVICE_CARD_IMAGES]
+    specs += [("dog clinic doctor.jpg", (60, 60)), ("dog clinic doctor.jpg", (150, 150)),
+              ("error picture.png", (50, 50))]
+    for size in dict.fromkeys([DEFAULT_WINDOW_SIZE, *background_sizes]):
+        specs += [(path, size) for path in BACKGROUND_IMAGES]
+    return specs
+
+
+@clinic_trace.traced("image.decode")
+def _decode_image(path, size, resample):
+    """Decode `path` and resize it to `size`; safe to call from a worker thread.
+
+    Uses the thumbnail pack when it holds this exact size, so the full-size original
+    is never decoded.
+    """
+    if resample == Image.LANCZOS:
+        packed = thumbnail_pack.lookup(path, size)
+        if packed is not None:
+            try:
+                img = Image.open(packed)
+                img.load()
+                return img
+            except OSError as e:
+                clinic_trace.warning("Ignoring unreadable thumbnail %s: %s", packed, e)
+    
+    img = Image.open(path)
+    if size is not None and img.size != size:
+        img = img.resize(size, resample)
+    else:
+        img.load()
+    return img
+
+
+class VirtualBookingList:
+    """Scrollable list of booking cards that only materializes the visible rows.
+
+    Every row has the same height, so the canvas scroll region is sized from the
+    number of bookings alone. A small pool of card widgets is repositioned and
+    re-filled as the list scrolls instead of building one card per booking.
+    If `load_more` is given it is called for the next chunk of bookings whenever
+    the view comes within a screen of the last row, until it returns nothing.
+    """
+
+    def __init__(self, parent, on_cancel, on_print, load_more=None):
+        self.on_cancel = on_cancel
+        self.on_print = on_print
+        self.load_more = load_more
+        self.loading = False
+        self.rows = []
+        self.pool = []
+        
+        self.canvas = tk.Canvas(parent, bg="#F5F7FA", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.bind("<Configure>", lambda e: self._refresh())
+        
+        toplevel = parent.winfo_toplevel()
+        toplevel.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(int(-e.delta / 120) or (-1 if e.delta > 0 else 1), "units"))
+        toplevel.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        toplevel.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+
+    def add_bookings(self, bookings):
+        """Insert bookings in appointment-date order (newest first), redraw, and return their rows."""
+        new_rows = [_booking_row(booking) for booking in bookings]
+        self.rows.extend(new_rows)
+        self.rows.sort(key=lambda r: r['sort_key'])
+        for slot in self.pool:
+            slot['row'] = None
+        self._refresh()
+        return new_rows
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._render()
+
+    def _refresh(self):
+        width = max(self.canvas.winfo_width(), 1)
+        self.canvas.configure(scrollregion=(0, 0, width, len(self.rows) * BOOKING_ROW_HEIGHT),
+                              yscrollincrement=BOOKING_ROW_HEIGHT // 4)
+        for slot in self.pool:
+            self.canvas.itemconfigure(slot['window'], width=width - 10)
+        self._render()
+
+    def _render(self):
+        visible = self.canvas.winfo_height() // BOOKING_ROW_HEIGHT + 2
+        while len(self.pool) < min(visible, len(self.rows)):
+            self.pool.append(self._create_card())
+        
+        first = int(self.canvas.canvasy(0)) // BOOKING_ROW_HEIGHT
+        for i, slot in enumerate(self.pool):
+            index = first + i
+            if index >= len(self.rows):
+                self.canvas.itemconfigure(slot['window'], state="hidden")
+                continue
+            
+            row = self.rows[len(self.rows) - 1 - index]
+            if slot['row'] is not row:
+                self._fill_card(slot, row)
+            self.canvas.coords(slot['window'], 5, index * BOOKING_ROW_HEIGHT)
+            self.canvas.itemconfigure(slot['window'], state="normal")
+        
+        if self.load_more is not None and not self.loading and first + 2 * visible >= len(self.rows):
+            self.loading = True
+            self.canvas.after_idle(self._load_next)
+
+    def _load_next(self):
+        self.loading = False
+        if self.load_more is None or not self.canvas.winfo_exists():
+            return
+        bookings = self.load_more()
+        if bookings:
+            self.add_bookings(bookings)
+        else:
+            self.load_more = None
+
+    def _create_card(self):
+        card = tk.Frame(self.canvas, bg="white", bd=0, highlightthickness=1, 
+                        highlightbackground="#E5E7EB")
+        card.pack_propagate(False)
+        
+        header = tk.Frame(card, height=40)
+        header.pack(fill="x", pady=(0, 1))
+        status_dot = tk.Frame(header, width=8, height=8)
+        status_dot.place(relx=0.02, rely=0.5, anchor='w')
+        id_label = tk.Label(header, font=("Arial", 9, "bold"), fg="#1F2937")
+        id_label.place(relx=0.05, rely=0.5, anchor='w')
+        status_label = tk.Label(header, font=("Arial", 8, "bold"), fg="white", padx=8, pady=2)
+        status_label.place(relx=0.98, rely=0.5, anchor='e')
+        
+        footer = tk.Frame(card, bg="#F9FAFB", height=40)
+        footer.pack(fill="x", side="bottom", pady=(1, 0))
+        booked_label = tk.Label(footer, font=("Arial", 8), bg="#F9FAFB", fg="#6B7280")
+        booked_label.place(relx=0.02, rely=0.5, anchor='w')
+        btn_frame = tk.Frame(footer, bg="#F9FAFB")
+        btn_frame.place(relx=0.98, rely=0.5, anchor='e')
+        cancel_btn = tk.Button(btn_frame, text="Cancel",
+                               bg="#FEE2E2", fg="#B91C1C",
+                               font=("Arial", 8, "bold"),
+                               relief="flat", bd=0, padx=12, pady=4)
+        print_btn = tk.Button(btn_frame, text="Print Receipt",
+                              bg="#E0F2FE", fg="#0369A1",
+                              font=("Arial", 8, "bold"),
+                              relief="flat", bd=0, padx=12, pady=4)
+        print_btn.pack(side="right")
+        
+        content = tk.Frame(card, bg="white")
+        content.pack(fill="x", padx=15, pady=15)
+        details_frame = tk.Frame(content, bg="white")
+        details_frame.pack(side="left", fill="x", expand=True)
+        tk.Label(details_frame, text="Appointment Date", 
+                font=("Arial", 8), 
+                bg="white", fg="#6B7280").pack(anchor="w")
+        date_label = tk.Label(details_frame, font=("Arial", 12, "bold"), 
+                              bg="white", fg="#111827")
+        date_label.pack(anchor="w", pady=(0, 15))
+        tk.Label(details_frame, text="Services", 
+                font=("Arial", 8), 
+                bg="white", fg="#6B7280").pack(anchor="w")
+        services_label = tk.Label(details_frame, font=("Arial", 9), 
+                                  bg="white", fg="#4B5563", justify="left")
+        services_label.pack(anchor="w", pady=(0, 10))
+        
+        amount_frame = tk.Frame(content, bg="white")
+        amount_frame.pack(side="right", padx=10)
+        tk.Label(amount_frame, text="Total Amount", 
+                font=("Arial", 8), 
+                bg="white", fg="#6B7280").pack(anchor="e")
+        amount_label = tk.Label(amount_frame, font=("Arial", 16, "bold"), 
+                                bg="white", fg="#0B8FA3")
+        amount_label.pack(anchor="e")
+        
+        window = self.canvas.create_window(5, 0, window=card, anchor="nw",
+                                           width=max(self.canvas.winfo_width() - 10, 1),
+                                           height=BOOKING_ROW_HEIGHT - 15)
+        return {
+            'window': window, 'row': None, 'header': header, 'status_dot': status_dot,
+            'id_label': id_label, 'status_label': status_label, 'booked_label': booked_label,
+            'cancel_btn': cancel_btn, 'print_btn': print_btn, 'date_label': date_label,
+            'services_label': services_label, 'amount_label': amount_label
         }
-        with open(FORGOT_PASSWORD_FILE, 'a') as f:
-            f.write(json.dumps(reset_record) + '\n')
-    except Exception as e:
-        print(f"Error saving forgot password record: {e}")
-
 
-def load_forgot_password_history(username):
-    """Load password reset history for a specific user."""
-    history = []
-    if os.path.exists(FORGOT_PASSWORD_FILE):
-        try:
-            with open(FORGOT_PASSWORD_FILE, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        record = json.loads(line)
-                        if record['username'] == username:
-                            history.append(record)
-        except Exception as e:
-            print(f"Error loading forgot password history: {e}")
-    return history
+    def _fill_card(self, slot, row):
+        booking = row['booking']
+        if row['confirmed']:
+            status_color, header_bg = "#10B981", "#ECFDF5"
+        elif booking['status'].lower() == 'cancelled':
+            status_color, header_bg = "#EF4444", "#FEF2F2"
+        else:
+            status_color, header_bg = "#F59E0B", "#FFFBEB"
+        
+        slot['header'].config(bg=header_bg)
+        slot['status_dot'].config(bg=status_color)
+        slot['id_label'].config(text=f"#{booking['booking_id']}", bg=header_bg)
+        slot['status_label'].config(text=booking['status'].upper(), bg=status_color)
+        slot['date_label'].config(text=f"{booking['appointment_date']} at {booking['slot']}" if booking.get('slot')
+                                  else booking['appointment_date'])
+        slot['services_label'].config(text=row['services_text'])
+        slot['amount_label'].config(text=f"₱{booking['total_amount']}")
+        slot['booked_label'].config(text=f"Booked on {row['booked_on']}")
+        slot['print_btn'].config(command=lambda b=booking: self.on_print(b))
+        if row['upcoming']:
+            slot['cancel_btn'].config(command=lambda b=booking: self.on_cancel(b))
+            slot['cancel_btn'].pack(side="left", padx=5)
+        else:
+            slot['cancel_btn'].pack_forget()
+        slot['row'] = row
 
 
-def save_cancellation_record(patient_name, booking_id, appointment_date, services_list, total_amount, reason=""):
-    """Save booking cancellation record to cancellations.txt file."""
-    os.makedirs("booking_data", exist_ok=True)
+def _booking_row(booking):
+    """Precompute everything a booking card displays, so scrolling never re-parses dates."""
+    appointment_day = parse_appointment_date(booking.get('appointment_date'))
+    confirmed = booking['status'].lower() == 'confirmed'
     try:
-        cancellation_data = {
-            "cancellation_id": f"CAN-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "booking_id": booking_id,
-            "patient_name": patient_name,
-            "appointment_date": appointment_date,
-            "services": services_list,
-            "total_amount": total_amount,
-            "cancellation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "reason": reason,
-            "status": "cancelled"
-        }
-        with open(CANCELLATIONS_FILE, 'a') as f:
-            f.write(json.dumps(cancellation_data) + '\n')
-    except Exception as e:
-        print(f"Error saving cancellation record: {e}")
-
-
-def load_cancellations_for_user(username):
-    """Load all cancellation records for a specific user."""
-    cancellations = []
-    if os.path.exists(CANCELLATIONS_FILE):
-        try:
-            with open(CANCELLATIONS_FILE, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        cancellation = json.loads(line)
-                        if cancellation['patient_name'] == username:
-                            cancellations.append(cancellation)
-        except Exception as e:
-            print(f"Error loading cancellations: {e}")
-    return cancellations
+        booked_on = datetime.strptime(booking['created_at'], '%Y-%m-%d %H:%M:%S').strftime("%b %d, %Y at %I:%M %p")
+    except (TypeError, ValueError):
+        booked_on = str(booking.get('created_at', ''))
+    
+    services_text = ""
+    for service_name, qty, price in booking['services']:
+        services_text += f"• {service_name} (x{qty}) - ₱{price}\n"
+    
+    return {
+        'booking': booking,
+        'sort_key': appointment_day.isoformat() if appointment_day else booking.get('appointment_date', ''),
+        'confirmed': confirmed,
+        'upcoming': confirmed and appointment_day is not None and appointment_day > datetime.now().date(),
+        'booked_on': booked_on,
+        'services_text': services_text.strip()
+    }
 
 
 class ClinicBookingApp:
@@ -397,8 +466,8 @@ class ClinicBookingApp:
         self.current_user = None
         self.cart = {}
         self.product_images = {}
-
-        load_users()
+        self.image_cache = ImageCache(self.root)
+        self.service = BookingService()
         
         available = font.families()
         if "Poppins" in available:
@@ -414,52 +483,126 @@ class ClinicBookingApp:
             
         self.selected_date = tk.StringVar()
 
+        self.pages = {}
+        self.page_sizes = {}
+        self.current_page = None
+        self.page_builders = {
+            "welcome": self.build_welcome_page,
+            "login": self.build_login_page,
+            "register": self.build_register_page,
+            "main": self.build_main_interface,
+        }
+
+        if clinic_watchdog.WATCHDOG_ENABLED:
+            self.watchdog = clinic_watchdog.StallWatchdog(root, owner=self).start()
+
         self.create_welcome_page()
+        self.root.after(THUMBNAIL_PREWARM_DELAY_MS, self.prewarm_images)
+
+    def background_sizes(self):
+        """Return the window and screen sizes the page backgrounds get resized to."""
+        sizes = [(self.root.winfo_screenwidth(), self.root.winfo_screenheight())]
+        if self.root.winfo_width() > 1 and self.root.winfo_height() > 1:
+            sizes.append((self.root.winfo_width(), self.root.winfo_height()))
+        return sizes
+
+    def prewarm_images(self):
+        """Build the thumbnail pack if it is missing or stale, then warm the image cache from it.
+
+        Runs after the first frame; the build itself happens on a background thread.
+        """
+        specs = thumbnail_specs(self.background_sizes())
+        if thumbnail_pack.is_stale(specs):
+            builder = threading.Thread(target=thumbnail_pack.build, args=(specs,), name="thumbnail-pack", daemon=True)
+            builder.start()
+            self._warm_cache_when_built(builder, specs)
+        else:
+            self._warm_cache(specs)
 
-    def clear_window(self):
-        for widget in self.root.winfo_children():
-            widget.destroy()
+    def _warm_cache_when_built(self, builder, specs):
+        if builder.is_alive():
+            self.root.after(THUMBNAIL_PREWARM_DELAY_MS, self._warm_cache_when_built, builder, specs)
+        else:
+            self._warm_cache(specs)
 
-    def set_background_image(self, image_file="dental clinic.jpg"):
+    def _warm_cache(self, specs):
+        if not PREWARM_IMAGES:
+            return
+        window_size = (self.root.winfo_width(), self.root.winfo_height())
+        for path, size in specs:
+            if path in BACKGROUND_IMAGES and size != window_size:
+                continue
+            self.image_cache.load_async(path, size, lambda photo: None)
+
+    def load_image_async(self, label, image_file, size=None, resample=Image.LANCZOS):
+        """Swap `image_file` into `label` once it has been decoded off the main thread.
+
+        The label keeps showing its placeholder until then.
+        """
+        def show(photo):
+            if label.winfo_exists():
+                label.config(image=photo, text="")
+                label.image = photo
+        self.image_cache.load_async(image_file, size, show, resample)
+
+    def window_size(self):
+        """The root window size, or DEFAULT_WINDOW_SIZE before the window is mapped."""
+        width, height = self.root.winfo_width(), self.root.winfo_height()
+        return (width if width > 1 else DEFAULT_WINDOW_SIZE[0], height if height > 1 else DEFAULT_WINDOW_SIZE[1])
+
+    def show_page(self, name):
+        """Show page `name` and hide the current one, building the page on its first visit.
+
+        Pages are kept as hidden frames between visits, so navigating back only
+        re-places a frame. Pages laid out to the window size are rebuilt if the
+        window has been resized since they were built. Dialogs opened from the
+        page being left are closed, as they were when every page was rebuilt.
+        """
+        for widget in self.root.winfo_children():
+            if isinstance(widget, tk.Toplevel):
+                widget.destroy()
+        size = self.window_size()
+        page = self.pages.get(name)
+        if page is not None and name in PAGES_SIZED_TO_WINDOW and self.page_sizes.get(name) != size:
+            page.destroy()
+            page = None
+        if page is None:
+            page = tk.Frame(self.root, bg=PAGE_BACKGROUNDS[name])
+            self.page_builders[name](page)
+            self.pages[name] = page
+            self.page_sizes[name] = size
+        if self.current_page is not None and self.current_page is not page and self.current_page.winfo_exists():
+            self.current_page.place_forget()
+        self.root.configure(bg=PAGE_BACKGROUNDS[name])
+        page.place(x=0, y=0, relwidth=1, relheight=1)
+        self.current_page = page
+        return page
+
+    @clinic_trace.traced("page.set_background_image")
+    def set_background_image(self, parent, image_file="dental clinic.jpg"):
         """Set background image for the page."""
         try:
-            bg_img = Image.open(image_file)
-            
-            window_width = self.root.winfo_width()
-            window_height = self.root.winfo_height()
-            
-            
-            if window_width <= 1:
-                window_width = 1600
-            if window_height <= 1:
-                window_height = 900
-            
-          
-            bg_img = bg_img.resize((window_width, window_height), Image.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(bg_img)
-            bg_label = tk.Label(self.root, image=self.bg_photo)
-            bg_label.image = self.bg_photo  
+            window_width, window_height = self.window_size()
+            bg_label = tk.Label(parent, bg=parent.cget("bg"))
             bg_label.place(x=0, y=0, relwidth=1, relheight=1)
+            self.load_image_async(bg_label, image_file, (window_width, window_height))
         except Exception:
             pass
 
+    @clinic_trace.traced("page.create_welcome_page")
     def create_welcome_page(self):
         """Display welcome/landing page with Get Started button."""
-        self.clear_window()
-        self.root.configure(bg="#0B8FA3")
-        self.set_background_image("background of the GUI log in page.jpeg")
+        self.show_page("welcome")
+
+    @clinic_trace.traced("page.build_welcome_page")
+    def build_welcome_page(self, page):
+        self.set_background_image(page, "background of the GUI log in page.jpg")
 
         
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
-        
-        if window_width <= 1:
-            window_width = 1600
-        if window_height <= 1:
-            window_height = 900
+        window_width, window_height = self.window_size()
 
         
-        main_container = tk.Frame(self.root, bg="white", relief="flat", bd=0, highlightbackground="#0B43A3", highlightthickness=2)
+        main_container = tk.Frame(page, bg="white", relief="flat", bd=0, highlightbackground="#0B43A3", highlightthickness=2)
         main_container.place(relx=0.5, rely=0.5, anchor="center", width=int(window_width * 0.8), height=int(window_height * 0.7))
 
         
@@ -514,29 +657,19 @@ class ClinicBookingApp:
         images_container.pack()
 
         
-        try:
-            doctor_img = Image.open("MAIN DOCTOR.png")
-            
-            self.doctor_photo = ImageTk.PhotoImage(doctor_img)
-            doctor_label = tk.Label(images_container, image=self.doctor_photo, bg="white")
-            doctor_label.pack(side="left", padx=10, pady=10)
-        except Exception:
-            tk.Label(images_container, text="👨‍⚕️\nMAIN DOCTOR", font=("Arial", 16, "bold"), 
-                    bg="white", fg="#0B8FA3", justify="center").pack(side="left", padx=10, pady=10)
+        doctor_label = tk.Label(images_container, text="👨‍⚕️\nMAIN DOCTOR", font=("Arial", 16, "bold"), 
+                                bg="white", fg="#0B8FA3", justify="center")
+        doctor_label.pack(side="left", padx=10, pady=10)
+        self.load_image_async(doctor_label, "MAIN DOCTOR.png")
 
         
-        try:
-            book_img = Image.open("booking book.jpg")
-            
-            self.book_photo = ImageTk.PhotoImage(book_img)
-            book_label = tk.Label(images_container, image=self.book_photo, bg="white")
-            book_label.pack(side="left", padx=10, pady=10)
-        except Exception:
-            tk.Label(images_container, text="📖\nBOOKING BOOK", font=("Arial", 16, "bold"), 
-                    bg="white", fg="#0B8FA3", justify="center").pack(side="left", padx=10, pady=10)
+        book_label = tk.Label(images_container, text="📖\nBOOKING BOOK", font=("Arial", 16, "bold"), 
+                              bg="white", fg="#0B8FA3", justify="center")
+        book_label.pack(side="left", padx=10, pady=10)
+        self.load_image_async(book_label, "booking book.jpg")
 
         
-        footer_frame = tk.Frame(self.root, bg="#0B8FA3", height=40)
+        footer_frame = tk.Frame(page, bg="#0B8FA3", height=40)
         footer_frame.pack(side="bottom", fill="x")
         
         footer_content = tk.Frame(footer_frame, bg="#0B8FA3")
@@ -547,26 +680,22 @@ class ClinicBookingApp:
         tk.Label(footer_content, text="Developed by: Yul, Dwayne, James, Zaiver", 
                 font=("Arial", 9), bg="#0B8FA3", fg="white").pack(side="right")
 
+    @clinic_trace.traced("page.create_login_page")
     def create_login_page(self):
-        self.clear_window() 
-        self.root.configure(bg="#E8E8E8")
+        self.show_page("login")
+        self.login_username.delete(0, tk.END)
+        self.login_password.delete(0, tk.END)
 
-        
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
-        
-        
-        if window_width <= 1:
-            window_width = 1600
-        if window_height <= 1:
-            window_height = 900
+    @clinic_trace.traced("page.build_login_page")
+    def build_login_page(self, page):
+        window_width, window_height = self.window_size()
         
         
         container_width = int(window_width * 0.95)
         container_height = int(window_height * 0.95)
 
         
-        container = tk.Frame(self.root, bg="white", relief="flat", bd=0)
+        container = tk.Frame(page, bg="white", relief="flat", bd=0)
         container.place(relx=0.5, rely=0.5, anchor="center", width=container_width, height=container_height)
 
         
@@ -660,32 +789,19 @@ class ClinicBookingApp:
         right_panel.pack(side="right", fill="both", expand=True)
 
         
+        anime_label = tk.Label(right_panel, text="🏥\nMain Login\nPicture", font=("Arial", 16, "bold"), 
+                               bg="#B8E6F0", fg="#0B8FA3", justify="center")
+        anime_label.pack(expand=True, padx=10, pady=10)
         try:
-            anime_img = Image.open("MAIN LOG IN PICTURE.png")
-            
-            
-            img_width, img_height = anime_img.size
             max_width = int(container_width * 0.90)
             max_height = int(container_height * 0.98)
-            
-            
-            if img_width > 0 and img_height > 0:
-                scale = min(max_width / img_width, max_height / img_height)
-                
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                anime_img = anime_img.resize((new_width, new_height), Image.LANCZOS)
-            
-            self.anime_photo = ImageTk.PhotoImage(anime_img)
-            anime_label = tk.Label(right_panel, image=self.anime_photo, bg="#B8E6F0")
-            anime_label.pack(expand=True, padx=10, pady=10)
+            size = self.image_cache.fit_size("MAIN LOG IN PICTURE.png", max_width, max_height)
+            self.load_image_async(anime_label, "MAIN LOG IN PICTURE.png", size)
         except Exception as e:
-            print(f"Error loading image: {e}")
-            tk.Label(right_panel, text="🏥\nMain Login\nPicture", font=("Arial", 16, "bold"), 
-                    bg="#B8E6F0", fg="#0B8FA3", justify="center").pack(expand=True)
+            clinic_trace.error("Error loading image: %s", e)
 
         
-        footer_frame = tk.Frame(self.root, bg="#0B8FA3", height=40)
+        footer_frame = tk.Frame(page, bg="#0B8FA3", height=40)
         footer_frame.pack(side="bottom", fill="x")
         
         footer_content = tk.Frame(footer_frame, bg="#0B8FA3")
@@ -696,22 +812,20 @@ class ClinicBookingApp:
         tk.Label(footer_content, text="Developed by: Yul, Dwayne, James, Zaiver", 
                 font=("Arial", 9), bg="#0B8FA3", fg="white").pack(side="right")
 
+    @clinic_trace.traced("page.create_register_page")
     def create_register_page(self):
-        self.clear_window()
-        self.root.configure(bg="#E8E8E8")
+        self.show_page("register")
+        self.reg_username.delete(0, tk.END)
+        self.reg_password.delete(0, tk.END)
 
-        window_width = self.root.winfo_width()
-        window_height = self.root.winfo_height()
-        
-        if window_width <= 1:
-            window_width = 1600
-        if window_height <= 1:
-            window_height = 900
+    @clinic_trace.traced("page.build_register_page")
+    def build_register_page(self, page):
+        window_width, window_height = self.window_size()
         
         container_width = int(window_width * 0.95)
         container_height = int(window_height * 0.95)
 
-        container = tk.Frame(self.root, bg="white", relief="flat", bd=0)
+        container = tk.Frame(page, bg="white", relief="flat", bd=0)
         container.place(relx=0.5, rely=0.5, anchor="center", width=container_width, height=container_height)
 
         left_panel = tk.Frame(container, bg="white")
@@ -776,28 +890,18 @@ class ClinicBookingApp:
         right_panel = tk.Frame(container, bg="#B8E6F0")
         right_panel.pack(side="right", fill="both", expand=True)
 
+        anime_label = tk.Label(right_panel, text="🏥\nMain Login\nPicture", font=("Arial", 16, "bold"), 
+                               bg="#B8E6F0", fg="#0B8FA3", justify="center")
+        anime_label.pack(expand=True, fill="both", padx=10, pady=10)
         try:
-            anime_img = Image.open("MAIN LOG IN PICTURE.png")
-            
-            img_width, img_height = anime_img.size
             max_width = int(container_width * 0.55)
             max_height = int(container_height * 0.98)
-            
-            if img_width > 0 and img_height > 0:
-                scale = min(max_width / img_width, max_height / img_height)
-                new_width = int(img_width * scale)
-                new_height = int(img_height * scale)
-                anime_img = anime_img.resize((new_width, new_height), Image.LANCZOS)
-            
-            self.anime_photo = ImageTk.PhotoImage(anime_img)
-            anime_label = tk.Label(right_panel, image=self.anime_photo, bg="#B8E6F0")
-            anime_label.pack(expand=True, fill="both", padx=10, pady=10)
+            size = self.image_cache.fit_size("MAIN LOG IN PICTURE.png", max_width, max_height)
+            self.load_image_async(anime_label, "MAIN LOG IN PICTURE.png", size)
         except Exception as e:
-            print(f"Error loading image: {e}")
-            tk.Label(right_panel, text="🏥\nMain Login\nPicture", font=("Arial", 16, "bold"), 
-                    bg="#B8E6F0", fg="#0B8FA3", justify="center").pack(expand=True)
+            clinic_trace.error("Error loading image: %s", e)
 
-        footer_frame = tk.Frame(self.root, bg="#0B8FA3", height=40)
+        footer_frame = tk.Frame(page, bg="#0B8FA3", height=40)
         footer_frame.pack(side="bottom", fill="x")
         
         footer_content = tk.Frame(footer_frame, bg="#0B8FA3")
@@ -814,7 +918,7 @@ class ClinicBookingApp:
         self.login_username.delete(0, tk.END)
         self.login_password.delete(0, tk.END)
 
-        if username in users and users[username] == password:
+        if self.service.authenticate(username, password):
             self.current_user = username
             self.create_main_interface()
         else:
@@ -837,15 +941,9 @@ class ClinicBookingApp:
             icon_frame = tk.Frame(content_frame, bg="white")
             icon_frame.pack(side="left", padx=(0, 10), fill="none")
             
-            try:
-                error_img = Image.open("error picture.png")
-                error_img = error_img.resize((50, 50), Image.LANCZOS)
-                self.error_photo = ImageTk.PhotoImage(error_img)
-                img_label = tk.Label(icon_frame, image=self.error_photo, bg="white")
-                img_label.pack()
-            except Exception:
-                
-                tk.Label(icon_frame, text="❌", font=("Arial", 32), bg="white").pack()
+            img_label = tk.Label(icon_frame, text="❌", font=("Arial", 32), bg="white")
+            img_label.pack()
+            self.load_image_async(img_label, "error picture.png", (50, 50))
             
             
             text_frame = tk.Frame(content_frame, bg="white")
@@ -863,6 +961,7 @@ class ClinicBookingApp:
                      bg="#0B8FA3", fg="white", font=("Arial", 10), border=0, 
                      relief="flat", cursor="hand2", padx=20, pady=5).pack()
 
+    @clinic_trace.traced("page.show_about")
     def show_about(self):
         """Display About information window."""
         about_window = tk.Toplevel(self.root)
@@ -900,6 +999,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                              border=0, relief="flat", cursor="hand2", padx=30, pady=10)
         close_btn.pack(pady=15)
 
+    @clinic_trace.traced("page.forgot_password")
     def forgot_password(self):
         """Handle forgot password functionality."""
         forgot_window = tk.Toplevel(self.root)
@@ -937,7 +1037,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                 messagebox.showerror("Error", "Please enter your username")
                 return
             
-            if username not in users:
+            if not self.service.user_exists(username):
                 messagebox.showerror("Error", "Username not found")
                 return
             
@@ -957,40 +1057,15 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
 
             def confirm_reset():
                 new_password = new_pass_entry.get().strip()
-                if not new_password:
-                    messagebox.showerror("Error", "Please enter a new password")
+                try:
+                    self.service.reset_password(username, new_password)
+                except BookingError as e:
+                    messagebox.showerror("Error", str(e))
                     return
                 
-                
-                users[username] = new_password
-                
-                
-                try:
-                    
-                    all_users = []
-                    if os.path.exists(USERS_FILE):
-                        with open(USERS_FILE, 'r') as f:
-                            for line in f:
-                                line = line.strip()
-                                if line:
-                                    user_data = json.loads(line)
-                                    if user_data['username'] == username:
-                                        user_data['password'] = new_password
-                                    all_users.append(user_data)
-                    
-                    
-                    with open(USERS_FILE, 'w') as f:
-                        for user in all_users:
-                            f.write(json.dumps(user) + '\n')
-                    
-                    
-                    save_forgot_password_record(username, new_password)
-                    
-                    self.show_success_dialog("Success", "Password reset successfully!\n\nPlease login with your new password.")
-                    new_pass_window.destroy()
-                    forgot_window.destroy()
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to reset password: {str(e)}")
+                self.show_success_dialog("Success", "Password reset successfully!\n\nPlease login with your new password.")
+                new_pass_window.destroy()
+                forgot_window.destroy()
 
             tk.Button(new_pass_window, text="Confirm", command=confirm_reset, 
                      bg="#0B8FA3", fg="white", font=("Arial", 11, "bold"), 
@@ -1009,40 +1084,46 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         self.reg_username.delete(0, tk.END)
         self.reg_password.delete(0, tk.END)
 
-        if username in users:
-            messagebox.showerror("Error", "Username already exists")
-        elif not username or not password:
-            messagebox.showerror("Error", "Please enter username and password")
+        try:
+            self.service.register(username, password)
+        except BookingError as e:
+            messagebox.showerror("Error", str(e))
         else:
-            users[username] = password
-            save_user(username, password)
             self.show_success_dialog("Success", "Registration successful!\n\nPlease login with your new account.")
             self.create_login_page()
 
+    @clinic_trace.traced("page.create_main_interface")
     def create_main_interface(self):
-        self.clear_window()
-        self.root.configure(bg="#E8E8E8")
-
-        header = tk.Frame(self.root, bg="#0B8FA3", height=70)
+        """Show the booking page for the logged-in user with an empty cart."""
+        self.show_page("main")
+        self.welcome_label.config(text=f"Welcome, {self.current_user}!")
+        for qty_var in self.cart.values():
+            qty_var.set(0)
+        self.date_entry.set_date(date.today())
+
+    @clinic_trace.traced("page.build_main_interface")
+    def build_main_interface(self, page):
+        header = tk.Frame(page, bg="#0B8FA3", height=70)
         header.pack(fill="x")
         
         header_left = tk.Frame(header, bg="#0B8FA3")
         header_left.pack(side="left", padx=20, pady=15)
         tk.Label(header_left, text=f"🏥 Nuvy Clinic", font=("Arial", 18, "bold"),
                  bg="#0B8FA3", fg="white").pack(side="left")
-        tk.Label(header_left, text=f"Welcome, {self.current_user}!", font=("Arial", 12),
-                 bg="#0B8FA3", fg="white").pack(side="left", padx=(15, 0))
+        self.welcome_label = tk.Label(header_left, text=f"Welcome, {self.current_user}!", font=("Arial", 12),
+                                      bg="#0B8FA3", fg="white")
+        self.welcome_label.pack(side="left", padx=(15, 0))
 
         date_frame = tk.Frame(header, bg="#0B8FA3")
         date_frame.pack(side="right", padx=20, pady=15)
         tk.Label(date_frame, text="Pick Appointment Date:", bg="#0B8FA3", fg="white", font=("Arial", 15)).pack(side="left", padx=(0, 10))
-        date_entry = DateEntry(date_frame, textvariable=self.selected_date, width=12, background="#0B8FA3",
-                               foreground="white", borderwidth=2)
-        date_entry.pack(side="left")
+        self.date_entry = DateEntry(date_frame, textvariable=self.selected_date, width=12, background="#0B8FA3",
+                                    foreground="white", borderwidth=2)
+        self.date_entry.pack(side="left")
 
         self.cart = {}
         
-        main_frame = tk.Frame(self.root, bg="white", relief="flat", bd=0)
+        main_frame = tk.Frame(page, bg="white", relief="flat", bd=0)
         main_frame.pack(fill="both", expand=True, padx=20, pady=20)
         
         title_frame = tk.Frame(main_frame, bg="white")
@@ -1064,7 +1145,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         columns = 3
         row = 0
         col = 0
-        for product, price in services.items():
+        for product, price in self.service.services.items():
             card = tk.Frame(products_frame, bg="white", bd=2, relief="solid", highlightbackground="#0B8FA3", highlightthickness=2)
             card.grid(row=row, column=col, padx=12, pady=12, sticky="nsew")
             
@@ -1072,14 +1153,9 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
             img_frame.pack(fill="x", padx=0, pady=0)
             img_frame.pack_propagate(False)
             
-            try:
-                img = Image.open(image_files[product])
-                img = img.resize((180, 160), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                self.product_images[product] = photo
-                tk.Label(img_frame, image=photo, bg="#B8E6F0").pack(expand=True)
-            except Exception:
-                tk.Label(img_frame, text="🏥", font=("Arial", 40), bg="#B8E6F0", fg="#0B8FA3").pack(expand=True)
+            img_label = tk.Label(img_frame, text="🏥", font=("Arial", 40), bg="#B8E6F0", fg="#0B8FA3")
+            img_label.pack(expand=True)
+            self.load_image_async(img_label, image_files[product], (180, 160))
 
             content_frame = tk.Frame(card, bg="white")
             content_frame.pack(fill="both", expand=True, padx=12, pady=12)
@@ -1103,10 +1179,10 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                         var.set(current - 1)
                 return decrease_qty
             
-            def make_increase_qty(var):
+            def make_increase_qty(var, limit):
                 def increase_qty():
                     current = var.get()
-                    if current < 10:
+                    if current < limit:
                         var.set(current + 1)
                 return increase_qty
             
@@ -1119,7 +1195,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                                   font=("Arial", 11, "bold"), width=3)
             qty_display.pack(side="left", padx=5)
             
-            increase_btn = tk.Button(qty_control_frame, text="+", command=make_increase_qty(qty_var),
+            increase_btn = tk.Button(qty_control_frame, text="+", command=make_increase_qty(qty_var, self.service.max_quantity(product)),
                                     bg="#0B8FA3", fg="white", font=("Arial", 12, "bold"),
                                     width=3, border=0, relief="solid", bd=1, cursor="hand2")
             increase_btn.pack(side="left", padx=2)
@@ -1131,7 +1207,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                 col = 0
                 row += 1
     
-        buttons_frame = tk.Frame(self.root, bg="#E8E8E8")
+        buttons_frame = tk.Frame(page, bg="#E8E8E8")
         buttons_frame.pack(pady=20, fill="x", padx=20)
         
         summary_btn = tk.Button(buttons_frame, text="Book Now", command=self.checkout,
@@ -1149,7 +1225,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                               border=0, relief="flat", cursor="hand2", padx=20, pady=10)
         logout_btn.pack(side=tk.LEFT, padx=5)
         
-        footer_frame = tk.Frame(self.root, bg="#0B8FA3", height=40)
+        footer_frame = tk.Frame(page, bg="#0B8FA3", height=40)
         footer_frame.pack(side="bottom", fill="x")
         
         footer_content = tk.Frame(footer_frame, bg="#0B8FA3")
@@ -1160,37 +1236,13 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         tk.Label(footer_content, text="Developed by: Yul, Dwayne, James, Zaiver", 
                 font=("Arial", 9), bg="#0B8FA3", fg="white").pack(side="right")
 
+    @clinic_trace.traced("page.checkout")
     def checkout(self):
-        total = 0
-        selected_services = []
-        
-        print("\n" + "="*60)
-        print("CHECKOUT DEBUG INFO")
-        print("="*60)
-        print(f"Cart dictionary: {self.cart}")
-        print(f"Cart keys: {list(self.cart.keys())}")
-        print(f"Services dictionary: {services}")
-        print(f"Services keys: {list(services.keys())}")
-        
-        for product, qty_var in self.cart.items():
-            qty = qty_var.get()
-            print(f"\nProduct: '{product}' | Type: {type(product)}")
-            print(f"Quantity Variable: {qty_var} | Value: {qty}")
-            if qty > 0:
-                try:
-                    price = services[product]
-                    subtotal = price * qty
-                    total += subtotal
-                    selected_services.append((product, qty, subtotal))
-                    print(f"✓ ADDED: {product} x{qty} = ₱{subtotal}")
-                except KeyError as e:
-                    print(f"✗ ERROR: Product '{product}' not found in services: {e}")
-            else:
-                print(f"- SKIPPED: Quantity is 0")
-
-        print(f"\nTotal selected services: {len(selected_services)}")
-        print(f"Total amount: ₱{total}")
-        print("="*60 + "\n")
+        try:
+            selected_services, total = self.service.quote({product: qty_var.get() for product, qty_var in self.cart.items()})
+        except BookingError as e:
+            messagebox.showerror("Error", str(e))
+            return
         
         if total == 0:
             messagebox.showinfo("No Selection", "Please select at least one service to book.")
@@ -1231,9 +1283,6 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         services_frame = tk.Frame(content_frame, bg="#F9F9F9", relief="solid", bd=1)
         services_frame.pack(fill="both", expand=True, pady=(0, 20))
 
-        print(f"DEBUG: selected_services = {selected_services}")
-        print(f"DEBUG: total = {total}")
-        
         if selected_services and len(selected_services) > 0:
             for prod, qty, subtotal in selected_services:
                 service_row = tk.Frame(services_frame, bg="#F9F9F9")
@@ -1266,8 +1315,11 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
 
         def confirm_and_close():
             
-            if not save_booking(self.current_user, chosen_date, selected_services, total):
-                messagebox.showerror("Error", "Failed to save booking. Please try again.")
+            try:
+                booking = self.service.book(self.current_user, chosen_date,
+                                            {product: qty for product, qty, subtotal in selected_services}, durable=True)
+            except BookingError as e:
+                messagebox.showerror("Error", str(e))
                 return
                 
             
@@ -1278,7 +1330,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
             summary_window.destroy()
             
             
-            self.show_success_dialog("Booking Confirmed", "Your appointment has been booked successfully!\n\nYou can view your bookings by clicking 'View My Bookings'.")
+            self.show_success_dialog("Booking Confirmed", f"Your appointment at {booking['slot']} has been booked successfully!\n\nYou can view your bookings by clicking 'View My Bookings'.")
             
             self.show_receipt(self.current_user, chosen_date, selected_services, total)
 
@@ -1292,6 +1344,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                              border=0, relief="flat", cursor="hand2", padx=20, pady=10)
         close_btn.pack(fill="x")
 
+    @clinic_trace.traced("page.show_receipt")
     def show_receipt(self, patient_name, appointment_date, services_list, total_amount):
         """Display a professional receipt page for the confirmed booking."""
     
@@ -1354,7 +1407,7 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         content_frame.pack(fill="both", expand=True, padx=20, pady=20)
         
         
-        receipt_num = f"RCP-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        receipt_num = self.service.new_receipt_number()
         tk.Label(content_frame, text="Nuvy Clinic", 
                 font=("Arial", 14, "bold"), 
                 bg="white", fg="#333").pack(anchor="center", pady=(0, 10))
@@ -1530,17 +1583,9 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         dialog.grab_set()
         
         
-        try:
-            img = Image.open("dog clinic doctor.jpg")
-            img = img.resize((150, 150), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            
-            
-            img_label = tk.Label(dialog, image=photo, bg='white')
-            img_label.image = photo  
-            img_label.pack(side='left', padx=10, pady=10)
-        except Exception as e:
-            print(f"Error loading image: {e}")
+        img_label = tk.Label(dialog, text="🐾", font=("Arial", 40), bg='white', fg="#0B8FA3")
+        img_label.pack(side='left', padx=10, pady=10)
+        self.load_image_async(img_label, "dog clinic doctor.jpg", (150, 150), Image.Resampling.LANCZOS)
         
         
         content_frame = tk.Frame(dialog, bg='white')
@@ -1591,9 +1636,11 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         """Handle print receipt functionality."""
         messagebox.showinfo("Print", f"Receipt #{receipt_num} sent to printer.\n\nPatient: {patient_name}\nDate: {appointment_date}\nTotal: ₱{total_amount}")
     
+    @clinic_trace.traced("page.view_bookings")
     def view_bookings(self):
         """Display all bookings for the logged-in user with a professional layout."""
-        bookings = load_bookings_for_user(self.current_user)
+        chunks = self.service.bookings_in_chunks(self.current_user)
+        first_chunk = next(chunks, [])
         
         
         bookings_window = tk.Toplevel(self.root)
@@ -1613,19 +1660,10 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         logo_frame = tk.Frame(header_content, bg="#0B8FA3")
         logo_frame.pack(side="left")
         
-        try:
-            
-            img = Image.open("dog clinic doctor.jpg")
-            img = img.resize((60, 60), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            logo_label = tk.Label(logo_frame, image=photo, bg="#0B8FA3")
-            logo_label.image = photo
-            logo_label.pack(side="left", padx=(0, 15))
-        except Exception as e:
-            print(f"Error loading logo: {e}")
-            
-            tk.Label(logo_frame, text="🐾", font=("Arial", 24), 
-                    bg="#0B8FA3", fg="white").pack(side="left", padx=(0, 15))
+        logo_label = tk.Label(logo_frame, text="🐾", font=("Arial", 24), 
+                              bg="#0B8FA3", fg="white")
+        logo_label.pack(side="left", padx=(0, 15))
+        self.load_image_async(logo_label, "dog clinic doctor.jpg", (60, 60), Image.Resampling.LANCZOS)
         
         
         title_frame = tk.Frame(logo_frame, bg="#0B8FA3")
@@ -1659,10 +1697,15 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
         title_label.pack(fill="x")
 
         
+        button_frame = tk.Frame(bookings_window, bg="white")
+        button_frame.pack(side="bottom", fill="x", padx=20, pady=15)
+        ttk.Button(button_frame, text="Close", command=bookings_window.destroy).pack()
+
+        
         content_frame = tk.Frame(bookings_window, bg="#E8E8E8")
         content_frame.pack(fill="both", expand=True, padx=20, pady=20)
 
-        if not bookings:
+        if not first_chunk:
             
             empty_frame = tk.Frame(content_frame, bg="white", bd=0, highlightthickness=0)
             empty_frame.pack(fill="both", expand=True, pady=40)
@@ -1686,240 +1729,87 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
                                font=("Arial", 10, "bold"),
                                relief="flat", bd=0, padx=20, pady=8)
             book_btn.pack()
+            return
             
-        else:
-            
-            canvas = tk.Canvas(content_frame, bg="#F5F7FA", highlightthickness=0)
-            scrollbar = ttk.Scrollbar(content_frame, orient="vertical", command=canvas.yview)
-            scrollable_frame = tk.Frame(canvas, bg="#F5F7FA")
-
-            scrollable_frame.bind(
-                "<Configure>",
-                lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-            )
-
-            canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-            canvas.configure(yscrollcommand=scrollbar.set)
-
-            
-            stats_frame = tk.Frame(scrollable_frame, bg="#F5F7FA")
-            stats_frame.pack(fill="x", pady=(0, 20))
-            
-            total_bookings = len(bookings)
-            confirmed = sum(1 for b in bookings if b['status'].lower() == 'confirmed')
-            
-            
-            stats_card = tk.Frame(stats_frame, bg="white", bd=0, highlightthickness=1, 
-                                highlightbackground="#E5E7EB", highlightthickness2=1)
-            stats_card.pack(fill="x", padx=5, pady=5)
-            
-            tk.Label(stats_card, text="Appointment Summary", 
-                    font=("Arial", 10, "bold"), 
-                    bg="white", fg="#4B5563", anchor="w").pack(fill="x", padx=15, pady=(15, 10))
-            
-            stats_grid = tk.Frame(stats_card, bg="white")
-            stats_grid.pack(fill="x", padx=15, pady=(0, 15))
-            
-            
-            tk.Label(stats_grid, text=str(total_bookings), 
-                    font=("Arial", 18, "bold"), 
-                    bg="white", fg="#0B8FA3").grid(row=0, column=0, padx=10, pady=5, sticky="w")
-            tk.Label(stats_grid, text="Total Appointments", 
-                    font=("Arial", 9), 
-                    bg="white", fg="#6B7280").grid(row=1, column=0, padx=10, sticky="w")
-            
-            d
-            tk.Label(stats_grid, text=str(confirmed), 
-                    font=("Arial", 18, "bold"), 
-                    bg="white", fg="#10B981").grid(row=0, column=1, padx=10, pady=5, sticky="w")
-            tk.Label(stats_grid, text="Confirmed", 
-                    font=("Arial", 9), 
-                    bg="white", fg="#6B7280").grid(row=1, column=1, padx=10, sticky="w")
-            
-            
-            upcoming = sum(1 for b in bookings if b['status'].lower() == 'confirmed' and 
-                          datetime.strptime(b['appointment_date'], '%Y-%m-%d') >= datetime.now())
-            tk.Label(stats_grid, text=str(upcoming), 
-                    font=("Arial", 18, "bold"), 
-                    bg="white", fg="#3B82F6").grid(row=0, column=2, padx=10, pady=5, sticky="w")
-            tk.Label(stats_grid, text="Upcoming", 
-                    font=("Arial", 9), 
-                    bg="white", fg="#6B7280").grid(row=1, column=2, padx=10, sticky="w")
-            
-            
-            tk.Frame(scrollable_frame, bg="#E5E7EB", height=1).pack(fill="x", pady=10)
-            
-            
-            tk.Label(scrollable_frame, text="Your Appointments", 
-                    font=("Arial", 12, "bold"), 
-                    bg="#F5F7FA", fg="#374151").pack(anchor="w", pady=(10, 15), padx=5)
-
-            
-            for booking in bookings:
-                
-                booking_card = tk.Frame(scrollable_frame, bg="white", 
-                                      bd=0, highlightthickness=1, 
-                                      highlightbackground="#E5E7EB",
-                                      highlightthickness2=1)
-                booking_card.pack(fill="x", pady=(0, 15), padx=5)
-                
-                
-                status_color = "#10B981" if booking['status'].lower() == "confirmed" else "#F59E0B"
-                header_bg = "#ECFDF5" if booking['status'].lower() == "confirmed" else "#FFFBEB"
-                
-                header = tk.Frame(booking_card, bg=header_bg, height=40)
-                header.pack(fill="x", pady=(0, 1))
-                
-                
-                status_dot = tk.Frame(header, bg=status_color, width=8, height=8)
-                status_dot.place(relx=0.02, rely=0.5, anchor='w')
-                
-                
-                tk.Label(header, text=f"#{booking['booking_id']}", 
-                        font=("Arial", 9, "bold"), 
-                        bg=header_bg, fg="#1F2937").place(relx=0.05, rely=0.5, anchor='w')
-                
-                tk.Label(header, text=booking['status'].upper(), 
-                        font=("Arial", 8, "bold"), 
-                        bg=status_color, fg="white",
-                        padx=8, pady=2).place(relx=0.98, rely=0.5, anchor='e')
-                
-                
-                content = tk.Frame(booking_card, bg="white")
-                content.pack(fill="x", padx=15, pady=15)
-                
-                
-                details_frame = tk.Frame(content, bg="white")
-                details_frame.pack(side="left", fill="x", expand=True)
-                
-                
-                tk.Label(details_frame, text="Appointment Date", 
-                        font=("Arial", 8), 
-                        bg="white", fg="#6B7280").pack(anchor="w")
-                
-                tk.Label(details_frame, text=booking['appointment_date'], 
-                        font=("Arial", 12, "bold"), 
-                        bg="white", fg="#111827").pack(anchor="w", pady=(0, 15))
-                
-                
-                tk.Label(details_frame, text="Services", 
-                        font=("Arial", 8), 
-                        bg="white", fg="#6B7280").pack(anchor="w")
-                
-                services_text = ""
-                for i, service in enumerate(booking['services']):
-                    service_name, qty, price = service
-                    services_text += f"• {service_name} (x{qty}) - ₱{price}\n"
-                
-                tk.Label(details_frame, text=services_text.strip(), 
-                        font=("Arial", 9), 
-                        bg="white", fg="#4B5563",
-                        justify="left").pack(anchor="w", pady=(0, 10))
-                
-                
-                amount_frame = tk.Frame(content, bg="white")
-                amount_frame.pack(side="right", padx=10)
-                
-                tk.Label(amount_frame, text="Total Amount", 
-                        font=("Arial", 8), 
-                        bg="white", fg="#6B7280").pack(anchor="e")
-                
-                tk.Label(amount_frame, text=f"₱{booking['total_amount']}", 
-                        font=("Arial", 16, "bold"), 
-                        bg="white", fg="#0B8FA3").pack(anchor="e")
-                
-                
-                footer = tk.Frame(booking_card, bg="#F9FAFB", height=40)
-                footer.pack(fill="x", side="bottom", pady=(1, 0))
-                
-                
-                booking_date = datetime.strptime(booking['created_at'], '%Y-%m-%d %H:%M:%S')
-                formatted_date = booking_date.strftime("%b %d, %Y at %I:%M %p")
-                
-                tk.Label(footer, text=f"Booked on {formatted_date}", 
-                        font=("Arial", 8), 
-                        bg="#F9FAFB", fg="#6B7280").place(relx=0.02, rely=0.5, anchor='w')
-                
-                
-                btn_frame = tk.Frame(footer, bg="#F9FAFB")
-                btn_frame.place(relx=0.98, rely=0.5, anchor='e')
-                
-                
-                if booking['status'].lower() == 'confirmed' and \
-                   datetime.strptime(booking['appointment_date'], '%Y-%m-%d') > datetime.now():
-                    cancel_btn = tk.Button(btn_frame, text="Cancel",
-                                         command=lambda b=booking: self.cancel_ooking(b),
-                                         bg="#FEE2E2", fg="#B91C1C",
-                                         font=("Arial", 8, "bold"),
-                                         relief="flat", bd=0, padx=12, pady=4)
-                    cancel_btn.pack(side="left", padx=5)
-                
-               
-                print_btn = tk.Button(btn_frame, text="Print Receipt",
-                                    command=lambda b=booking: self.print_receipt(
-                                        b['booking_id'], 
-                                        self.current_user, 
-                                        b['appointment_date'], 
-                                        b['services'], 
-                                        b['total_amount']
-                                    ),
-                                    bg="#E0F2FE", fg="#0369A1",
-                                    font=("Arial", 8, "bold"),
-                                    relief="flat", bd=0, padx=12, pady=4)
-                print_btn.pack(side="left")
-
-                
-                def cancel_booking(booking_data=booking):
-                    def confirm_cancel():
-                        reason = reason_entry.get().strip()
-                        save_cancellation_record(
-                            self.current_user,
-                            booking_data['booking_id'],
-                            booking_data['appointment_date'],
-                            booking_data['services'],
-                            booking_data['total_amount'],
-                            reason
-                        )
-                        self.show_success_dialog("Success", "Booking cancelled successfully!")
-                        cancel_window.destroy()
-                        bookings_window.destroy()
-                        self.view_bookings()
-
-                    cancel_window = tk.Toplevel(bookings_window)
-                    cancel_window.title("Cancel Booking")
-                    cancel_window.geometry("400x200")
-                    cancel_window.configure(bg="white")
-                    cancel_window.resizable(False, False)
-
-                    tk.Label(cancel_window, text="Cancel Booking", font=("Arial", 14, "bold"), 
-                            bg="white", fg=ACCENT).pack(pady=15)
-                    tk.Label(cancel_window, text="Reason for cancellation (optional):", font=("Arial", 10), 
-                            bg="white").pack(anchor="w", padx=20, pady=(5, 2))
-                    
-                    reason_entry = tk.Entry(cancel_window, font=("Arial", 10), width=40, border=1, relief="solid")
-                    reason_entry.pack(padx=20, pady=(0, 15), fill="x")
-
-                    button_frame = tk.Frame(cancel_window, bg="white")
-                    button_frame.pack(fill="x", padx=20, pady=10)
-                    tk.Button(button_frame, text="Confirm Cancel", command=confirm_cancel, 
-                             bg="#FF6B6B", fg="white", font=("Arial", 10, "bold"), 
-                             border=0, relief="flat", cursor="hand2").pack(side="left", padx=5)
-                    tk.Button(button_frame, text="Keep Booking", command=cancel_window.destroy, 
-                             bg="#999", fg="white", font=("Arial", 10, "bold"), 
-                             border=0, relief="flat", cursor="hand2").pack(side="left", padx=5)
-
-                cancel_btn = tk.Button(booking_card, text="❌ Cancel Booking", command=cancel_booking, 
-                                      bg="#FF6B6B", fg="white", font=("Arial", 9, "bold"), 
-                                      border=0, relief="flat", cursor="hand2", padx=10, pady=5)
-                cancel_btn.pack(pady=(10, 0), fill="x")
-
-            canvas.pack(side="left", fill="both", expand=True)
-            scrollbar.pack(side="right", fill="y")
-
         
-        button_frame = tk.Frame(bookings_window, bg="white")
-        button_frame.pack(fill="x", padx=20, pady=15)
-        ttk.Button(button_frame, text="Close", command=bookings_window.destroy).pack()
+        stats_card = tk.Frame(content_frame, bg="white", bd=0, highlightthickness=1, 
+                            highlightbackground="#E5E7EB")
+        stats_card.pack(fill="x", padx=5, pady=(5, 15))
+        
+        tk.Label(stats_card, text="Appointment Summary", 
+                font=("Arial", 10, "bold"), 
+                bg="white", fg="#4B5563", anchor="w").pack(fill="x", padx=15, pady=(15, 10))
+        
+        stats_grid = tk.Frame(stats_card, bg="white")
+        stats_grid.pack(fill="x", padx=15, pady=(0, 15))
+        
+        stats = self.service.patient_stats(self.current_user)
+        for column, (key, caption, color) in enumerate([("total", "Total Appointments", "#0B8FA3"),
+                                                       ("confirmed", "Confirmed", "#10B981"),
+                                                       ("upcoming", "Upcoming", "#3B82F6"),
+                                                       ("lifetime_spend", "Total Spent", "#D32F2F")]):
+            value = f"₱{stats[key]:,.2f}" if key == "lifetime_spend" else str(stats[key])
+            tk.Label(stats_grid, text=value, 
+                     font=("Arial", 18, "bold"), 
+                     bg="white", fg=color).grid(row=0, column=column, padx=10, pady=5, sticky="w")
+            tk.Label(stats_grid, text=caption, 
+                    font=("Arial", 9), 
+                    bg="white", fg="#6B7280").grid(row=1, column=column, padx=10, sticky="w")
+        if stats.get('archived'):
+            tk.Label(stats_card, text=f"Includes {stats['archived']} archived appointment(s) not listed below.",
+                     font=("Arial", 8), bg="white", fg="#6B7280", anchor="w").pack(fill="x", padx=15, pady=(0, 10))
+        
+        
+        tk.Label(content_frame, text="Your Appointments", 
+                font=("Arial", 12, "bold"), 
+                bg="#E8E8E8", fg="#374151").pack(anchor="w", pady=(0, 10), padx=5)
+
+        list_frame = tk.Frame(content_frame, bg="#F5F7FA")
+        list_frame.pack(fill="both", expand=True)
+        booking_list = VirtualBookingList(
+            list_frame,
+            on_cancel=lambda b: self.cancel_booking(b, bookings_window),
+            on_print=lambda b: self.print_receipt(b['booking_id'], self.current_user,
+                                                  b['appointment_date'], b['services'], b['total_amount']),
+            load_more=lambda: next(chunks, None))
+        booking_list.add_bookings(first_chunk)
+
+    def cancel_booking(self, booking_data, bookings_window):
+        """Ask for a cancellation reason and record the cancellation of `booking_data`."""
+        def confirm_cancel():
+            reason = reason_entry.get().strip()
+            try:
+                self.service.cancel_booking(self.current_user, booking_data['booking_id'], reason)
+            except BookingError as e:
+                messagebox.showerror("Error", str(e), parent=cancel_window)
+                return
+            self.show_success_dialog("Success", "Booking cancelled successfully!")
+            cancel_window.destroy()
+            bookings_window.destroy()
+            self.view_bookings()
+
+        cancel_window = tk.Toplevel(bookings_window)
+        cancel_window.title("Cancel Booking")
+        cancel_window.geometry("400x200")
+        cancel_window.configure(bg="white")
+        cancel_window.resizable(False, False)
+
+        tk.Label(cancel_window, text="Cancel Booking", font=("Arial", 14, "bold"), 
+                bg="white", fg=ACCENT).pack(pady=15)
+        tk.Label(cancel_window, text="Reason for cancellation (optional):", font=("Arial", 10), 
+                bg="white").pack(anchor="w", padx=20, pady=(5, 2))
+        
+        reason_entry = tk.Entry(cancel_window, font=("Arial", 10), width=40, border=1, relief="solid")
+        reason_entry.pack(padx=20, pady=(0, 15), fill="x")
+
+        button_frame = tk.Frame(cancel_window, bg="white")
+        button_frame.pack(fill="x", padx=20, pady=10)
+        tk.Button(button_frame, text="Confirm Cancel", command=confirm_cancel, 
+                 bg="#FF6B6B", fg="white", font=("Arial", 10, "bold"), 
+                 border=0, relief="flat", cursor="hand2").pack(side="left", padx=5)
+        tk.Button(button_frame, text="Keep Booking", command=cancel_window.destroy, 
+                 bg="#999", fg="white", font=("Arial", 10, "bold"), 
+                 border=0, relief="flat", cursor="hand2").pack(side="left", padx=5)
 
     def logout(self):
         self.current_user = None
@@ -1928,5 +1818,10 @@ With an efficient appointment system and a welcoming environment, Nuvy Clinic ma
 
 if __name__ == "__main__":  
     root = tk.Tk()
+    if "--build-thumbnails" in sys.argv:
+        root.withdraw()
+        thumbnail_pack.build(thumbnail_specs([(root.winfo_screenwidth(), root.winfo_screenheight())]))
+        root.destroy()
+        sys.exit(0)
     app = ClinicBookingApp(root)
     root.mainloop()
@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clinic_capacity import SLOT_TIMES
+from clinic_service import services
+
+
+BOOKINGS_PER_PATIENT = 10
+CANCELLED_SHARE = 0.1
+PASSWORD_CHANGE_SHARE = 0.05
+RESETS_PER_BOOKING = 0.02
+
+
+def generate(data_dir, bookings, seed=42, now=None):
+    """Write a deterministic users/bookings/cancellations/forgot_password data set to `data_dir`.
+
+    The same `bookings` and `seed` always give byte-identical files, so runs on
+    different versions are compared on the same data. Returns record counts per file.
+    """
+    rng = random.Random(seed)
+    now = now or datetime(2025, 1, 1, 9, 0, 0)
+    patients = max(1, bookings // BOOKINGS_PER_PATIENT)
+    os.makedirs(data_dir, exist_ok=True)
+    counts = {"users": 0, "bookings": 0, "cancellations": 0, "forgot_password": 0}
+
+    with open(os.path.join(data_dir, "users.txt"), 'w', encoding='utf-8') as f:
+        for n in range(patients):
+            f.write(json.dumps({"username": _patient(n), "password": f"pw{rng.randrange(10 ** 6):06d}"}) + '\n')
+        for n in range(int(patients * PASSWORD_CHANGE_SHARE)):
+            f.write(json.dumps({"username": _patient(rng.randrange(patients)),
+                                "password": f"pw{rng.randrange(10 ** 6):06d}",
+                                "updated_at": _stamp(now - timedelta(minutes=n)),
+                                "type": "password_change"}) + '\n')
+        counts["users"] = patients + int(patients * PASSWORD_CHANGE_SHARE)
+
+    catalog = list(services.items())
+    with open(os.path.join(data_dir, "bookings.txt"), 'w', encoding='utf-8') as bookings_file, \
+            open(os.path.join(data_dir, "cancellations.txt"), 'w', encoding='utf-8') as cancellations_file:
+        for n in range(bookings):
+            created = now - timedelta(seconds=(bookings - n) * 60)
+            appointment = created.date() + timedelta(days=rng.randint(1, 120))
+            appointment_date = appointment.isoformat() if rng.random() < 0.7 else appointment.strftime('%m/%d/%y')
+            lines = []
+            for name, price in rng.sample(catalog, rng.randint(1, len(catalog))):
+                quantity = rng.randint(1, 3)
+                lines.append({"service_name": name, "quantity": quantity, "subtotal": float(price * quantity)})
+            booking = {
+                "booking_id": f"BK-{created.strftime('%Y%m%d%H%M%S')}000-{n % 10000:04d}-bench0",
+                "patient_name": _patient(rng.randrange(patients)),
+                "appointment_date": appointment_date,
+                "services": lines,
+                "total_amount": sum(line["subtotal"] for line in lines),
+                "created_at": _stamp(created),
+                "status": "confirmed",
+                "slot": rng.choice(SLOT_TIMES),
+            }
+            bookings_file.write(json.dumps(booking, ensure_ascii=False) + '\n')
+            counts["bookings"] += 1
+            if rng.random() < CANCELLED_SHARE:
+                cancellations_file.write(json.dumps({
+                    "cancellation_id": f"CAN-{created.strftime('%Y%m%d%H%M%S')}000-{n % 10000:04d}-bench0",
+                    "booking_id": booking["booking_id"],
+                    "patient_name": booking["patient_name"],
+                    "appointment_date": appointment_date,
+                    "services": [[line["service_name"], line["quantity"], line["subtotal"]] for line in lines],
+                    "total_amount": booking["total_amount"],
+                    "cancellation_date": _stamp(created + timedelta(hours=1)),
+                    "reason": rng.choice(["", "Schedule conflict", "Feeling better", "Moved away"]),
+                    "status": "cancelled",
+                }) + '\n')
+                counts["cancellations"] += 1
+
+    with open(os.path.join(data_dir, "forgot_password.txt"), 'w', encoding='utf-8') as f:
+        for n in range(int(bookings * RESETS_PER_BOOKING)):
+            f.write(json.dumps({"reset_id": f"RST-{n:08d}-bench0",
+                                "username": _patient(rng.randrange(patients)),
+                                "reset_date": _stamp(now - timedelta(hours=n)),
+                                "status": "completed"}) + '\n')
+            counts["forgot_password"] += 1
+    return counts
+
+
+def _patient(n):
+    return f"patient{n:07d}"
+
+
+def _stamp(moment):
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic booking_data directory.")
+    parser.add_argument("data_dir")
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    for name, count in generate(args.data_dir, args.bookings, args.seed).items():
+        print(f"{name:<16} {count:>9}")
@@ -0,0 +1,174 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+DEFAULT_SIZES = (10000, 100000)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(name, operation, args_list):
+    """Time `operation` over each argument tuple, then run it once more under tracemalloc for peak memory."""
+    latencies = []
+    started = time.perf_counter()
+    for args in args_list:
+        op_started = time.perf_counter()
+        operation(*args)
+        latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    operation(*args_list[0])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        "operation": name,
+        "ops": len(latencies),
+        "throughput_ops_s": len(latencies) / elapsed if elapsed else None,
+        "latency_ms": {
+            "mean": 1000 * sum(latencies) / len(latencies),
+            "p50": 1000 * percentile(latencies, 0.50),
+            "p90": 1000 * percentile(latencies, 0.90),
+            "p99": 1000 * percentile(latencies, 0.99),
+            "max": 1000 * max(latencies),
+        },
+        "peak_memory_kb": peak // 1024,
+    }
+
+
+def run_worker(bookings, ops, seed):
+    """Benchmark the storage operations against CLINIC_DATA_DIR (set by the parent process)."""
+    sys.path.insert(0, REPO_DIR)
+    import clinic_storage
+    import clinic_users
+
+    rng = random.Random(seed)
+    patients = max(1, bookings // 10)
+    patient = lambda: (f"patient{rng.randrange(patients):07d}",)
+    results = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results.append(measure("load_users", clinic_storage.load_users, [()] * 3))
+        directory = clinic_users.UserDirectory()
+        results.append(measure("build_user_index", directory.rebuild, [()]))
+        results.append(measure("lookup_user", directory.password_for, [patient() for _ in range(ops)]))
+        results.append(measure("load_booking_index", clinic_storage.rebuild_booking_index, [()]))
+        results.append(measure("save_booking", clinic_storage.save_booking, [
+            (patient()[0], "2025-06-02", [("Dental Cleaning", 1, 1000.0), ("Eye Check-up", 2, 2000.0)], 3000.0)
+            for _ in range(ops)]))
+        results.append(measure("load_bookings_for_user", clinic_storage.load_bookings_for_user,
+                               [patient() for _ in range(ops)]))
+        results.append(measure("load_cancellations_for_user", clinic_storage.load_cancellations_for_user,
+                               [patient() for _ in range(max(1, ops // 10))]))
+        results.append(measure("update_user_password", clinic_storage.update_user_password,
+                               [(patient()[0], f"new{n}") for n in range(ops)]))
+        clinic_storage.close_writers()
+    return results
+
+
+def run_size(bookings, ops, seed, keep_data=False):
+    sys.path.insert(0, BENCHMARK_DIR)
+    from generate_data import generate
+
+    data_dir = tempfile.mkdtemp(prefix=f"clinic-bench-{bookings}-")
+    try:
+        started = time.perf_counter()
+        counts = generate(data_dir, bookings, seed)
+        generated = time.perf_counter() - started
+        results_file = os.path.join(data_dir, "results.json")
+        env = dict(os.environ, CLINIC_DATA_DIR=data_dir, CLINIC_STORAGE="text")
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--worker", str(bookings),
+                        "--ops", str(ops), "--seed", str(seed), "--output", results_file], env=env, check=True)
+        with open(results_file, 'r', encoding='utf-8') as f:
+            operations = json.load(f)
+        return {"bookings": bookings, "records": counts, "generate_s": generated, "operations": operations}
+    finally:
+        if keep_data:
+            print(f"Kept data set in {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(run, baseline=None):
+    previous = {}
+    for size in (baseline or {}).get("sizes", []):
+        for operation in size["operations"]:
+            previous[(size["bookings"], operation["operation"])] = operation
+    for size in run["sizes"]:
+        print(f"\n{size['bookings']:,} bookings")
+        print(f"{'operation':<28} {'ops/s':>10} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'peak KB':>9}"
+              + ("  vs baseline p50" if previous else ""))
+        for operation in size["operations"]:
+            latency = operation["latency_ms"]
+            line = (f"{operation['operation']:<28} {operation['throughput_ops_s']:>10.1f} {latency['p50']:>9.2f} "
+                    f"{latency['p90']:>9.2f} {latency['p99']:>9.2f} {operation['peak_memory_kb']:>9}")
+            old = previous.get((size["bookings"], operation["operation"]))
+            if old:
+                line += f"  {latency['p50'] / old['latency_ms']['p50']:>6.2f}x"
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the booking_data storage operations.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="numbers of bookings to generate (e.g. 10000 100000 1000000)")
+    parser.add_argument("--ops", type=int, default=200, help="operations per timed benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare p50 latencies against")
+    parser.add_argument("--keep-data", action="store_true", help="keep the generated data sets")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(run_worker(args.worker, args.ops, args.seed), f, indent=2)
+        return
+
+    run = {
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ops": args.ops,
+        "seed": args.seed,
+        "sizes": [run_size(bookings, args.ops, args.seed, args.keep_data) for bookings in args.sizes],
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(run, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
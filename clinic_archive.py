@@ -0,0 +1,185 @@
+import argparse
+import gzip
+import json
+import os
+from datetime import date, timedelta
+import clinic_snapshot
+import clinic_stats
+import clinic_storage
+import clinic_trace
+from clinic_locks import file_lock
+
+
+ARCHIVE_AFTER_DAYS = 30
+ARCHIVE_COMPRESS = True
+
+
+def archive_booking_data(before=None, compress=ARCHIVE_COMPRESS):
+    """Move past records out of the hot booking_data files into monthly archive segments.
+
+    Bookings for appointments before `before` (default: ARCHIVE_AFTER_DAYS ago) go
+    to archive/bookings-YYYY-MM.jsonl[.gz] with their final status, together with
+    their cancellations; password reset records older than `before` go to
+    forgot_password-YYYY-MM segments; users.txt is compacted to one record per user.
+    Each hot file is rewritten atomically under its exclusive lock, and the booking
+    index, patient stats and snapshot are carried over to the new files.
+    Returns {log name: records archived}.
+    """
+    if clinic_storage.get_storage() is not None:
+        clinic_trace.warning("Archiving only applies to the text backend")
+        return {}
+    before = before or date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)
+    os.makedirs(clinic_storage.ARCHIVE_DIR, exist_ok=True)
+    archived = _archive_bookings(before, compress)
+    archived["forgot_password"] = _archive_forgot_password(before, compress)
+    if os.path.exists(clinic_storage.USERS_FILE):
+        clinic_storage.compact_users_file()
+    return archived
+
+
+def _archive_bookings(before, compress):
+    bookings_file, cancellations_file = clinic_storage.BOOKINGS_FILE, clinic_storage.CANCELLATIONS_FILE
+    if not os.path.exists(bookings_file):
+        return {"bookings": 0, "cancellations": 0}
+    with file_lock(bookings_file).exclusive(), file_lock(cancellations_file).exclusive():
+        clinic_stats.stats_table.catch_up()
+        columns = clinic_snapshot.load_booking_columns(update=False) if clinic_snapshot.SNAPSHOT_ENABLED else None
+
+        cancellations = list(_read_lines(cancellations_file))
+        status_of = {record.get('booking_id'): record.get('status') or "cancelled"
+                     for _line, record in cancellations if record is not None}
+
+        hot_bookings, archived_bookings = [], {}
+        hot_ids, archived_months = set(), {}
+        for line, record in _read_lines(bookings_file):
+            day = clinic_storage.parse_appointment_date(record.get('appointment_date')) if record else None
+            if day is None or day >= before:
+                hot_bookings.append(line)
+                if record is not None:
+                    hot_ids.add(clinic_storage.booking_record_id(record))
+                continue
+            booking_id = clinic_storage.booking_record_id(record)
+            record = dict(record, booking_id=booking_id)
+            if booking_id in status_of:
+                record['status'] = status_of[booking_id]
+            month = day.strftime('%Y-%m')
+            archived_months[booking_id] = month
+            archived_bookings.setdefault(month, []).append(record)
+
+        hot_cancellations, archived_cancellations = [], {}
+        for line, record in cancellations:
+            booking_id = record.get('booking_id') if record else None
+            day = clinic_storage.parse_appointment_date(record.get('appointment_date')) if record else None
+            if booking_id in archived_months:
+                month = archived_months[booking_id]
+            elif record is not None and booking_id not in hot_ids and day is not None and day < before:
+                month = day.strftime('%Y-%m')
+            else:
+                hot_cancellations.append(line)
+                continue
+            archived_cancellations.setdefault(month, []).append(record)
+
+        if not archived_bookings and not archived_cancellations:
+            return {"bookings": 0, "cancellations": 0}
+
+        _write_segments("bookings", archived_bookings, compress)
+        _write_segments("cancellations", archived_cancellations, compress)
+        _replace_lines(bookings_file, hot_bookings)
+        _replace_lines(cancellations_file, hot_cancellations)
+
+        bookings_size, cancellations_size = os.path.getsize(bookings_file), os.path.getsize(cancellations_file)
+        clinic_storage.rebuild_booking_index()
+        clinic_stats.stats_table.add_archived(record['patient_name'] for records in archived_bookings.values()
+                                              for record in records if record.get('patient_name') is not None)
+        clinic_stats.stats_table.rebase(bookings_size, cancellations_size)
+        if columns is not None:
+            clinic_snapshot.rebase(columns, bookings_size, cancellations_size, archived_months)
+    counts = {"bookings": sum(map(len, archived_bookings.values())),
+              "cancellations": sum(map(len, archived_cancellations.values()))}
+    clinic_trace.info("Archived %s bookings and %s cancellations with appointments before %s",
+                      counts['bookings'], counts['cancellations'], before.isoformat())
+    return counts
+
+
+def _archive_forgot_password(before, compress):
+    path = clinic_storage.FORGOT_PASSWORD_FILE
+    if not os.path.exists(path):
+        return 0
+    with file_lock(path).exclusive():
+        hot, archived = [], {}
+        for line, record in _read_lines(path):
+            day = clinic_storage.parse_appointment_date(str(record.get('reset_date'))[:10]) if record else None
+            if day is None or day >= before:
+                hot.append(line)
+            else:
+                archived.setdefault(day.strftime('%Y-%m'), []).append(record)
+        if not archived:
+            return 0
+        _write_segments("forgot_password", archived, compress)
+        _replace_lines(path, hot)
+    count = sum(map(len, archived.values()))
+    clinic_trace.info("Archived %s password reset records from before %s", count, before.isoformat())
+    return count
+
+
+def _read_lines(path):
+    """(raw line, parsed record or None) for every non-blank line of `path`.
+
+    An unterminated last line is kept unparsed but given its newline, so rewriting
+    the file never leaves the next append concatenated onto it.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = None
+            if line.endswith(b'\n'):
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    pass
+            else:
+                line += b'\n'
+            yield line, record if isinstance(record, dict) else None
+
+
+def _write_segments(name, records_by_month, compress):
+    """Append records to the archive segment of their month and fsync it."""
+    for month, records in sorted(records_by_month.items()):
+        path = os.path.join(clinic_storage.ARCHIVE_DIR, f"{name}-{month}.jsonl" + (".gz" if compress else ""))
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records).encode('utf-8')
+        with open(path, 'ab') as f:
+            if compress:
+                with gzip.GzipFile(fileobj=f, mode='ab') as compressed:
+                    compressed.write(data)
+            else:
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _replace_lines(path, lines):
+    """Atomically replace `path` with the given raw lines (temp file, fsync, rename)."""
+    temp_file = path + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive past appointments and old records from booking_data.")
+    parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive appointments that are more than this many days in the past")
+    parser.add_argument("--no-gzip", action="store_true", help="write plain .jsonl archive segments")
+    args = parser.parse_args(argv)
+    archived = archive_booking_data(date.today() - timedelta(days=args.days), compress=not args.no_gzip)
+    for name, count in archived.items():
+        print(f"{name:<16} {count:>8} archived")
+
+
+if __name__ == "__main__":
+    main()
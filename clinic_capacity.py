@@ -0,0 +1,409 @@
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+import clinic_snapshot
+import clinic_storage
+from clinic_storage import DATA_DIR, parse_appointment_date
+import clinic_trace
+from clinic_locks import file_lock
+
+
+CAPACITY_FILE = os.path.join(DATA_DIR, "capacity.json")
+COUNTERS_FILE = os.path.join(DATA_DIR, "capacity_counters.json")
+COUNTERS_SAVE_INTERVAL = 5.0
+
+SLOT_TIMES = ("09:00", "10:00", "11:00", "13:00", "14:00", "15:00", "16:00")
+SLOT_CAPACITY = {
+    "Dental Cleaning": 2,
+    "Physical Therapy": 2,
+    "Eye Check-up": 3
+}
+DAILY_CAPACITY = {}
+MAX_DAYS_AHEAD = 90
+
+
+def load_capacity_config(path=CAPACITY_FILE):
+    """Read slot times and per-service capacities from capacity.json, falling back to the defaults.
+
+    The file may set "slot_times", "slot_capacity" ({service: patients per slot}) and
+    "daily_capacity" ({service: patients per day}); missing keys keep their defaults.
+    """
+    config = {}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except (OSError, ValueError) as e:
+            clinic_trace.error("Error reading capacity config: %s", e)
+    return (tuple(config.get('slot_times', SLOT_TIMES)),
+            dict(SLOT_CAPACITY, **config.get('slot_capacity', {})),
+            dict(DAILY_CAPACITY, **config.get('daily_capacity', {})))
+
+
+class Reservation:
+    """Places held for one booking: a day, a slot index and its (service, quantity) items."""
+
+    def __init__(self, day, slot, items, booking_id=None):
+        self.day = day
+        self.slot = slot
+        self.items = items
+        self.booking_id = booking_id
+        self.conflict = False
+
+
+class CapacityEngine:
+    """Occupancy counters per service, date and time slot.
+
+    occupancy[(service, day)] is a list with one counter per slot plus the day total,
+    and first_free[(service, day)] caches the earliest slot that still has room, so
+    checking a slot or finding the next free one never rescans bookings. Like the
+    patient stats, the counters for today on are materialized in
+    capacity_counters.json together with the offsets of bookings.txt and
+    cancellations.txt they cover: nothing is read until the first call that needs
+    them, a restart only parses the lines appended since the last save, and every
+    call first folds in bookings and cancellations written by other processes.
+    reserve() holds places in memory; confirm() re-checks them against the files
+    under the bookings lock just before the booking is appended.
+    """
+
+    def __init__(self, slot_times=None, slot_capacity=None, daily_capacity=None, path=COUNTERS_FILE):
+        config = load_capacity_config()
+        self.slot_times = tuple(slot_times or config[0])
+        self.slot_capacity = dict(slot_capacity or config[1])
+        self.daily_capacity = dict(daily_capacity if daily_capacity is not None else config[2])
+        self.slot_numbers = {slot_time: n for n, slot_time in enumerate(self.slot_times)}
+        self.path = path
+        self.lock = threading.Lock()
+        self.occupancy = {}
+        self.first_free = {}
+        self.bookings = {}
+        self.pending = set()
+        self.bookings_size = 0
+        self.cancellations_size = 0
+        self.identities = None
+        self.loaded = False
+        self.dirty = False
+        self.last_save = 0.0
+        atexit.register(self._save_on_exit)
+
+    def catch_up(self):
+        """Fold the bookings and cancellations appended since the last call, by any process, into the counters."""
+        if clinic_storage.get_storage() is not None:
+            with self.lock:
+                if not self.loaded:
+                    self.loaded = True
+                    for booking in clinic_storage.iter_booking_records(date_from=date.today()):
+                        self._add_booking(booking)
+            return
+        bookings_file, cancellations_file = clinic_storage.BOOKINGS_FILE, clinic_storage.CANCELLATIONS_FILE
+        with file_lock(bookings_file).shared(), file_lock(cancellations_file).shared():
+            with self.lock:
+                identities = _file_identities()
+                shrunk = any(os.path.exists(path) and os.path.getsize(path) < size
+                             for path, size in ((bookings_file, self.bookings_size),
+                                                (cancellations_file, self.cancellations_size)))
+                if not self.loaded or shrunk or not clinic_storage.identities_match(self.identities, identities):
+                    self._load(identities)
+                elif identities != self.identities:
+                    self.identities = identities
+                    self.dirty = True
+                self.bookings_size = self._scan(bookings_file, self.bookings_size, self._add_booking)
+                self.cancellations_size = self._scan(cancellations_file, self.cancellations_size,
+                                                     self._add_cancellation)
+                if self.dirty and time.monotonic() - self.last_save >= COUNTERS_SAVE_INTERVAL:
+                    self._save()
+
+    def remaining(self, service, day, slot_time=None):
+        """Patients `service` can still take on `day`, in one slot if `slot_time` is given."""
+        day = _as_date(day)
+        self.catch_up()
+        with self.lock:
+            counters = self.occupancy.get((service, day))
+            day_left = self.day_capacity(service) - (counters[-1] if counters else 0)
+            if slot_time is None:
+                return max(0, day_left)
+            used = counters[self.slot_numbers[slot_time]] if counters else 0
+            return max(0, min(day_left, self.slot_capacity.get(service, 0) - used))
+
+    def availability(self, day):
+        """{service: {slot time: places left}} for one day."""
+        self.catch_up()
+        return {service: {slot_time: self.remaining(service, day, slot_time) for slot_time in self.slot_times}
+                for service in self.slot_capacity}
+
+    def next_free_slot(self, items, day, max_days=MAX_DAYS_AHEAD):
+        """Earliest (date, slot time) from `day` on with room for every (service, quantity) in `items`.
+
+        None if there is no such slot, including when a quantity exceeds max_quantity().
+        """
+        day = _as_date(day)
+        if any(quantity > self.max_quantity(service) for service, quantity in items):
+            return None
+        self.catch_up()
+        with self.lock:
+            for offset in range(max_days):
+                current = day + timedelta(days=offset)
+                slot = self._first_fit(items, current, 0)
+                if slot is not None:
+                    return current, self.slot_times[slot]
+        return None
+
+    def reserve(self, items, day, slot_time=None, booking_id=None):
+        """Hold places for `items` on `day` (in the first free slot unless `slot_time` is given).
+
+        `booking_id` is the ID the booking will be saved under, so the line is not
+        counted a second time when catch_up() reads it back. Returns a Reservation,
+        or None if the slot or day is full.
+        """
+        day = _as_date(day)
+        self.catch_up()
+        with self.lock:
+            if slot_time is None:
+                slot = self._first_fit(items, day, 0)
+            else:
+                slot = self.slot_numbers.get(slot_time)
+                if slot is None:
+                    raise ValueError(f"Unknown slot: {slot_time}")
+                if not self._fits(items, day, slot):
+                    slot = None
+            if slot is None:
+                return None
+            self._add(day, slot, items, 1)
+            if booking_id is not None:
+                self.bookings[booking_id] = (day, slot, items)
+                self.pending.add(booking_id)
+            return Reservation(day, slot, items, booking_id)
+
+    def confirm(self, reservation):
+        """Re-check a reservation against the files; False (and reservation.conflict) if it no longer fits.
+
+        Called with the bookings lock held just before the booking is appended, so
+        places another process booked since reserve() are seen.
+        """
+        self.catch_up()
+        with self.lock:
+            if reservation.booking_id not in self.bookings:
+                reservation.conflict = True
+                return False
+            for service, quantity in reservation.items:
+                counters = self.occupancy.get((service, reservation.day))
+                if (counters[reservation.slot] > self.slot_capacity.get(service, 0)
+                        or counters[-1] > self.day_capacity(service)):
+                    reservation.conflict = True
+                    return False
+        return True
+
+    def release(self, reservation):
+        """Give back the places of a reservation whose booking could not be saved."""
+        with self.lock:
+            if reservation.booking_id is not None:
+                if self.bookings.pop(reservation.booking_id, None) is None:
+                    return
+                self.pending.discard(reservation.booking_id)
+            self._add(reservation.day, reservation.slot, reservation.items, -1)
+
+    def release_booking(self, booking_id):
+        """Give back the places of a cancelled booking."""
+        with self.lock:
+            self._release(booking_id)
+
+    def slot_time(self, reservation):
+        return self.slot_times[reservation.slot]
+
+    def max_quantity(self, service):
+        """The most patients of `service` one booking can bring: it has to fit in a single slot."""
+        return min(self.slot_capacity.get(service, 0), self.day_capacity(service))
+
+    def day_capacity(self, service):
+        per_slot = self.slot_capacity.get(service, 0) * len(self.slot_times)
+        return min(per_slot, self.daily_capacity.get(service, per_slot))
+
+    def save(self):
+        """Write the counters to capacity_counters.json (temp file, then rename)."""
+        with self.lock:
+            self._save()
+
+    def _load(self, identities):
+        """Restore the counters saved for the current files, or start over from the snapshot (or offset 0).
+
+        Reservations still waiting for their booking to be written are kept.
+        """
+        held = {booking_id: self.bookings[booking_id] for booking_id in self.pending}
+        self.occupancy.clear()
+        self.first_free.clear()
+        self.bookings.clear()
+        for booking_id, (day, slot, items) in held.items():
+            self._count(booking_id, day, slot, items)
+        self.bookings_size = self.cancellations_size = 0
+        self.identities = identities
+        self.loaded = True
+        today = date.today()
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if (clinic_storage.identities_match(data.get('identities'), identities)
+                        and clinic_storage.is_line_boundary(clinic_storage.BOOKINGS_FILE, data['bookings_size'])
+                        and clinic_storage.is_line_boundary(clinic_storage.CANCELLATIONS_FILE,
+                                                            data['cancellations_size'])):
+                    for booking_id, (day, slot, items) in data['bookings'].items():
+                        day = date.fromisoformat(day)
+                        if day >= today:
+                            self._count(booking_id, day, slot, [tuple(item) for item in items])
+                    self.bookings_size = data['bookings_size']
+                    self.cancellations_size = data['cancellations_size']
+                    return
+                clinic_trace.warning("Capacity counters are stale, rebuilding")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                clinic_trace.error("Error loading capacity counters (%s), rebuilding", e)
+        self.dirty = True
+        if clinic_snapshot.SNAPSHOT_ENABLED:
+            columns = clinic_snapshot.load_booking_columns()
+            for booking in columns.iter_bookings(date_from=today):
+                self._add_booking(booking)
+            self.bookings_size, self.cancellations_size = columns.bookings_size, columns.cancellations_size
+
+    def _save(self):
+        data = {
+            "identities": [list(identity) if identity else None for identity in self.identities or (None, None)],
+            "bookings_size": self.bookings_size,
+            "cancellations_size": self.cancellations_size,
+            "bookings": {booking_id: [day.isoformat(), slot, items]
+                         for booking_id, (day, slot, items) in self.bookings.items()
+                         if booking_id not in self.pending},
+        }
+        temp_file = self.path + ".tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.path)
+            self.dirty = False
+            self.last_save = time.monotonic()
+        except OSError as e:
+            clinic_trace.error("Error saving capacity counters: %s", e)
+
+    def _save_on_exit(self):
+        if self.loaded and self.dirty and clinic_storage.get_storage() is None:
+            self.save()
+
+    def _scan(self, path, start, apply):
+        if not os.path.exists(path):
+            return start
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            offset = start
+            for line in f:
+                if offset + len(line) > size or not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    apply(record)
+        return offset
+
+    def _add_booking(self, booking):
+        booking_id = clinic_storage.booking_record_id(booking)
+        if booking_id in self.bookings:
+            self.pending.discard(booking_id)
+            return
+        if (booking.get('status') or "confirmed") != "confirmed":
+            return
+        day = parse_appointment_date(booking.get('appointment_date'))
+        items = _booking_items(booking)
+        if day is None or day < date.today() or not items:
+            return
+        slot = self.slot_numbers.get(booking.get('slot'))
+        if slot is None:
+            slot = self._first_fit(items, day, 0)
+        if slot is None:
+            slot = 0
+        self._count(booking_id, day, slot, items)
+        self.dirty = True
+
+    def _add_cancellation(self, cancellation):
+        if cancellation.get('booking_id') in self.bookings:
+            self._release(cancellation['booking_id'])
+            self.dirty = True
+
+    def _count(self, booking_id, day, slot, items):
+        self._add(day, slot, items, 1)
+        self.bookings[booking_id] = (day, slot, items)
+
+    def _release(self, booking_id):
+        entry = self.bookings.pop(booking_id, None)
+        if entry is not None:
+            self.pending.discard(booking_id)
+            day, slot, items = entry
+            self._add(day, slot, items, -1)
+
+    def _fits(self, items, day, slot):
+        for service, quantity in items:
+            counters = self.occupancy.get((service, day))
+            used_slot = counters[slot] if counters else 0
+            used_day = counters[-1] if counters else 0
+            if (used_slot + quantity > self.slot_capacity.get(service, 0)
+                    or used_day + quantity > self.day_capacity(service)):
+                return False
+        return True
+
+    def _first_fit(self, items, day, start):
+        start = max([start] + [self.first_free.get((service, day), 0) for service, _ in items])
+        for slot in range(start, len(self.slot_times)):
+            if self._fits(items, day, slot):
+                return slot
+        return None
+
+    def _add(self, day, slot, items, sign):
+        for service, quantity in items:
+            key = (service, day)
+            counters = self.occupancy.get(key)
+            if counters is None:
+                counters = self.occupancy[key] = [0] * (len(self.slot_times) + 1)
+            counters[slot] += sign * quantity
+            counters[-1] += sign * quantity
+            first = self.first_free.get(key, 0)
+            if sign < 0:
+                self.first_free[key] = min(first, slot)
+            elif slot == first:
+                capacity = self.slot_capacity.get(service, 0)
+                while first < len(self.slot_times) and counters[first] >= capacity:
+                    first += 1
+                self.first_free[key] = first
+
+
+def _booking_items(booking):
+    """(service, quantity) pairs of a booking record; empty if its services cannot be read."""
+    items = []
+    try:
+        for service in booking.get('services') or []:
+            if isinstance(service, dict):
+                items.append((str(service.get('service_name')), int(service.get('quantity', 1))))
+            elif isinstance(service, (list, tuple)) and len(service) >= 2:
+                items.append((str(service[0]), int(service[1])))
+    except (TypeError, ValueError) as e:
+        clinic_trace.warning("Skipping booking %s with unreadable services: %s", booking.get('booking_id'), e)
+        return []
+    return items
+
+
+def _file_identities():
+    return (clinic_storage.file_identity(clinic_storage.BOOKINGS_FILE),
+            clinic_storage.file_identity(clinic_storage.CANCELLATIONS_FILE))
+
+
+def _as_date(day):
+    if isinstance(day, date):
+        return day
+    parsed = parse_appointment_date(str(day))
+    if parsed is None:
+        raise ValueError(f"Invalid appointment date: {day}")
+    return parsed
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+import clinic_trace
+from clinic_locks import file_lock
+
+
+POLICIES = ("record", "grouped", "interval")
+COMMIT_WAIT_WARNING = 30.0
+
+
+class CommitRejected(Exception):
+    """The commit's check refused the line, so it was not written."""
+
+
+class Commit:
+    """One appended line. `wait()` blocks until it is on disk (or failed)."""
+
+    def __init__(self, data, on_written=None, check=None):
+        self.data = data
+        self.on_written = on_written
+        self.check = check
+        self.offset = None
+        self.end = None
+        self.error = None
+        self._durable = threading.Event()
+
+    def wait(self, timeout=None):
+        """Return True once the line has been fsynced, False if writing it failed (or `timeout` ran out first)."""
+        if not self._durable.wait(timeout):
+            return False
+        return self.error is None
+
+    @property
+    def done(self):
+        return self._durable.is_set()
+
+    @property
+    def durable(self):
+        return self._durable.is_set() and self.error is None
+
+    def _finish(self, error=None):
+        self.error = error
+        self._durable.set()
+
+
+class GroupCommitWriter:
+    """Appends lines to one file, sharing write() and fsync() calls between concurrent callers.
+
+    Durability policies:
+      "record"   - every append is written and fsynced in the caller's thread.
+      "grouped"  - appends arriving within `window` seconds are written with one
+                   write() and made durable with one fsync() on a flusher thread.
+      "interval" - appends are written promptly but fsynced at most every
+                   `interval` seconds; commits become durable at that fsync.
+
+    `check()`, if given, is called with the file's exclusive lock held just before
+    the line is written; if it returns False the line is dropped and its commit
+    fails with CommitRejected. `on_written(offset, end)` is called with the byte
+    range of each line as soon as it has been written, after the file lock is released. Every write holds the file's exclusive
+    FileLock, so appends from other processes never interleave with a batch; if
+    `lock` is given it is held as well, so other code in this process can exclude
+    appends while it rewrites the file.
+    """
+
+    def __init__(self, path, policy="grouped", window=0.002, interval=1.0, lock=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown fsync policy: {policy}")
+        self.path = path
+        self.policy = policy
+        self.window = window
+        self.interval = interval
+        self.lock = lock or threading.Lock()
+        self.batches = 0
+        self.syncs = 0
+        self._cond = threading.Condition()
+        self._queue = []
+        self._unsynced = []
+        self._last_sync = time.monotonic()
+        self._thread = None
+        self._closing = False
+
+    def append(self, data, on_written=None, check=None):
+        """Queue `data` (bytes ending in a newline) for appending and return its Commit."""
+        commit = Commit(data, on_written, check)
+        if self.policy == "record":
+            self._write([commit], sync=True)
+            return commit
+
+        with self._cond:
+            if self._closing:
+                raise ValueError(f"Writer for {self.path} is closed")
+            self._queue.append(commit)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"group-commit:{os.path.basename(self.path)}",
+                                                daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return commit
+
+    def close(self):
+        """Write and fsync everything still queued, then stop the flusher thread."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._unsynced and not self._closing:
+                    self._cond.wait()
+                if self._closing and not self._queue and not self._unsynced:
+                    return
+                gather = bool(self._queue) and not self._closing
+            if gather and self.window:
+                time.sleep(self.window)
+
+            with self._cond:
+                batch, self._queue = self._queue, []
+            if batch:
+                self._write(batch, sync=self.policy == "grouped")
+
+            if self.policy == "interval" and self._unsynced and not self._closing:
+                due = self._last_sync + self.interval
+                with self._cond:
+                    if not self._queue and not self._closing:
+                        self._cond.wait(max(0.0, due - time.monotonic()))
+                if time.monotonic() < due:
+                    continue
+            self._sync_pending()
+
+    def _write(self, batch, sync):
+        try:
+            with self.lock:
+                with file_lock(self.path).exclusive(), open(self.path, 'ab') as f:
+                    batch = self._checked(batch)
+                    if not batch:
+                        return
+                    f.seek(0, os.SEEK_END)
+                    offset = f.tell()
+                    f.write(b''.join(commit.data for commit in batch))
+                    f.flush()
+                    if sync:
+                        os.fsync(f.fileno())
+                for commit in batch:
+                    commit.offset = offset
+                    commit.end = offset = offset + len(commit.data)
+                    if commit.on_written is not None:
+                        try:
+                            commit.on_written(commit.offset, commit.end)
+                        except Exception as e:
+                            clinic_trace.error("Error in write callback for %s: %s", self.path, e)
+            self.batches += 1
+        except Exception as e:
+            for commit in batch:
+                commit._finish(e)
+            return
+
+        if sync:
+            self.syncs += 1
+            self._last_sync = time.monotonic()
+            for commit in batch:
+                commit._finish()
+        else:
+            self._unsynced.extend(batch)
+
+    def _checked(self, batch):
+        """The commits of `batch` whose check passes; the others are finished with their error."""
+        accepted = []
+        for commit in batch:
+            if commit.check is not None:
+                try:
+                    if not commit.check():
+                        commit._finish(CommitRejected(f"Append to {self.path} was rejected"))
+                        continue
+                except Exception as e:
+                    commit._finish(e)
+                    continue
+            accepted.append(commit)
+        return accepted
+
+    def _sync_pending(self):
+        if not self._unsynced:
+            return
+        pending, self._unsynced = self._unsynced, []
+        try:
+            with open(self.path, 'ab') as f:
+                os.fsync(f.fileno())
+        except Exception as e:
+            for commit in pending:
+                commit._finish(e)
+            return
+        self.syncs += 1
+        self._last_sync = time.monotonic()
+        for commit in pending:
+            commit._finish()
@@ -0,0 +1,70 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime
+
+
+COUNTER_LIMIT = 10000
+
+
+class RecordIdGenerator:
+    """Monotonic, sortable record IDs that stay unique across threads and processes.
+
+    IDs look like ``BK-20251020084409123-0007-3f9a1c``: the local timestamp down to
+    milliseconds, a per-millisecond counter, and a node component derived from the
+    host name and process id. The timestamp part keeps the old ``BK-%Y%m%d%H%M%S``
+    prefix, so new IDs sort after the second-resolution IDs already on disk.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._counter = 0
+        self._pid = None
+        self._node = None
+
+    def _node_id(self):
+        pid = os.getpid()
+        if pid != self._pid:
+            seed = f"{socket.gethostname()}:{pid}:{random.getrandbits(32)}"
+            self._node = f"{zlib.crc32(seed.encode('utf-8')) & 0xFFFFFF:06x}"
+            self._pid = pid
+            self._last_ms = 0
+            self._counter = 0
+        return self._node
+
+    def new_id(self, prefix):
+        with self._lock:
+            node = self._node_id()
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._counter = 0
+            else:
+                self._counter += 1
+                if self._counter >= COUNTER_LIMIT:
+                    self._last_ms += 1
+                    self._counter = 0
+            last_ms, counter = self._last_ms, self._counter
+
+        stamp = datetime.fromtimestamp(last_ms / 1000).strftime('%Y%m%d%H%M%S')
+        return f"{prefix}-{stamp}{last_ms % 1000:03d}-{counter:04d}-{node}"
+
+
+_generator = RecordIdGenerator()
+
+
+def new_record_id(prefix):
+    """Return a new unique ID such as BK-..., RCP-..., RST-... or CAN-..."""
+    return _generator.new_id(prefix)
+
+
+def legacy_record_id(prefix, record):
+    """Return a stable ID for an old record saved without one, derived from its contents."""
+    stamp = ''.join(ch for ch in str(record.get('created_at', '')) if ch.isdigit()) or "0" * 14
+    digest = zlib.crc32(json.dumps(record, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return f"{prefix}-{stamp}-L{digest:08x}"
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+LOCK_RETRY_DELAY = 0.005
+
+_locks = {}
+_locks_guard = threading.Lock()
+_held = threading.local()
+
+
+class LockStats:
+    """Contention counters for one lock file."""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self.max_hold_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_rate": self.contended / self.acquisitions if self.acquisitions else 0.0,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+            "hold_seconds": round(self.hold_seconds, 6),
+            "max_hold_seconds": round(self.max_hold_seconds, 6),
+        }
+
+
+class FileLock:
+    """Advisory reader/writer lock for one booking_data file, shared across threads and processes.
+
+    The lock is taken with flock() on a `<file>.lock` sidecar rather than the data
+    file itself, so it survives the data file being replaced by os.replace(). Each
+    acquisition opens its own descriptor, which makes flock() exclude other threads
+    of this process as well as other processes. A thread that already holds the
+    exclusive lock may re-enter either mode; a thread holding the shared lock may
+    re-enter shared. Without fcntl (Windows) both modes fall back to an exclusive
+    msvcrt lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.stats = {"shared": LockStats(), "exclusive": LockStats()}
+        self._stats_lock = threading.Lock()
+
+    def shared(self):
+        return self._hold("shared")
+
+    def exclusive(self):
+        return self._hold("exclusive")
+
+    @contextmanager
+    def _hold(self, mode):
+        held = getattr(_held, "modes", None)
+        if held is None:
+            held = _held.modes = {}
+        current = held.get(self.lock_path)
+        if current == "exclusive" or current == mode:
+            yield
+            return
+        if current == "shared":
+            raise RuntimeError(f"Cannot upgrade shared lock on {self.path} to exclusive")
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            started = time.perf_counter()
+            contended = not self._try_lock(fd, mode)
+            if contended:
+                self._lock(fd, mode)
+            acquired = time.perf_counter()
+            held[self.lock_path] = mode
+            try:
+                yield
+            finally:
+                del held[self.lock_path]
+                released = time.perf_counter()
+                self._record(mode, contended, acquired - started, released - acquired)
+        finally:
+            os.close(fd)
+
+    def _try_lock(self, fd, mode):
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, (fcntl.LOCK_SH if mode == "shared" else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            elif msvcrt is not None:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _lock(self, fd, mode):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if mode == "shared" else fcntl.LOCK_EX)
+            return
+        while not self._try_lock(fd, mode):
+            time.sleep(LOCK_RETRY_DELAY)
+
+    def _record(self, mode, contended, waited, held_for):
+        with self._stats_lock:
+            stats = self.stats[mode]
+            stats.acquisitions += 1
+            stats.contended += contended
+            stats.wait_seconds += waited
+            stats.max_wait_seconds = max(stats.max_wait_seconds, waited)
+            stats.hold_seconds += held_for
+            stats.max_hold_seconds = max(stats.max_hold_seconds, held_for)
+
+
+def file_lock(path):
+    """Return the FileLock for `path`; all callers share one instance so its stats add up."""
+    path = os.path.abspath(path)
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = FileLock(path)
+        return lock
+
+
+def lock_stats():
+    """Contention metrics per locked file and mode, e.g. {"bookings.txt": {"exclusive": {...}}}."""
+    with _locks_guard:
+        locks = list(_locks.values())
+    return {os.path.basename(lock.path): {mode: stats.as_dict() for mode, stats in lock.stats.items()}
+            for lock in locks}
+
+
+def reset_lock_stats():
+    with _locks_guard:
+        for lock in _locks.values():
+            lock.stats = {"shared": LockStats(), "exclusive": LockStats()}
@@ -0,0 +1,209 @@
+import argparse
+import csv
+import json
+import sys
+from array import array
+from datetime import date
+import clinic_snapshot
+import clinic_storage
+from clinic_capacity import CapacityEngine
+from clinic_snapshot import BookingColumns
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+def load_columns(date_from=None, date_to=None):
+    """Read the booking history (with cancellations applied) into BookingColumns.
+
+    With the text backend this reads the columnar snapshot plus the lines appended
+    since (see clinic_snapshot); otherwise the records are read from the backend.
+    """
+    if clinic_storage.get_storage() is None and clinic_snapshot.SNAPSHOT_ENABLED:
+        return clinic_snapshot.load_booking_columns().between(date_from, date_to, include_archived=True)
+    columns = BookingColumns()
+    columns.extend(clinic_storage.iter_booking_records(date_from=date_from, date_to=date_to,
+                                                        include_archived=True))
+    return columns
+
+
+def _group_sum(keys, weights=None, mask=None):
+    """{key: sum of weights (or row count)} over the rows where mask is true."""
+    if not len(keys):
+        return {}
+    if np is not None:
+        keys = np.frombuffer(keys, dtype=np.dtype(keys.typecode)).astype(np.int64) if isinstance(keys, array) else keys
+        weights = np.frombuffer(weights, dtype=np.float64) if isinstance(weights, array) else weights
+        if mask is not None:
+            keys = keys[mask]
+            weights = weights[mask] if weights is not None else None
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=weights, minlength=len(uniques))
+        return {int(key): (float(total) if weights is not None else int(total)) for key, total in zip(uniques, sums)}
+
+    sums = {}
+    if weights is None:
+        weights = (1 for _ in keys)
+    if mask is None:
+        for key, weight in zip(keys, weights):
+            sums[key] = sums.get(key, 0) + weight
+    else:
+        for key, weight, keep in zip(keys, weights, mask):
+            if keep:
+                sums[key] = sums.get(key, 0) + weight
+    return sums
+
+
+def _line_mask(columns, include_cancelled=False):
+    if include_cancelled:
+        return None
+    cancelled = columns.booking_cancelled
+    if np is not None:
+        return np.frombuffer(cancelled, dtype=np.uint8)[np.frombuffer(columns.booking, dtype=np.uint32)] == 0
+    return [not cancelled[row] for row in columns.booking]
+
+
+def _combined_keys(high, low, low_count):
+    if np is not None:
+        return (np.frombuffer(high, dtype=np.dtype(high.typecode)).astype(np.int64) * low_count
+                + np.frombuffer(low, dtype=np.dtype(low.typecode)))
+    return array('q', (h * low_count + l for h, l in zip(high, low)))
+
+
+def _month_keys(days):
+    if np is not None:
+        uniques, inverse = np.unique(np.frombuffer(days, dtype=np.dtype(days.typecode)), return_inverse=True)
+        months = np.array([date.fromordinal(int(day)).year * 12 + date.fromordinal(int(day)).month - 1
+                           for day in uniques], dtype=np.int64)
+        return months[inverse]
+    month_of = {}
+    keys = array('l')
+    for day in days:
+        month = month_of.get(day)
+        if month is None:
+            d = date.fromordinal(day)
+            month = month_of[day] = d.year * 12 + d.month - 1
+        keys.append(month)
+    return keys
+
+
+def revenue_by(columns, by="service"):
+    """Revenue of bookings that were not cancelled, grouped by service, day, month, patient or service-day."""
+    mask = _line_mask(columns)
+    if by == "service":
+        sums = _group_sum(columns.service, columns.subtotal, mask)
+        return {columns.services[code]: total for code, total in sums.items()}
+    if by == "patient":
+        sums = _group_sum(columns.patient, columns.subtotal, mask)
+        return {columns.patients[code]: total for code, total in sums.items()}
+    if by == "day":
+        sums = _group_sum(columns.day, columns.subtotal, mask)
+        return {date.fromordinal(day).isoformat(): total for day, total in sorted(sums.items())}
+    if by == "month":
+        sums = _group_sum(_month_keys(columns.day), columns.subtotal, mask)
+        return {f"{month // 12}-{month % 12 + 1:02d}": total for month, total in sorted(sums.items())}
+    if by == "service-day":
+        count = max(len(columns.services), 1)
+        sums = _group_sum(_combined_keys(columns.day, columns.service, count), columns.subtotal, mask)
+        return {(date.fromordinal(key // count).isoformat(), columns.services[key % count]): total
+                for key, total in sorted(sums.items())}
+    raise ValueError(f"Unknown grouping: {by}")
+
+
+def bookings_by_weekday(columns):
+    """Number of bookings (not cancelled) per weekday of the appointment."""
+    days = columns.booking_day
+    cancelled = columns.booking_cancelled
+    if np is not None:
+        weekdays = (np.frombuffer(days, dtype=np.dtype(days.typecode)) + 6) % 7
+        counts = _group_sum(weekdays, mask=np.frombuffer(cancelled, dtype=np.uint8) == 0)
+    else:
+        counts = _group_sum(array('B', ((day + 6) % 7 for day in days)), mask=[not c for c in cancelled])
+    return {WEEKDAYS[weekday]: counts.get(weekday, 0) for weekday in range(7)}
+
+
+def cancellation_rate(columns, by=None):
+    """Share of bookings that were cancelled, overall or per month or service."""
+    if by is None:
+        total = columns.bookings
+        return {"all": (sum(columns.booking_cancelled) / total) if total else 0.0}
+    if by == "month":
+        keys = _month_keys(columns.booking_day)
+        totals = _group_sum(keys)
+        cancelled = _group_sum(keys, mask=list(map(bool, columns.booking_cancelled)) if np is None
+                               else np.frombuffer(columns.booking_cancelled, dtype=np.uint8) == 1)
+        return {f"{month // 12}-{month % 12 + 1:02d}": cancelled.get(month, 0) / count
+                for month, count in sorted(totals.items())}
+    if by == "service":
+        cancelled_lines = array('B', (columns.booking_cancelled[row] for row in columns.booking))
+        totals = _group_sum(columns.service)
+        cancelled = _group_sum(columns.service, mask=list(map(bool, cancelled_lines)) if np is None
+                               else np.frombuffer(cancelled_lines, dtype=np.uint8) == 1)
+        return {columns.services[code]: cancelled.get(code, 0) / count for code, count in totals.items()}
+    raise ValueError(f"Unknown grouping: {by}")
+
+
+def utilization(columns, capacity=None):
+    """Booked places as a share of capacity per service, over the days that have bookings."""
+    capacity = capacity or CapacityEngine()
+    mask = _line_mask(columns)
+    units = _group_sum(columns.service, array('d', columns.quantity), mask)
+    open_days = len(set(columns.day))
+    result = {}
+    for code, booked in units.items():
+        name = columns.services[code]
+        available = capacity.day_capacity(name) * open_days
+        result[name] = booked / available if available else None
+    return result
+
+
+def _print_report(rows, output_format, percent=False):
+    if output_format == "json":
+        print(json.dumps({" / ".join(key) if isinstance(key, tuple) else key: value for key, value in rows.items()},
+                         indent=2, ensure_ascii=False))
+        return
+    if output_format == "csv":
+        writer = csv.writer(sys.stdout)
+        for key, value in rows.items():
+            writer.writerow(list(key) + [value] if isinstance(key, tuple) else [key, value])
+        return
+    for key, value in rows.items():
+        label = " / ".join(key) if isinstance(key, tuple) else str(key)
+        if value is None:
+            value = "-"
+        elif percent:
+            value = f"{value:.1%}"
+        elif isinstance(value, float):
+            value = f"{value:,.2f}"
+        print(f"{label:<40} {value:>14}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clinic-wide booking reports.")
+    parser.add_argument("report", choices=["revenue", "weekday", "cancellations", "utilization"])
+    parser.add_argument("--by", help="revenue: service, day, month, patient or service-day; "
+                                     "cancellations: month or service")
+    parser.add_argument("--from", dest="date_from", help="first appointment date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="last appointment date (YYYY-MM-DD)")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table")
+    args = parser.parse_args(argv)
+
+    columns = load_columns(args.date_from, args.date_to)
+    if args.report == "revenue":
+        rows = revenue_by(columns, args.by or "service")
+    elif args.report == "weekday":
+        rows = bookings_by_weekday(columns)
+    elif args.report == "cancellations":
+        rows = cancellation_rate(columns, args.by)
+    else:
+        rows = utilization(columns)
+    _print_report(rows, args.format, percent=args.report in ("cancellations", "utilization"))
+
+
+if __name__ == "__main__":
+    main()
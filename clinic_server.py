@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import clinic_trace
+from clinic_locks import lock_stats
+from clinic_service import BookingService, BookingError
+
+
+SERVER_HOST = os.environ.get("CLINIC_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("CLINIC_SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.environ.get("CLINIC_SERVER_WORKERS", "8"))
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+KEEP_ALIVE_TIMEOUT = 30
+
+AUTH_ERRORS = ("Invalid username or password", "Session expired, please log in again")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ClinicServer:
+    """HTTP/JSON front end for BookingService on asyncio.
+
+    The event loop only parses requests and writes responses; every service call
+    (and so all file I/O) runs on a thread pool. Appends to each booking_data file
+    go through that file's group-commit writer, so concurrent requests are written
+    one whole line at a time.
+
+    Routes (JSON in and out, `Authorization: Bearer <token>` where marked *):
+      POST /register                  {"username", "password"}
+      POST /login                     {"username", "password"} -> {"token"}
+      POST /logout *
+      GET  /services
+      GET  /bookings *
+      GET  /stats *                   the patient's booking aggregates
+      POST /bookings *                {"appointment_date", "services": {name: quantity}, "slot"}
+      GET  /availability/<date>       {service: {slot time: places left}}
+      POST /bookings/<id>/cancel *    {"reason"}
+      GET  /metrics/locks             file lock contention per booking_data file
+      GET  /metrics/spans             per-span counts and latencies (with CLINIC_TRACE=1)
+    """
+
+    def __init__(self, service=None, workers=SERVER_WORKERS):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clinic-server")
+        self.requests = 0
+
+    async def call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT):
+        if self.service is None:
+            self.service = await self.call(BookingService)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await self.dispatch(method, path, headers, body)
+                except HTTPError as e:
+                    status, payload = e.status, {"error": e.message}
+                except Exception as e:
+                    clinic_trace.error("Error handling %s %s: %s", method, path, e)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+                self.requests += 1
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            await self.write_response(writer, e.status, {"error": e.message}, False)
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise HTTPError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers")
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target.split('?', 1)[0], headers, body
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f"HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def dispatch(self, method, path, headers, body):
+        parts = [part for part in path.split('/') if part]
+        data = self.parse_body(body)
+
+        if parts == ["metrics", "locks"]:
+            self.require(method, "GET")
+            return HTTPStatus.OK, {"locks": lock_stats()}
+        if parts == ["metrics", "spans"]:
+            self.require(method, "GET")
+            return HTTPStatus.OK, {"tracing": clinic_trace.TRACE_ENABLED, "spans": clinic_trace.summary()}
+        if parts == ["services"]:
+            self.require(method, "GET")
+            return HTTPStatus.OK, {"services": self.service.services}
+        if len(parts) == 2 and parts[0] == "availability":
+            self.require(method, "GET")
+            availability = await self.call_service(self.service.availability, parts[1])
+            return HTTPStatus.OK, {"date": parts[1], "availability": availability}
+        if parts == ["register"]:
+            self.require(method, "POST")
+            username, password = self.text_field(data, 'username'), self.text_field(data, 'password')
+            await self.call_service(self.service.register, username, password)
+            return HTTPStatus.CREATED, {"username": username.strip()}
+        if parts == ["login"]:
+            self.require(method, "POST")
+            token = await self.call_service(self.service.open_session, self.text_field(data, 'username'),
+                                            self.text_field(data, 'password'))
+            return HTTPStatus.OK, {"token": token}
+
+        token = headers.get('authorization', '').partition(' ')[2].strip()
+        if parts == ["logout"]:
+            self.require(method, "POST")
+            await self.call(self.service.close_session, token)
+            return HTTPStatus.OK, {}
+        if parts == ["stats"]:
+            self.require(method, "GET")
+            patient_name = await self.call_service(self.service.session_user, token)
+            return HTTPStatus.OK, {"stats": await self.call(self.service.patient_stats, patient_name)}
+        if parts and parts[0] == "bookings":
+            patient_name = await self.call_service(self.service.session_user, token)
+            if len(parts) == 1 and method == "GET":
+                bookings = await self.call(self.service.bookings_for, patient_name)
+                return HTTPStatus.OK, {"bookings": bookings}
+            if len(parts) == 1:
+                self.require(method, "POST")
+                quantities = data.get('services')
+                if not isinstance(quantities, dict):
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "services must map service names to quantities")
+                booking = await self.call_service(self.service.book, patient_name,
+                                                  self.text_field(data, 'appointment_date'), quantities, True,
+                                                  self.text_field(data, 'slot', None))
+                return HTTPStatus.CREATED, {"booking": booking}
+            if len(parts) == 3 and parts[2] == "cancel":
+                self.require(method, "POST")
+                cancellation = await self.call_service(self.service.cancel_booking, patient_name,
+                                                       parts[1], self.text_field(data, 'reason'))
+                return HTTPStatus.OK, {"cancellation": cancellation}
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+    async def call_service(self, func, *args):
+        try:
+            return await self.call(func, *args)
+        except BookingError as e:
+            status = HTTPStatus.UNAUTHORIZED if str(e) in AUTH_ERRORS else HTTPStatus.BAD_REQUEST
+            raise HTTPError(status, str(e))
+
+    @staticmethod
+    def parse_body(body):
+        if not body:
+            return {}
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+        return data
+
+    @staticmethod
+    def text_field(data, name, default=''):
+        value = data.get(name)
+        if value is None:
+            return default
+        if not isinstance(value, str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be a string")
+        return value
+
+    @staticmethod
+    def require(method, expected):
+        if method != expected:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use {expected} for this route")
+
+
+async def serve(host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS):
+    clinic_server = ClinicServer(workers=workers)
+    server = await clinic_server.start(host, port)
+    clinic_trace.info("Nuvy Clinic API listening on http://%s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the clinic booking API over HTTP/JSON.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,252 @@
+import secrets
+import threading
+from datetime import date
+from clinic_capacity import CapacityEngine
+from clinic_ids import new_record_id
+import clinic_stats
+import clinic_storage
+import clinic_trace
+import clinic_users
+
+
+services = {
+    "Dental Cleaning": 1000,
+    "Physical Therapy": 1500,
+    "Eye Check-up": 1000
+}
+
+MAX_QUANTITY = 10
+
+
+class BookingError(Exception):
+    """A request the booking service refused. The message can be shown to the user as is."""
+
+
+class ClinicState:
+    """Thread-safe in-memory state shared by every session of one BookingService.
+
+    Holds the user directory (resolved on demand through the on-disk username index,
+    so accounts created on another terminal are picked up), the open sessions, and
+    one lock per patient so concurrent bookings and cancellations for a patient are
+    serialized. Bookings themselves are not cached; they are read through the
+    storage index.
+    """
+
+    def __init__(self, users=None):
+        self.lock = threading.RLock()
+        self.users = users if users is not None else clinic_users.user_directory
+        self.sessions = {}
+        self._patient_locks = {}
+
+    def load(self):
+        clinic_storage.load_booking_index()
+
+    def password_for(self, username):
+        return self.users.password_for(username)
+
+    def set_password(self, username, password):
+        self.users.remember(username, password)
+
+    def patient_lock(self, patient_name):
+        with self.lock:
+            lock = self._patient_locks.get(patient_name)
+            if lock is None:
+                lock = self._patient_locks[patient_name] = threading.Lock()
+            return lock
+
+
+class BookingService:
+    """Headless booking engine: accounts, pricing, bookings and cancellations.
+
+    Has no tkinter dependency, so the same instance can be driven by the Tk app,
+    several front-desk terminals or a load test. All methods are thread-safe and
+    raise BookingError for requests that should be reported back to the user.
+    """
+
+    def __init__(self, catalog=None, capacity=None):
+        self.services = dict(catalog or services)
+        self.state = ClinicState()
+        self.state.load()
+        self.capacity = capacity or CapacityEngine()
+
+    # Accounts
+
+    @clinic_trace.traced("service.register")
+    def register(self, username, password):
+        username, password = (username or "").strip(), (password or "").strip()
+        if not username or not password:
+            raise BookingError("Please enter username and password")
+        with self.state.lock:
+            if self.state.password_for(username) is not None:
+                raise BookingError("Username already exists")
+            if not clinic_storage.save_user(username, password):
+                raise BookingError("Failed to register. Please try again.")
+            self.state.set_password(username, password)
+
+    @clinic_trace.traced("service.authenticate")
+    def authenticate(self, username, password):
+        """Return True if `password` is the current password of `username`."""
+        stored = self.state.password_for(username)
+        return stored is not None and secrets.compare_digest(stored, password)
+
+    def user_exists(self, username):
+        return self.state.password_for(username) is not None
+
+    def reset_password(self, username, new_password):
+        if not new_password:
+            raise BookingError("Please enter a new password")
+        if not self.user_exists(username):
+            raise BookingError("Username not found")
+        try:
+            clinic_storage.update_user_password(username, new_password)
+        except Exception as e:
+            raise BookingError(f"Failed to reset password: {e}")
+        self.state.set_password(username, new_password)
+        clinic_storage.save_forgot_password_record(username, new_password)
+
+    # Sessions
+
+    def open_session(self, username, password):
+        """Log `username` in and return a session token for the session_* calls."""
+        if not self.authenticate(username, password):
+            raise BookingError("Invalid username or password")
+        token = secrets.token_urlsafe(24)
+        with self.state.lock:
+            self.state.sessions[token] = username
+        return token
+
+    def session_user(self, token):
+        with self.state.lock:
+            username = self.state.sessions.get(token)
+        if username is None:
+            raise BookingError("Session expired, please log in again")
+        return username
+
+    def close_session(self, token):
+        with self.state.lock:
+            self.state.sessions.pop(token, None)
+
+    # Bookings
+
+    def quote(self, quantities):
+        """Price a cart of {service name: quantity}; returns (selected services, total).
+
+        Selected services are (name, quantity, subtotal) tuples in catalog order.
+        """
+        for name, qty in quantities.items():
+            if name not in self.services:
+                raise BookingError(f"Unknown service: {name}")
+            limit = self.max_quantity(name)
+            if not isinstance(qty, int) or qty < 0 or qty > limit:
+                raise BookingError(f"Quantity for {name} must be between 0 and {limit}: "
+                                   f"one appointment slot takes at most {limit} patients")
+        selected_services = []
+        total = 0
+        for name, price in self.services.items():
+            qty = quantities.get(name, 0)
+            if qty > 0:
+                subtotal = price * qty
+                total += subtotal
+                selected_services.append((name, qty, subtotal))
+        return selected_services, total
+
+    def max_quantity(self, name):
+        """The largest quantity of service `name` one booking can take (MAX_QUANTITY or one slot's capacity)."""
+        return min(MAX_QUANTITY, self.capacity.max_quantity(name))
+
+    @clinic_trace.traced("service.book")
+    def book(self, patient_name, appointment_date, quantities, durable=True, slot=None):
+        """Validate and save a booking; returns the saved booking record.
+
+        The booking takes `slot` (a time from the capacity engine's slot_times) or,
+        if no slot is given, the first slot that day with room for every service.
+        """
+        selected_services, total = self.quote(quantities)
+        if total == 0:
+            raise BookingError("Please select at least one service to book.")
+        if not appointment_date:
+            raise BookingError("Please pick an appointment date before confirming.")
+        day = clinic_storage.parse_appointment_date(appointment_date)
+        if day is None:
+            raise BookingError(f"Invalid appointment date: {appointment_date}")
+        if day < date.today():
+            raise BookingError("Please pick an appointment date that is not in the past.")
+        if slot is not None and slot not in self.capacity.slot_numbers:
+            raise BookingError(f"Unknown appointment time: {slot}")
+        if not self.user_exists(patient_name):
+            raise BookingError("Username not found")
+
+        items = [(name, qty) for name, qty, subtotal in selected_services]
+        reservation = self.capacity.reserve(items, day, slot, new_record_id("BK"))
+        if reservation is None:
+            raise BookingError(self._fully_booked_message(items, day, slot))
+        with self.state.patient_lock(patient_name):
+            booking = clinic_storage.save_booking(patient_name, appointment_date, selected_services, total,
+                                                  durable=durable, slot=self.capacity.slot_time(reservation),
+                                                  booking_id=reservation.booking_id,
+                                                  check=lambda: self.capacity.confirm(reservation))
+        if not booking:
+            self.capacity.release(reservation)
+            if reservation.conflict:
+                raise BookingError(self._fully_booked_message(items, day, slot))
+            raise BookingError("Failed to save booking. Please try again.")
+        self._update_stats()
+        return booking
+
+    def availability(self, appointment_date):
+        """{service: {slot time: places left}} for one appointment date."""
+        day = clinic_storage.parse_appointment_date(appointment_date)
+        if day is None:
+            raise BookingError(f"Invalid appointment date: {appointment_date}")
+        return self.capacity.availability(day)
+
+    def next_free_slot(self, quantities, appointment_date):
+        """Earliest (date, slot time) on or after `appointment_date` with room for the cart, or None."""
+        selected_services, total = self.quote(quantities)
+        day = clinic_storage.parse_appointment_date(appointment_date)
+        if day is None:
+            raise BookingError(f"Invalid appointment date: {appointment_date}")
+        return self.capacity.next_free_slot([(name, qty) for name, qty, subtotal in selected_services], day)
+
+    def _fully_booked_message(self, items, day, slot):
+        when = f"{day.isoformat()} at {slot}" if slot else day.isoformat()
+        message = f"Sorry, we are fully booked on {when} for the selected services."
+        next_free = self.capacity.next_free_slot(items, day)
+        if next_free is not None:
+            message += f"\n\nNext available: {next_free[0].isoformat()} at {next_free[1]}"
+        return message
+
+    def bookings_for(self, patient_name):
+        return clinic_storage.load_bookings_for_user(patient_name)
+
+    def bookings_in_chunks(self, patient_name, chunk_size=clinic_storage.BOOKINGS_CHUNK_SIZE):
+        return clinic_storage.load_bookings_for_user_in_chunks(patient_name, chunk_size)
+
+    @clinic_trace.traced("service.cancel_booking")
+    def cancel_booking(self, patient_name, booking_id, reason=""):
+        """Cancel one of the patient's bookings; returns the cancellation record."""
+        with self.state.patient_lock(patient_name):
+            booking = next((b for b in self.bookings_for(patient_name) if b.get('booking_id') == booking_id), None)
+            if booking is None:
+                raise BookingError("Booking not found")
+            if booking['status'] == "cancelled":
+                raise BookingError("Booking is already cancelled")
+            cancellation = clinic_storage.save_cancellation_record(
+                patient_name, booking_id, booking['appointment_date'], booking['services'],
+                booking['total_amount'], reason)
+        if not cancellation:
+            raise BookingError("Failed to cancel booking. Please try again.")
+        self.capacity.release_booking(booking_id)
+        self._update_stats()
+        return cancellation
+
+    def patient_stats(self, patient_name):
+        """Precomputed booking aggregates for one patient (see clinic_stats.patient_stats)."""
+        return clinic_stats.patient_stats(patient_name)
+
+    def _update_stats(self):
+        if clinic_storage.get_storage() is None:
+            clinic_stats.stats_table.catch_up()
+
+    def new_receipt_number(self):
+        return new_record_id("RCP")
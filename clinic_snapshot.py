@@ -0,0 +1,450 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import date
+import clinic_storage
+import clinic_trace
+from clinic_locks import file_lock
+
+
+SNAPSHOT_FILE = os.path.join(clinic_storage.DATA_DIR, "bookings.snap")
+SNAPSHOT_ENABLED = os.environ.get("CLINIC_SNAPSHOT", "on") != "off"
+SNAPSHOT_MIN_TAIL_BYTES = 256 * 1024
+SNAPSHOT_MAGIC = b"CLINSNAP"
+SNAPSHOT_VERSION = 2
+
+LINE_COLUMNS = (("day", 'i'), ("service", 'H'), ("quantity", 'H'), ("subtotal", 'd'),
+                ("patient", 'I'), ("booking", 'I'))
+BOOKING_COLUMNS = (("booking_day", 'i'), ("booking_patient", 'I'), ("booking_total", 'd'),
+                   ("booking_status", 'H'), ("booking_slot", 'H'), ("booking_cancelled", 'B'),
+                   ("booking_archived", 'B'))
+
+
+class BookingColumns:
+    """Booking history as parallel columns, one row per service line of a booking.
+
+    Line columns: day (date ordinal), service (code into `services`), quantity,
+    subtotal, patient (code into `patients`), booking (row in the booking columns).
+    Booking columns: booking_day, booking_patient, booking_total, booking_status
+    (code into `statuses`), booking_slot (code into `slots`), booking_cancelled,
+    booking_archived (the booking lives in an archive segment), plus booking_ids.
+    bookings_size and cancellations_size are the byte offsets in bookings.txt and
+    cancellations.txt the columns cover.
+    """
+
+    def __init__(self):
+        self.services = []
+        self.patients = []
+        self.statuses = []
+        self.slots = []
+        self._service_codes = {}
+        self._patient_codes = {}
+        self._status_codes = {}
+        self._slot_codes = {}
+        self.day = array('i')
+        self.service = array('H')
+        self.quantity = array('H')
+        self.subtotal = array('d')
+        self.patient = array('I')
+        self.booking = array('I')
+        self.booking_day = array('i')
+        self.booking_patient = array('I')
+        self.booking_total = array('d')
+        self.booking_status = array('H')
+        self.booking_slot = array('H')
+        self.booking_cancelled = array('B')
+        self.booking_archived = array('B')
+        self.booking_ids = []
+        self._booking_rows = None
+        self.bookings_size = 0
+        self.cancellations_size = 0
+        self.identities = None
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def bookings(self):
+        return len(self.booking_day)
+
+    @staticmethod
+    def _code(codes, names, name):
+        code = codes.get(name)
+        if code is None:
+            code = codes[name] = len(names)
+            names.append(name)
+        return code
+
+    def _set_tables(self, services, patients, statuses, slots):
+        self.services, self.patients, self.statuses, self.slots = services, patients, statuses, slots
+        self._service_codes = {name: code for code, name in enumerate(services)}
+        self._patient_codes = {name: code for code, name in enumerate(patients)}
+        self._status_codes = {name: code for code, name in enumerate(statuses)}
+        self._slot_codes = {name: code for code, name in enumerate(slots)}
+
+    def extend(self, bookings, archived=False):
+        """Append booking records (raw from bookings.txt or as iter_booking_records returns them)."""
+        day_cache = {}
+        code = self._code
+        parse = clinic_storage.parse_appointment_date
+        service_codes, patient_codes = self._service_codes, self._patient_codes
+        status_codes, slot_codes = self._status_codes, self._slot_codes
+        add_day, add_service, add_quantity = self.day.append, self.service.append, self.quantity.append
+        add_subtotal, add_patient, add_line_booking = self.subtotal.append, self.patient.append, self.booking.append
+        add_booking_day, add_booking_patient = self.booking_day.append, self.booking_patient.append
+        add_booking_total, add_booking_status = self.booking_total.append, self.booking_status.append
+        add_booking_slot, add_booking_cancelled = self.booking_slot.append, self.booking_cancelled.append
+        add_booking_archived = self.booking_archived.append
+        add_booking_id = self.booking_ids.append
+
+        row = len(self.booking_day)
+        for booking in bookings:
+            appointment_date = booking.get('appointment_date')
+            day = day_cache.get(appointment_date)
+            if day is None:
+                parsed = parse(appointment_date)
+                day = day_cache[appointment_date] = parsed.toordinal() if parsed else 0
+            if not day:
+                continue
+            lines = []
+            for service in booking.get('services') or ():
+                if isinstance(service, dict):
+                    lines.append((str(service.get('service_name', 'Unknown Service')),
+                                  int(service.get('quantity', 1)), float(service.get('subtotal', 0))))
+                elif isinstance(service, (list, tuple)) and len(service) >= 3:
+                    lines.append((str(service[0]), int(service[1]), float(service[2])))
+
+            patient_name = booking.get('patient_name')
+            patient = patient_codes.get(patient_name)
+            if patient is None:
+                patient = code(patient_codes, self.patients, patient_name)
+            status = booking.get('status') or "confirmed"
+            status_code = status_codes.get(status)
+            if status_code is None:
+                status_code = code(status_codes, self.statuses, status)
+            slot = slot_codes.get(booking.get('slot'))
+            if slot is None:
+                slot = code(slot_codes, self.slots, booking.get('slot'))
+            booking_id = clinic_storage.booking_record_id(booking)
+            add_booking_day(day)
+            add_booking_patient(patient)
+            add_booking_total(float(booking.get('total_amount') or 0))
+            add_booking_status(status_code)
+            add_booking_slot(slot)
+            add_booking_cancelled(status == "cancelled")
+            add_booking_archived(archived)
+            add_booking_id(booking_id)
+            if self._booking_rows is not None:
+                self._booking_rows[booking_id] = row
+            for name, quantity, subtotal in lines:
+                service = service_codes.get(name)
+                if service is None:
+                    service = code(service_codes, self.services, name)
+                add_day(day)
+                add_service(service)
+                add_quantity(quantity)
+                add_subtotal(subtotal)
+                add_patient(patient)
+                add_line_booking(row)
+            row += 1
+
+    def set_status(self, booking_id, status):
+        """Apply a cancellation record's status to the booking it refers to; False if it is not in the columns."""
+        if self._booking_rows is None:
+            self._booking_rows = {booking_id: row for row, booking_id in enumerate(self.booking_ids)}
+        row = self._booking_rows.get(booking_id)
+        if row is None:
+            return False
+        self.booking_status[row] = self._code(self._status_codes, self.statuses, status)
+        self.booking_cancelled[row] = status == "cancelled"
+        return True
+
+    def mark_archived(self, booking_ids):
+        """Flag the bookings a compaction just moved to the archive."""
+        if self._booking_rows is None:
+            self._booking_rows = {booking_id: row for row, booking_id in enumerate(self.booking_ids)}
+        for booking_id in booking_ids:
+            row = self._booking_rows.get(booking_id)
+            if row is not None:
+                self.booking_archived[row] = 1
+
+    def between(self, date_from=None, date_to=None, include_archived=False):
+        """A copy holding only the bookings with appointment dates in [date_from, date_to] (dates or ISO strings).
+
+        Archived bookings are left out unless include_archived=True, as in the clinic_storage loaders.
+        """
+        if date_from is None and date_to is None and (include_archived or not any(self.booking_archived)):
+            return self
+        first, last = _ordinal(date_from, -1), _ordinal(date_to, sys.maxsize)
+        selected = BookingColumns()
+        selected._set_tables(self.services, self.patients, self.statuses, self.slots)
+        new_rows = {}
+        archived = self.booking_archived
+        for row, day in enumerate(self.booking_day):
+            if first <= day <= last and (include_archived or not archived[row]):
+                new_rows[row] = len(new_rows)
+                for name, _typecode in BOOKING_COLUMNS:
+                    getattr(selected, name).append(getattr(self, name)[row])
+                selected.booking_ids.append(self.booking_ids[row])
+        for line, row in enumerate(self.booking):
+            new_row = new_rows.get(row)
+            if new_row is not None:
+                for name, _typecode in LINE_COLUMNS[:-1]:
+                    getattr(selected, name).append(getattr(self, name)[line])
+                selected.booking.append(new_row)
+        selected.bookings_size, selected.cancellations_size = self.bookings_size, self.cancellations_size
+        selected.identities = self.identities
+        return selected
+
+    def iter_bookings(self, date_from=None, include_archived=False):
+        """Yield the bookings (from `date_from` on) as dicts shaped like iter_booking_records returns them.
+
+        Archived bookings are left out unless include_archived=True.
+        """
+        first = _ordinal(date_from, -1)
+        line, lines = 0, len(self.booking)
+        for row, day in enumerate(self.booking_day):
+            services = []
+            while line < lines and self.booking[line] == row:
+                services.append((self.services[self.service[line]], self.quantity[line], self.subtotal[line]))
+                line += 1
+            if day < first or (self.booking_archived[row] and not include_archived):
+                continue
+            booking = {
+                "booking_id": self.booking_ids[row],
+                "patient_name": self.patients[self.booking_patient[row]],
+                "appointment_date": date.fromordinal(day).isoformat(),
+                "services": services,
+                "total_amount": self.booking_total[row],
+                "status": self.statuses[self.booking_status[row]],
+            }
+            slot = self.slots[self.booking_slot[row]]
+            if slot is not None:
+                booking["slot"] = slot
+            yield booking
+
+
+def _ordinal(day, default):
+    if day is None:
+        return default
+    if not isinstance(day, date):
+        parsed = clinic_storage.parse_appointment_date(str(day)[:10])
+        if parsed is None:
+            raise ValueError(f"Invalid date: {day}")
+        day = parsed
+    return day.toordinal()
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot(columns, path=SNAPSHOT_FILE):
+    """Write `columns` to the snapshot file (temp file, then rename).
+
+    Layout: the magic bytes, a little-endian uint32 header length, a JSON header
+    (watermarks, the dictionary tables and where each column lives), then every
+    column as raw fixed-width values, each starting on an 8-byte boundary.
+    """
+    booking_ids = '\n'.join(columns.booking_ids).encode('utf-8')
+    blobs = [getattr(columns, name).tobytes() for name, _typecode in LINE_COLUMNS + BOOKING_COLUMNS]
+    blobs.append(booking_ids)
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "bookings_size": columns.bookings_size,
+        "cancellations_size": columns.cancellations_size,
+        "identities": [list(identity) if identity else None for identity in columns.identities or (None, None)],
+        "services": columns.services,
+        "patients": columns.patients,
+        "statuses": columns.statuses,
+        "slots": columns.slots,
+        "columns": {},
+    }
+    offset = 0
+    for (name, typecode), blob in zip(LINE_COLUMNS + BOOKING_COLUMNS + (("booking_ids", 'utf-8'),), blobs):
+        itemsize = getattr(columns, name).itemsize if typecode != 'utf-8' else 1
+        header["columns"][name] = [typecode, itemsize, offset, len(blob)]
+        offset = _aligned(offset + len(blob))
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _aligned(len(SNAPSHOT_MAGIC) + 4 + len(header_bytes))
+
+    temp_file = path + ".tmp"
+    with file_lock(path).exclusive():
+        with open(temp_file, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            for blob in blobs:
+                f.write(b'\0' * (data_start - f.tell()))
+                f.write(blob)
+                data_start = _aligned(f.tell())
+        os.replace(temp_file, path)
+
+
+def read_snapshot(path=SNAPSHOT_FILE):
+    """Map the snapshot file and return its BookingColumns, or None if it is missing or unusable.
+
+    Each column is copied out of the mapping with one bulk copy; nothing is parsed
+    per record.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with file_lock(path).shared(), open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < len(SNAPSHOT_MAGIC) + 4:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                if view[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                    return None
+                header_length = struct.unpack_from('<I', mapped, len(SNAPSHOT_MAGIC))[0]
+                header_start = len(SNAPSHOT_MAGIC) + 4
+                header = json.loads(bytes(view[header_start:header_start + header_length]))
+                if header.get('version') != SNAPSHOT_VERSION or header.get('byteorder') != sys.byteorder:
+                    return None
+                data_start = _aligned(header_start + header_length)
+
+                columns = BookingColumns()
+                for name, typecode in LINE_COLUMNS + BOOKING_COLUMNS:
+                    stored_typecode, itemsize, offset, length = header['columns'][name]
+                    column = getattr(columns, name)
+                    if stored_typecode != typecode or itemsize != column.itemsize:
+                        return None
+                    column.frombytes(view[data_start + offset:data_start + offset + length])
+                _typecode, _itemsize, offset, length = header['columns']['booking_ids']
+                if length:
+                    columns.booking_ids = str(view[data_start + offset:data_start + offset + length],
+                                              'utf-8').split('\n')
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        clinic_trace.error("Error reading booking snapshot: %s", e)
+        return None
+
+    if len(columns.booking_ids) != columns.bookings:
+        return None
+    columns._set_tables(header['services'], header['patients'], header['statuses'], header['slots'])
+    columns.bookings_size = header['bookings_size']
+    columns.cancellations_size = header['cancellations_size']
+    columns.identities = tuple(tuple(identity) if identity else None for identity in header.get('identities') or ())
+    return columns
+
+
+def _json_lines(path, start, end):
+    """Yield the records on the complete lines of `path` after byte `start`; end[0] is set past the last one."""
+    end[0] = start
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(start)
+        offset = start
+        for line in f:
+            if offset + len(line) > size or not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            end[0] = offset
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                clinic_trace.warning("Skipping unreadable record at byte %s of %s: %s",
+                                     offset - len(line), os.path.basename(path), e)
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def catch_up(columns):
+    """Fold the bookings and cancellations appended since the columns' watermarks into them.
+
+    Returns the number of bytes read. Both files are read under a shared lock on
+    bookings.txt, so every cancellation read refers to a booking that is already
+    in the columns.
+    """
+    start = columns.bookings_size + columns.cancellations_size
+    end = [0]
+    with file_lock(clinic_storage.BOOKINGS_FILE).shared():
+        columns.identities = _file_identities()
+        columns.extend(_json_lines(clinic_storage.BOOKINGS_FILE, columns.bookings_size, end))
+        columns.bookings_size = end[0]
+        with file_lock(clinic_storage.CANCELLATIONS_FILE).shared():
+            for record in _json_lines(clinic_storage.CANCELLATIONS_FILE, columns.cancellations_size, end):
+                if record.get('booking_id') is not None:
+                    columns.set_status(record['booking_id'], record.get('status') or "cancelled")
+            columns.cancellations_size = end[0]
+    return columns.bookings_size + columns.cancellations_size - start
+
+
+def load_booking_columns(update=True, path=SNAPSHOT_FILE):
+    """The whole booking history as BookingColumns: the snapshot plus the lines appended since it was written.
+
+    Falls back to a full scan (archive segments first, then the JSONL files) if there
+    is no snapshot or the files are no longer the ones it was taken from. With
+    update=True the snapshot is rewritten once the tail it had to parse reaches
+    SNAPSHOT_MIN_TAIL_BYTES.
+    """
+    columns = read_snapshot(path)
+    if columns is not None and not (
+            clinic_storage.identities_match(columns.identities, _file_identities())
+            and clinic_storage.is_line_boundary(clinic_storage.BOOKINGS_FILE, columns.bookings_size)
+            and clinic_storage.is_line_boundary(clinic_storage.CANCELLATIONS_FILE, columns.cancellations_size)):
+        clinic_trace.warning("Booking snapshot is stale, rebuilding")
+        columns = None
+    if columns is None:
+        columns = new_columns()
+    tail_bytes = catch_up(columns)
+    if update and tail_bytes >= SNAPSHOT_MIN_TAIL_BYTES:
+        try:
+            write_snapshot(columns, path)
+        except OSError as e:
+            clinic_trace.error("Error writing booking snapshot: %s", e)
+    return columns
+
+
+def rebase(columns, bookings_size, cancellations_size, archived_ids=(), path=SNAPSHOT_FILE):
+    """Write `columns` as the snapshot of the files a compaction just rewrote to the given sizes.
+
+    `archived_ids` are the bookings the compaction moved to the archive.
+    """
+    columns.mark_archived(archived_ids)
+    columns.bookings_size, columns.cancellations_size = bookings_size, cancellations_size
+    columns.identities = _file_identities()
+    try:
+        write_snapshot(columns, path)
+    except OSError as e:
+        clinic_trace.error("Error writing booking snapshot: %s", e)
+
+
+def new_columns():
+    """BookingColumns holding the archived bookings (flagged as such), to be caught up with the JSONL files."""
+    columns = BookingColumns()
+    columns.extend(clinic_storage.iter_archived_records("bookings"), archived=True)
+    return columns
+
+
+def _file_identities():
+    return (clinic_storage.file_identity(clinic_storage.BOOKINGS_FILE),
+            clinic_storage.file_identity(clinic_storage.CANCELLATIONS_FILE))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update or rebuild the columnar snapshot of the booking history.")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the existing snapshot and rescan everything")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.rebuild:
+        columns = new_columns()
+        catch_up(columns)
+    else:
+        columns = load_booking_columns(update=False)
+    write_snapshot(columns)
+    print(f"Wrote {SNAPSHOT_FILE}: {columns.bookings} bookings, {len(columns)} service lines "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import clinic_trace
+from clinic_ids import legacy_record_id
+from clinic_storage import parse_appointment_date
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    booking_id TEXT,
+    patient_name TEXT NOT NULL,
+    appointment_date TEXT,
+    services TEXT NOT NULL DEFAULT '[]',
+    total_amount REAL NOT NULL DEFAULT 0,
+    created_at TEXT,
+    status TEXT NOT NULL DEFAULT 'confirmed',
+    slot TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_patient_name ON bookings (patient_name);
+CREATE INDEX IF NOT EXISTS idx_bookings_appointment_date ON bookings (appointment_date);
+CREATE INDEX IF NOT EXISTS idx_bookings_booking_id ON bookings (booking_id);
+CREATE TABLE IF NOT EXISTS forgot_password (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reset_id TEXT,
+    username TEXT NOT NULL,
+    reset_date TEXT,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_forgot_password_username ON forgot_password (username);
+CREATE TABLE IF NOT EXISTS cancellations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cancellation_id TEXT,
+    booking_id TEXT,
+    patient_name TEXT NOT NULL,
+    appointment_date TEXT,
+    services TEXT NOT NULL DEFAULT '[]',
+    total_amount REAL NOT NULL DEFAULT 0,
+    cancellation_date TEXT,
+    reason TEXT,
+    status TEXT NOT NULL DEFAULT 'cancelled'
+);
+CREATE INDEX IF NOT EXISTS idx_cancellations_patient_name ON cancellations (patient_name);
+CREATE INDEX IF NOT EXISTS idx_cancellations_booking_id ON cancellations (booking_id);
+"""
+
+BOOKING_COLUMNS = ("booking_id", "patient_name", "appointment_date", "services",
+                   "total_amount", "created_at", "status", "slot")
+CANCELLATION_COLUMNS = ("cancellation_id", "booking_id", "patient_name", "appointment_date",
+                        "services", "total_amount", "cancellation_date", "reason", "status")
+RESET_COLUMNS = ("reset_id", "username", "reset_date", "status")
+USER_COLUMNS = ("username", "password", "created_at")
+TABLE_COLUMNS = {
+    "users": USER_COLUMNS,
+    "bookings": BOOKING_COLUMNS,
+    "forgot_password": RESET_COLUMNS,
+    "cancellations": CANCELLATION_COLUMNS,
+}
+
+
+class SQLiteStorage:
+    """SQLite storage backend with the same record shapes as the booking_data text files.
+
+    Each thread gets its own connection; the database runs in WAL mode so several
+    front desks can read while one of them writes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(bookings)")}
+            if 'slot' not in columns:
+                conn.execute("ALTER TABLE bookings ADD COLUMN slot TEXT")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("appointment_day", 1, _appointment_day, deterministic=True)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Users
+
+    def save_user(self, user_data):
+        """Insert a new user; returns False (and changes nothing) if the username is taken."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO users (username, password, created_at) VALUES (?, ?, ?)",
+                             (user_data['username'], user_data['password'], user_data.get('created_at')))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def update_password(self, username, new_password):
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute("UPDATE users SET password = ? WHERE username = ?",
+                                  (new_password, username))
+        return cursor.rowcount > 0
+
+    def load_users(self):
+        rows = self._connect().execute("SELECT username, password FROM users")
+        return {row['username']: row['password'] for row in rows}
+
+    # Bookings
+
+    def save_booking(self, booking_data):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT INTO bookings ({', '.join(BOOKING_COLUMNS)}) VALUES ({', '.join('?' * len(BOOKING_COLUMNS))})",
+                _row_values(booking_data, BOOKING_COLUMNS))
+
+    def bookings_for_patient(self, patient_name):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(BOOKING_COLUMNS)} FROM bookings WHERE patient_name = ? "
+            "ORDER BY appointment_date DESC, id", (patient_name,))
+        return [_record_from_row(row) for row in rows]
+
+    def booking_by_id(self, booking_id):
+        row = self._connect().execute(
+            f"SELECT {', '.join(BOOKING_COLUMNS)} FROM bookings WHERE booking_id = ? ORDER BY id DESC LIMIT 1",
+            (booking_id,)).fetchone()
+        return _record_from_row(row) if row is not None else None
+
+    def bookings_on_date(self, appointment_date):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(BOOKING_COLUMNS)} FROM bookings WHERE appointment_date = ? ORDER BY id",
+            (appointment_date,))
+        return [_record_from_row(row) for row in rows]
+
+    def patient_stats(self, patient_name, today):
+        """Per-status booking aggregates for one patient, computed in SQL.
+
+        {status: (count, total amount, appointments after `today`, latest appointment
+        on or before it)}, with dates as ISO strings.
+        """
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) AS count, COALESCE(SUM(total_amount), 0) AS amount, "
+            "COALESCE(SUM(appointment_day(appointment_date) > :today), 0) AS upcoming, "
+            "MAX(CASE WHEN appointment_day(appointment_date) <= :today "
+            "THEN appointment_day(appointment_date) END) AS last_visit "
+            "FROM bookings WHERE patient_name = :patient_name GROUP BY status",
+            {"today": today, "patient_name": patient_name})
+        return {row['status']: (row['count'], row['amount'], row['upcoming'], row['last_visit']) for row in rows}
+
+    def patient_names(self):
+        return [row['patient_name'] for row in self._connect().execute("SELECT DISTINCT patient_name FROM bookings")]
+
+    # Password resets
+
+    def save_forgot_password_record(self, reset_record):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT INTO forgot_password ({', '.join(RESET_COLUMNS)}) VALUES (?, ?, ?, ?)",
+                _row_values(reset_record, RESET_COLUMNS))
+
+    def forgot_password_history(self, username):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(RESET_COLUMNS)} FROM forgot_password WHERE username = ? ORDER BY id",
+            (username,))
+        return [dict(row) for row in rows]
+
+    # Cancellations
+
+    def save_cancellation(self, cancellation_data):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"INSERT INTO cancellations ({', '.join(CANCELLATION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(CANCELLATION_COLUMNS))})",
+                _row_values(cancellation_data, CANCELLATION_COLUMNS))
+            conn.execute("UPDATE bookings SET status = ? WHERE booking_id = ?",
+                         (cancellation_data.get('status') or "cancelled", cancellation_data.get('booking_id')))
+
+    def cancellations_for_patient(self, patient_name):
+        rows = self._connect().execute(
+            f"SELECT {', '.join(CANCELLATION_COLUMNS)} FROM cancellations WHERE patient_name = ? ORDER BY id",
+            (patient_name,))
+        return [_record_from_row(row) for row in rows]
+
+    # Streaming
+
+    def iter_records(self, table, equals=None):
+        """Yield the records of `table` oldest first, filtered by column == value pairs in `equals`."""
+        columns = TABLE_COLUMNS[table]
+        equals = {column: value for column, value in (equals or {}).items() if value is not None}
+        for column in equals:
+            if column not in columns:
+                raise ValueError(f"Unknown {table} column: {column}")
+        where = " AND ".join(f"{column} = ?" for column in equals)
+        sql = f"SELECT {', '.join(columns)} FROM {table}" + (f" WHERE {where}" if where else "")
+        order = " ORDER BY id" if table != "users" else " ORDER BY rowid"
+        for row in self._connect().execute(sql + order, tuple(equals.values())):
+            yield _record_from_row(row)
+
+    # Import
+
+    def import_text_files(self, users_file, bookings_file, forgot_password_file, cancellations_file):
+        """Replace the database contents with the records in the booking_data .txt files.
+
+        Runs as a single transaction, so a failed import leaves the database untouched.
+        Returns the number of records imported per table.
+        """
+        counts = {}
+        conn = self._connect()
+        with conn:
+            for table in ("users", "bookings", "forgot_password", "cancellations"):
+                conn.execute(f"DELETE FROM {table}")
+
+            counts['users'] = 0
+            for user_data in _read_json_lines(users_file):
+                if 'username' in user_data and 'password' in user_data:
+                    conn.execute(
+                        "INSERT INTO users (username, password, created_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(username) DO UPDATE SET password = excluded.password",
+                        (user_data['username'], user_data['password'], user_data.get('created_at')))
+                    counts['users'] += 1
+
+            for table, path, columns, required in (
+                    ("bookings", bookings_file, BOOKING_COLUMNS, 'patient_name'),
+                    ("forgot_password", forgot_password_file, RESET_COLUMNS, 'username'),
+                    ("cancellations", cancellations_file, CANCELLATION_COLUMNS, 'patient_name')):
+                records = (record for record in _read_json_lines(path) if required in record)
+                if table == "bookings":
+                    records = map(_with_booking_id, records)
+                rows = (_row_values(record, columns) for record in records)
+                cursor = conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    rows)
+                counts[table] = cursor.rowcount
+            conn.execute(
+                "UPDATE bookings SET status = (SELECT COALESCE(c.status, 'cancelled') FROM cancellations c "
+                "WHERE c.booking_id = bookings.booking_id ORDER BY c.id DESC LIMIT 1) "
+                "WHERE booking_id IN (SELECT booking_id FROM cancellations)")
+        return counts
+
+
+def _row_values(record, columns):
+    values = []
+    for column in columns:
+        value = record.get(column)
+        if column == 'services':
+            value = json.dumps(_services_as_dicts(value or []), ensure_ascii=False)
+        elif column == 'total_amount':
+            value = float(value or 0)
+        elif column == 'status' and value is None:
+            value = "cancelled" if 'cancellation_id' in columns else "confirmed"
+        values.append(value)
+    return values
+
+
+def _with_booking_id(booking_data):
+    """Give an old booking saved without an ID the same legacy ID the text backend derives for it."""
+    if 'booking_id' not in booking_data:
+        normalized = dict(booking_data)
+        if isinstance(normalized.get('services'), list):
+            normalized['services'] = [(s['service_name'], s['quantity'], s['subtotal'])
+                                      for s in _services_as_dicts(normalized['services'])]
+        booking_data['booking_id'] = legacy_record_id("BK", normalized)
+    return booking_data
+
+
+def _services_as_dicts(services_list):
+    services = []
+    for service in services_list:
+        if isinstance(service, dict):
+            services.append({
+                'service_name': str(service.get('service_name', 'Unknown Service')),
+                'quantity': int(service.get('quantity', 1)),
+                'subtotal': float(service.get('subtotal', 0))
+            })
+        elif isinstance(service, (list, tuple)) and len(service) >= 3:
+            services.append({
+                'service_name': str(service[0]),
+                'quantity': int(service[1]),
+                'subtotal': float(service[2])
+            })
+    return services
+
+
+def _appointment_day(appointment_date):
+    day = parse_appointment_date(appointment_date)
+    return day.isoformat() if day is not None else None
+
+
+def _record_from_row(row):
+    record = {key: row[key] for key in row.keys() if row[key] is not None}
+    if 'services' in record:
+        record['services'] = json.loads(record['services'])
+    return record
+
+
+def _read_json_lines(path):
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                clinic_trace.warning("Skipping %s line %s: %s", os.path.basename(path), line_num, e)
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+if __name__ == "__main__":
+    base_dir = os.environ.get("CLINIC_DATA_DIR",
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), "booking_data"))
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, "clinic.db")
+    storage = SQLiteStorage(db_path)
+    counts = storage.import_text_files(
+        os.path.join(base_dir, "users.txt"),
+        os.path.join(base_dir, "bookings.txt"),
+        os.path.join(base_dir, "forgot_password.txt"),
+        os.path.join(base_dir, "cancellations.txt"))
+    for table, count in counts.items():
+        print(f"Imported {count} {table} records into {db_path}")
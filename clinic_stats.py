@@ -0,0 +1,270 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import date
+import clinic_storage
+import clinic_trace
+from clinic_locks import file_lock
+
+
+STATS_FILE = os.path.join(clinic_storage.DATA_DIR, "patient_stats.json")
+STATS_SAVE_INTERVAL = 5.0
+
+
+def _new_entry():
+    return {"total": 0, "by_status": {}, "lifetime_spend": 0.0, "upcoming_dates": [], "last_visit": None,
+            "archived": 0}
+
+
+class PatientStatsTable:
+    """Materialized per-patient booking aggregates, persisted in patient_stats.json.
+
+    Each entry holds the booking count, counts by status, lifetime spend (bookings
+    that were not cancelled), the sorted dates of confirmed appointments still ahead
+    and the last visit. The table remembers how far into bookings.txt and
+    cancellations.txt it has read, so catching up after a save or cancel only
+    parses the new lines, and a restart only reads what was appended since the
+    last save. Dates that have passed move from upcoming_dates to last_visit when
+    an entry is read, so each lookup is constant time amortized. Bookings moved to
+    the archive by clinic_archive stay counted and are also counted in `archived`;
+    a rebuild folds the archive in first.
+    """
+
+    def __init__(self, path=STATS_FILE):
+        self.path = path
+        self.lock = threading.RLock()
+        self.patients = {}
+        self.cancelled_ids = set()
+        self.bookings_size = 0
+        self.cancellations_size = 0
+        self.identities = None
+        self.loaded = False
+        self.dirty = False
+        self.last_save = 0.0
+
+    def load(self):
+        with self.lock:
+            self.patients, self.cancelled_ids = {}, set()
+            self.bookings_size = self.cancellations_size = 0
+            self.identities = _file_identities()
+            self.loaded = True
+            restored = False
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if (clinic_storage.identities_match(data.get('identities'), self.identities)
+                            and clinic_storage.is_line_boundary(clinic_storage.BOOKINGS_FILE, data['bookings_size'])
+                            and clinic_storage.is_line_boundary(clinic_storage.CANCELLATIONS_FILE,
+                                                                data['cancellations_size'])):
+                        self.patients = data['patients']
+                        self.cancelled_ids = set(data['cancelled_ids'])
+                        self.bookings_size = data['bookings_size']
+                        self.cancellations_size = data['cancellations_size']
+                        restored = True
+                    else:
+                        clinic_trace.warning("Patient stats are stale, rebuilding")
+                except (OSError, ValueError, KeyError) as e:
+                    clinic_trace.error("Error loading patient stats (%s), rebuilding", e)
+            if not restored:
+                for booking in clinic_storage.iter_archived_records("bookings"):
+                    if booking.get('patient_name') is not None:
+                        self._add_booking(booking, archived=True)
+                        self.dirty = True
+            self.catch_up()
+
+    def catch_up(self):
+        """Fold bookings and cancellations appended since the last call into the table."""
+        with self.lock:
+            if not self.loaded:
+                self.load()
+                return
+            shrunk = any(os.path.exists(path) and os.path.getsize(path) < size
+                         for path, size in ((clinic_storage.BOOKINGS_FILE, self.bookings_size),
+                                            (clinic_storage.CANCELLATIONS_FILE, self.cancellations_size)))
+            identities = _file_identities()
+            if shrunk or not clinic_storage.identities_match(self.identities, identities):
+                self.load()
+                return
+            if identities != self.identities:
+                self.identities = identities
+                self.dirty = True
+
+            with file_lock(clinic_storage.BOOKINGS_FILE).shared():
+                self.bookings_size = self._scan(clinic_storage.BOOKINGS_FILE, self.bookings_size, self._add_booking)
+                self.cancellations_size = self._scan(clinic_storage.CANCELLATIONS_FILE, self.cancellations_size,
+                                                     self._add_cancellation)
+            if self.dirty and time.monotonic() - self.last_save >= STATS_SAVE_INTERVAL:
+                self.save()
+
+    def get(self, patient_name):
+        """Stats for one patient: total, by_status, confirmed, cancelled, upcoming, lifetime_spend, last_visit."""
+        with self.lock:
+            self.catch_up()
+            entry = self.patients.get(patient_name) or _new_entry()
+            today = date.today().isoformat()
+            upcoming_dates = entry['upcoming_dates']
+            passed = bisect.bisect_right(upcoming_dates, today)
+            if passed:
+                entry['last_visit'] = max(entry['last_visit'] or '', upcoming_dates[passed - 1])
+                del upcoming_dates[:passed]
+                self.dirty = True
+            return {
+                "patient_name": patient_name,
+                "total": entry['total'],
+                "by_status": dict(entry['by_status']),
+                "confirmed": entry['by_status'].get("confirmed", 0),
+                "cancelled": entry['by_status'].get("cancelled", 0),
+                "upcoming": len(upcoming_dates),
+                "lifetime_spend": round(entry['lifetime_spend'], 2),
+                "last_visit": entry['last_visit'],
+                "archived": entry.get('archived', 0),
+            }
+
+    def save(self):
+        """Write the table to patient_stats.json (temp file, then rename)."""
+        with self.lock:
+            data = {
+                "identities": [list(identity) if identity else None for identity in self.identities],
+                "bookings_size": self.bookings_size,
+                "cancellations_size": self.cancellations_size,
+                "cancelled_ids": sorted(self.cancelled_ids),
+                "patients": self.patients,
+            }
+            temp_file = self.path + ".tmp"
+            try:
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.path)
+                self.dirty = False
+                self.last_save = time.monotonic()
+            except OSError as e:
+                clinic_trace.error("Error saving patient stats: %s", e)
+
+    def rebase(self, bookings_size, cancellations_size):
+        """Keep the current totals after a compaction rewrote both files; they now cover the given sizes."""
+        with self.lock:
+            self.bookings_size, self.cancellations_size = bookings_size, cancellations_size
+            self.identities = _file_identities()
+            self.save()
+
+    def add_archived(self, patient_names):
+        """Count bookings clinic_archive moved out of bookings.txt, one name per booking."""
+        with self.lock:
+            for patient_name in patient_names:
+                entry = self.patients.setdefault(patient_name, _new_entry())
+                entry['archived'] = entry.get('archived', 0) + 1
+                self.dirty = True
+
+    def _scan(self, path, start, apply):
+        if not os.path.exists(path):
+            return start
+        with file_lock(path).shared(), open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            f.seek(start)
+            offset = start
+            for line in f:
+                if offset + len(line) > size or not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get('patient_name') is not None:
+                    apply(record)
+                    self.dirty = True
+        return offset
+
+    def _add_booking(self, booking, archived=False):
+        entry = self.patients.setdefault(booking['patient_name'], _new_entry())
+        status = booking.get('status') or "confirmed"
+        entry['total'] += 1
+        if archived:
+            entry['archived'] = entry.get('archived', 0) + 1
+        entry['by_status'][status] = entry['by_status'].get(status, 0) + 1
+        if status != "cancelled":
+            entry['lifetime_spend'] += float(booking.get('total_amount') or 0)
+        day = clinic_storage.parse_appointment_date(booking.get('appointment_date'))
+        if status == "confirmed" and day is not None:
+            bisect.insort(entry['upcoming_dates'], day.isoformat())
+
+    def _add_cancellation(self, cancellation):
+        booking_id = cancellation.get('booking_id')
+        if booking_id in self.cancelled_ids:
+            return
+        self.cancelled_ids.add(booking_id)
+        entry = self.patients.setdefault(cancellation['patient_name'], _new_entry())
+        by_status = entry['by_status']
+        if by_status.get("confirmed", 0) > 0:
+            by_status["confirmed"] -= 1
+        by_status["cancelled"] = by_status.get("cancelled", 0) + 1
+        entry['lifetime_spend'] -= float(cancellation.get('total_amount') or 0)
+        day = clinic_storage.parse_appointment_date(cancellation.get('appointment_date'))
+        if day is not None:
+            upcoming_dates = entry['upcoming_dates']
+            position = bisect.bisect_left(upcoming_dates, day.isoformat())
+            if position < len(upcoming_dates) and upcoming_dates[position] == day.isoformat():
+                del upcoming_dates[position]
+
+
+def _file_identities():
+    return (clinic_storage.file_identity(clinic_storage.BOOKINGS_FILE),
+            clinic_storage.file_identity(clinic_storage.CANCELLATIONS_FILE))
+
+
+stats_table = PatientStatsTable()
+
+
+def patient_stats(patient_name):
+    """Booking aggregates for one patient, for the UI and reporting scripts.
+
+    Returns total, by_status, confirmed, cancelled, upcoming, lifetime_spend,
+    last_visit (ISO date or None) and archived (how many of the total were moved
+    to the archive and are no longer listed by load_bookings_for_user).
+    """
+    if clinic_storage.get_storage() is not None:
+        return _patient_stats_from_database(patient_name)
+    return stats_table.get(patient_name)
+
+
+def all_patient_stats():
+    """patient_stats() for every patient that has bookings."""
+    if clinic_storage.get_storage() is not None:
+        names = clinic_storage.get_storage().patient_names()
+    else:
+        stats_table.catch_up()
+        with stats_table.lock:
+            names = list(stats_table.patients)
+    return {name: patient_stats(name) for name in names}
+
+
+def _patient_stats_from_database(patient_name):
+    aggregates = clinic_storage.get_storage().patient_stats(patient_name, date.today().isoformat())
+    by_status = {status: count for status, (count, amount, upcoming, last_visit) in aggregates.items()}
+    confirmed = aggregates.get("confirmed", (0, 0.0, 0, None))
+    return {
+        "patient_name": patient_name,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "confirmed": by_status.get("confirmed", 0),
+        "cancelled": by_status.get("cancelled", 0),
+        "upcoming": confirmed[2],
+        "lifetime_spend": round(sum(amount for status, (count, amount, upcoming, last_visit) in aggregates.items()
+                                    if status != "cancelled"), 2),
+        "last_visit": confirmed[3],
+        "archived": 0,
+    }
+
+
+def _save_on_exit():
+    if stats_table.loaded and stats_table.dirty:
+        stats_table.save()
+
+
+atexit.register(_save_on_exit)
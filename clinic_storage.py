@@ -0,0 +1,1101 @@
+import atexit
+import gzip
+import json
+import mmap
+import os
+import re
+import threading
+from itertools import chain
+from datetime import datetime
+from clinic_ids import new_record_id, legacy_record_id
+from clinic_commit import COMMIT_WAIT_WARNING, CommitRejected, GroupCommitWriter
+from clinic_locks import file_lock
+import clinic_trace
+
+users = {}
+users_loaded = False
+user_count = 0
+superseded_user_records = 0
+users_file_lock = threading.Lock()
+users_compaction_running = False
+
+booking_index = {}
+booking_index_size = 0
+booking_index_loaded = False
+booking_index_identity = None
+booking_index_lock = threading.RLock()
+
+booking_status = {}
+booking_status_size = 0
+booking_status_identity = None
+booking_status_lock = threading.RLock()
+
+writers = {}
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("CLINIC_DATA_DIR", os.path.join(BASE_DIR, "booking_data"))
+
+
+USERS_FILE = os.path.join(DATA_DIR, "users.txt")
+BOOKINGS_FILE = os.path.join(DATA_DIR, "bookings.txt")
+FORGOT_PASSWORD_FILE = os.path.join(DATA_DIR, "forgot_password.txt")
+CANCELLATIONS_FILE = os.path.join(DATA_DIR, "cancellations.txt")
+BOOKINGS_INDEX_FILE = os.path.join(DATA_DIR, "bookings.idx")
+SQLITE_FILE = os.path.join(DATA_DIR, "clinic.db")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+
+STORAGE_BACKEND = os.environ.get("CLINIC_STORAGE", "text")
+USERS_COMPACTION_MIN_RECORDS = 100
+BOOKINGS_CHUNK_SIZE = 50
+_PATIENT_NAME_FIELD = re.compile(rb'"patient_name"\s*:\s*("(?:[^"\\]|\\.)*"|null)')
+
+ARCHIVE_ID_FIELDS = {"bookings": "booking_id", "cancellations": "cancellation_id", "forgot_password": "reset_id"}
+
+FSYNC_POLICY = os.environ.get("CLINIC_FSYNC_POLICY", "grouped")
+GROUP_COMMIT_WINDOW = 0.002
+FSYNC_INTERVAL = 1.0
+storage = None
+
+
+def get_storage():
+    """Return the SQLite storage backend when it is selected, or None to use the .txt files."""
+    global storage
+    if storage is None and STORAGE_BACKEND == "sqlite":
+        from clinic_sqlite import SQLiteStorage
+        storage = SQLiteStorage(SQLITE_FILE)
+    return storage
+
+
+def set_storage_backend(backend):
+    """Switch the save_*/load_* functions between the "text" and "sqlite" backends."""
+    global STORAGE_BACKEND, storage
+    if backend not in ("text", "sqlite"):
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if storage is not None:
+        storage.close()
+    STORAGE_BACKEND = backend
+    storage = None
+
+
+def import_text_files_to_sqlite(db_path=SQLITE_FILE):
+    """One-shot import of users, bookings, resets and cancellations from the .txt files into SQLite."""
+    from clinic_sqlite import SQLiteStorage
+    sqlite_storage = SQLiteStorage(db_path)
+    try:
+        return sqlite_storage.import_text_files(USERS_FILE, BOOKINGS_FILE, FORGOT_PASSWORD_FILE, CANCELLATIONS_FILE)
+    finally:
+        sqlite_storage.close()
+
+
+def get_writer(path, lock=None):
+    """Return the shared group-commit writer for appends to `path`."""
+    writer = writers.get(path)
+    if writer is None:
+        writer = writers[path] = GroupCommitWriter(path, FSYNC_POLICY, GROUP_COMMIT_WINDOW, FSYNC_INTERVAL, lock)
+    return writer
+
+
+def wait_for_commit(commit, path):
+    """Block until `commit` has been written and fsynced (True) or has failed (False).
+
+    There is no timeout: a write reported as failed must never show up in the file
+    later. A warning is logged every COMMIT_WAIT_WARNING seconds while it is pending.
+    """
+    waited = 0.0
+    while not commit.wait(COMMIT_WAIT_WARNING):
+        if commit.done:
+            return False
+        waited += COMMIT_WAIT_WARNING
+        clinic_trace.warning("Still waiting for a write to %s after %.0f s", os.path.basename(path), waited)
+    return True
+
+
+def close_writers():
+    """Flush and fsync anything still queued in the group-commit writers."""
+    for writer in list(writers.values()):
+        writer.close()
+    writers.clear()
+
+
+atexit.register(close_writers)
+
+
+@clinic_trace.traced("storage.load_users")
+def load_users():
+    """Load users from users.txt file, folding later password-change records over earlier ones.
+
+    The app and BookingService resolve accounts through clinic_users.user_directory
+    instead; this reads the whole table for scripts that want it as a dict.
+    """
+    global users, users_loaded, user_count, superseded_user_records
+    users = {}
+    users_loaded = True
+    superseded_user_records = 0
+    
+    if get_storage() is not None:
+        try:
+            users = get_storage().load_users()
+        except Exception as e:
+            clinic_trace.error("Error reading users from database: %s", e)
+        clinic_trace.info("Loaded %s users from database", len(users))
+        return users
+  
+  
+    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
+    
+    
+    if not os.path.exists(USERS_FILE):
+        try:
+            with open(USERS_FILE, 'w', encoding='utf-8') as f:
+                pass
+            clinic_trace.info("Created new empty users file")
+            return users
+        except Exception as e:
+            clinic_trace.error("Failed to create users file: %s", e)
+            return users
+    
+    
+    try:
+        with file_lock(USERS_FILE).shared(), open(USERS_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    user_data = json.loads(line)
+                    if 'username' in user_data and 'password' in user_data:
+                        if user_data['username'] in users:
+                            superseded_user_records += 1
+                        users[user_data['username']] = user_data['password']
+                except (json.JSONDecodeError, KeyError) as e:
+                    clinic_trace.error("Error parsing user data: %s", e)
+                    continue
+    except Exception as e:
+        clinic_trace.error("Error reading users file: %s", e)
+    
+    user_count = len(users)
+    clinic_trace.info("Loaded %s users from file", len(users))
+    return users
+
+
+@clinic_trace.traced("storage.save_user")
+def save_user(username, password):
+    """Save a new user to users.txt file."""
+    try:
+        clinic_trace.debug("Saving user %s", username)
+        
+        #
+        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
+        
+        
+        user_data = {
+            "username": username,
+            "password": password,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        
+        
+        if get_storage() is not None:
+            if not get_storage().save_user(user_data):
+                clinic_trace.warning("User %s already exists", username)
+                return False
+            if users_loaded:
+                users[username] = password
+            clinic_trace.debug("User %s saved to database", username)
+            return True
+        
+        
+        json_str = json.dumps(user_data)
+        commit = get_writer(USERS_FILE, users_file_lock).append((json_str + '\n').encode('utf-8'))
+        if not wait_for_commit(commit, USERS_FILE):
+            clinic_trace.error("IOError writing to file: %s", commit.error)
+            return False
+        
+        
+        if users_loaded:
+            users[username] = password
+        clinic_trace.debug("User %s saved to %s", username, USERS_FILE)
+        return True
+        
+    except Exception as e:
+        clinic_trace.error("Error saving user %s: %s: %s", username, type(e).__name__, e)
+        import traceback
+        traceback.print_exc()
+        return False
+    except Exception as e:
+        clinic_trace.error("Error saving user: %s", e)
+
+
+@clinic_trace.traced("storage.save_booking")
+def save_booking(patient_name, appointment_date, services_list, total_amount, durable=True, slot=None,
+                 booking_id=None, check=None):
+    """Save booking record to bookings.txt file.
+
+    Returns the saved record, or False if it could not be written. With
+    durable=True this only returns once the record has been fsynced, however
+    the group-commit writer batches it. `booking_id` is generated unless given;
+    `check()` is called under the bookings lock just before the line is
+    appended, and the booking is not saved if it returns False.
+    """
+    try:
+        clinic_trace.debug("Saving booking for %s on %s: %s, total %s",
+                           patient_name, appointment_date, services_list, total_amount)
+        
+        
+        os.makedirs(os.path.dirname(BOOKINGS_FILE), exist_ok=True)
+        
+        
+        serializable_services = []
+        for service in services_list:
+            if isinstance(service, (list, tuple)) and len(service) >= 3:
+                
+                service_dict = {
+                    'service_name': str(service[0]),
+                    'quantity': int(service[1]),
+                    'subtotal': float(service[2])
+                }
+                serializable_services.append(service_dict)
+            elif isinstance(service, dict):
+                
+                service_dict = {
+                    'service_name': str(service.get('service_name', 'Unknown Service')),
+                    'quantity': int(service.get('quantity', 1)),
+                    'subtotal': float(service.get('subtotal', 0))
+                }
+                serializable_services.append(service_dict)
+            else:
+                clinic_trace.warning("Invalid service format: %s", service)
+        
+        
+        booking_data = {
+            "booking_id": booking_id or new_record_id("BK"),
+            "patient_name": str(patient_name),
+            "appointment_date": str(appointment_date),
+            "services": serializable_services,
+            "total_amount": float(total_amount),
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "confirmed"
+        }
+        if slot is not None:
+            booking_data["slot"] = str(slot)
+        
+        if get_storage() is not None:
+            if check is not None and not check():
+                return False
+            get_storage().save_booking(booking_data)
+            clinic_trace.debug("Saved booking %s to database", booking_data['booking_id'])
+            return booking_data
+        
+        try:
+            json_str = json.dumps(booking_data, ensure_ascii=False)
+            clinic_trace.debug("Writing booking: %s", json_str)
+            commit = get_writer(BOOKINGS_FILE).append(
+                (json_str + '\n').encode('utf-8'),
+                on_written=lambda offset, end: _record_booking_in_index(booking_data['patient_name'], offset, end),
+                check=check)
+            if durable and not wait_for_commit(commit, BOOKINGS_FILE):
+                if isinstance(commit.error, CommitRejected):
+                    clinic_trace.info("Booking for %s on %s was refused: the slot filled up", patient_name,
+                                      appointment_date)
+                else:
+                    clinic_trace.error("Error writing to file: %s", commit.error)
+                return False
+            return booking_data
+                    
+        except Exception as e:
+            clinic_trace.error("Critical error saving booking: %s", e)
+            import traceback
+            traceback.print_exc()
+            return False
+            
+    except Exception as e:
+        clinic_trace.error("Unexpected error in save_booking: %s", e)
+        import traceback
+        traceback.print_exc()
+        return False
+
+def _booking_from_json(booking_data):
+    """Normalize a parsed booking record for display (services as tuples, default fields)."""
+    if 'services' in booking_data and isinstance(booking_data['services'], list):
+        services = []
+        for service in booking_data['services']:
+            if isinstance(service, dict):
+                services.append((
+                    str(service.get('service_name', 'Unknown Service')),
+                    int(service.get('quantity', 1)),
+                    float(service.get('subtotal', 0))
+                ))
+            elif isinstance(service, (list, tuple)) and len(service) >= 3:
+                services.append((
+                    str(service[0]),
+                    int(service[1]),
+                    float(service[2])
+                ))
+        booking_data['services'] = services
+    
+    if 'booking_id' not in booking_data:
+        booking_data['booking_id'] = legacy_record_id("BK", booking_data)
+    if 'created_at' not in booking_data:
+        booking_data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if 'status' not in booking_data:
+        booking_data['status'] = "confirmed"
+    status = booking_status.get(booking_data['booking_id'])
+    if status is not None:
+        booking_data['status'] = status
+    return booking_data
+
+
+def booking_record_id(booking_data):
+    """The booking_id of a raw booking record (derived from its contents for old records saved without one)."""
+    if 'booking_id' in booking_data:
+        return booking_data['booking_id']
+    return _booking_from_json(dict(booking_data))['booking_id']
+
+
+def _index_bookings_from(start):
+    """Index every complete line of bookings.txt from byte offset `start` onwards."""
+    entries = _scan_bookings_from(start)
+    _append_booking_index_entries(entries)
+    return len(entries)
+
+
+def _scan_bookings_from(start):
+    """Add the complete lines of bookings.txt from `start` to the in-memory index; returns the new entries."""
+    global booking_index_size
+    entries = []
+    with file_lock(BOOKINGS_FILE).shared(), open(BOOKINGS_FILE, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= start:
+            return entries
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+            for offset, end in _line_spans(mapped, start, size):
+                line = mapped[offset:end]
+                if line.strip():
+                    try:
+                        patient_name = _raw_patient_name(line)
+                    except (ValueError, AttributeError) as e:
+                        clinic_trace.warning("Skipping unindexable booking at byte %s: %s", offset, e)
+                        patient_name = None
+                    if patient_name is not None:
+                        booking_index.setdefault(patient_name, []).append(offset)
+                        entries.append([patient_name, offset, end])
+                booking_index_size = end
+    return entries
+
+
+def _raw_patient_name(line):
+    """The patient_name of a booking line, decoding only that field when the line has exactly one."""
+    stripped = line.strip()
+    if stripped.startswith(b'{') and stripped.endswith(b'}') and line.count(b'"patient_name"') == 1:
+        match = _PATIENT_NAME_FIELD.search(line)
+        if match:
+            value = match.group(1)
+            if value == b'null':
+                return None
+            return value[1:-1].decode('utf-8') if b'\\' not in value else json.loads(value)
+    return json.loads(line).get('patient_name')
+
+
+def _line_spans(mapped, start, end, needles=None):
+    """Yield (start, end) byte spans of the complete lines in mapped[start:end].
+
+    With `needles`, only lines containing one of them are yielded: the mapping is
+    searched for the next needle and the line around it is located with rfind/find,
+    so the bytes in between are never copied or split into lines.
+    """
+    position = start
+    if not needles:
+        while position < end:
+            newline = mapped.find(b'\n', position, end)
+            if newline < 0:
+                return
+            yield position, newline + 1
+            position = newline + 1
+        return
+
+    next_hits = {needle: -1 for needle in needles}
+    while position < end:
+        for needle, hit in next_hits.items():
+            if hit < position:
+                next_hits[needle] = mapped.find(needle, position, end)
+        hits = [hit for hit in next_hits.values() if hit >= 0]
+        if not hits:
+            return
+        hit = min(hits)
+        newline = mapped.rfind(b'\n', position, hit)
+        line_start = newline + 1 if newline >= 0 else position
+        line_end = mapped.find(b'\n', hit, end)
+        if line_end < 0:
+            return
+        yield line_start, line_end + 1
+        position = line_end + 1
+
+
+def _record_booking_in_index(patient_name, offset, end):
+    """Add a just-appended booking line to the index without rescanning the file."""
+    global booking_index_size
+    with booking_index_lock:
+        if not booking_index_loaded:
+            return
+        if offset == booking_index_size:
+            booking_index.setdefault(patient_name, []).append(offset)
+            booking_index_size = end
+            _append_booking_index_entries([[patient_name, offset, end]])
+        else:
+        
+            _catch_up_booking_index()
+
+
+def _append_booking_index_entries(entries):
+    """Persist new (patient_name, offset, end) entries to the on-disk booking index."""
+    if not entries:
+        return
+    try:
+        with file_lock(BOOKINGS_INDEX_FILE).exclusive(), open(BOOKINGS_INDEX_FILE, 'a+b') as f:
+            persisted_end = _last_index_entry_end(f)
+            f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n'
+                            for entry in entries if entry[1] >= persisted_end).encode('utf-8'))
+    except Exception as e:
+        clinic_trace.error("Error writing booking index: %s", e)
+
+
+def _last_index_entry_end(f):
+    """End offset of the last entry in an open bookings.idx, so entries another process already wrote are skipped."""
+    size = f.seek(0, os.SEEK_END)
+    f.seek(max(0, size - 4096))
+    lines = f.read().splitlines()
+    for line in reversed(lines):
+        try:
+            return json.loads(line)[2]
+        except (ValueError, IndexError, TypeError):
+            continue
+    return 0
+
+
+@clinic_trace.traced("storage.rebuild_booking_index")
+def rebuild_booking_index():
+    """Rebuild the per-patient booking index from scratch by scanning bookings.txt once."""
+    global booking_index_size, booking_index_loaded, booking_index_identity
+    with booking_index_lock:
+        booking_index.clear()
+        booking_index_size = 0
+        booking_index_loaded = True
+        booking_index_identity = file_identity(BOOKINGS_FILE)
+        try:
+            entries = _scan_bookings_from(0) if os.path.exists(BOOKINGS_FILE) else []
+            temp_file = BOOKINGS_INDEX_FILE + ".tmp"
+            with file_lock(BOOKINGS_INDEX_FILE).exclusive():
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    for entry in entries:
+                        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_file, BOOKINGS_INDEX_FILE)
+            clinic_trace.info("Rebuilt booking index: %s bookings for %s patients", len(entries), len(booking_index))
+        except Exception as e:
+            clinic_trace.error("Error rebuilding booking index: %s", e)
+
+
+@clinic_trace.traced("storage.load_booking_index")
+def load_booking_index():
+    """Load the persisted booking index, rebuilding it only if it no longer matches bookings.txt."""
+    global booking_index_size, booking_index_loaded, booking_index_identity
+    with booking_index_lock:
+        booking_index.clear()
+        booking_index_size = 0
+        booking_index_loaded = True
+        booking_index_identity = file_identity(BOOKINGS_FILE)
+    
+        if not os.path.exists(BOOKINGS_FILE):
+            return booking_index
+        if not os.path.exists(BOOKINGS_INDEX_FILE):
+            rebuild_booking_index()
+            return booking_index
+    
+        try:
+            with file_lock(BOOKINGS_INDEX_FILE).shared(), open(BOOKINGS_INDEX_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    patient_name, offset, end = json.loads(line)
+                    if offset < booking_index_size:
+                        
+                        continue
+                    booking_index.setdefault(patient_name, []).append(offset)
+                    booking_index_size = end
+        
+            bookings_size = os.path.getsize(BOOKINGS_FILE)
+            stale = booking_index_size > bookings_size
+            if not stale and booking_index_size > 0:
+            
+                with open(BOOKINGS_FILE, 'rb') as f:
+                    f.seek(booking_index_size - 1)
+                    stale = f.read(1) != b'\n'
+            if stale:
+                clinic_trace.warning("Booking index is stale, rebuilding")
+                rebuild_booking_index()
+            elif booking_index_size < bookings_size:
+            
+                _index_bookings_from(booking_index_size)
+        except Exception as e:
+            clinic_trace.error("Error loading booking index (%s), rebuilding", e)
+            rebuild_booking_index()
+    
+        return booking_index
+
+
+def _catch_up_booking_index():
+    """Load the booking index if needed and index any lines appended since it was last updated."""
+    with booking_index_lock:
+        if not booking_index_loaded or file_identity(BOOKINGS_FILE) != booking_index_identity:
+            load_booking_index()
+        elif os.path.getsize(BOOKINGS_FILE) > booking_index_size:
+            _index_bookings_from(booking_index_size)
+
+
+def _read_indexed_bookings(username, offsets=None):
+    """Read a patient's bookings at their indexed offsets. Returns None if the index is out of date."""
+    bookings = []
+    if offsets is None:
+        offsets = booking_index.get(username, [])
+    if not offsets:
+        return bookings
+    with open(BOOKINGS_FILE, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            line = f.readline()
+            try:
+                booking_data = json.loads(line)
+            except ValueError:
+                return None
+            if not isinstance(booking_data, dict) or booking_data.get('patient_name') != username:
+                return None
+            bookings.append(_booking_from_json(booking_data))
+    return bookings
+
+
+@clinic_trace.traced("storage.load_bookings_for_user")
+def load_bookings_for_user(username, include_archived=False):
+    """Load all bookings for a specific user, reading only that patient's lines via the booking index.
+
+    Bookings moved to the archive are only included with include_archived=True.
+    """
+    if get_storage() is not None:
+        try:
+            return [_booking_from_json(b) for b in get_storage().bookings_for_patient(username)]
+        except Exception as e:
+            clinic_trace.error("Error reading bookings from database: %s", e)
+            return []
+    
+    if not os.path.exists(BOOKINGS_FILE):
+        return []
+    
+    try:
+        _catch_up_booking_status()
+        with booking_index_lock:
+            _catch_up_booking_index()
+            bookings = _read_indexed_bookings(username)
+            if bookings is None:
+                clinic_trace.warning("Booking index does not match bookings file, rebuilding")
+                rebuild_booking_index()
+                bookings = _read_indexed_bookings(username) or []
+    except Exception as e:
+        clinic_trace.error("Error reading bookings file: %s", e)
+        import traceback
+        traceback.print_exc()
+        bookings = []
+    if include_archived:
+        bookings += [_booking_from_json(b) for b in iter_archived_records("bookings", {'patient_name': username})]
+            
+    return sorted(bookings, key=lambda x: x.get('appointment_date', ''), reverse=True)
+
+
+def load_bookings_for_user_in_chunks(username, chunk_size=BOOKINGS_CHUNK_SIZE):
+    """Yield a user's bookings `chunk_size` at a time, most recently booked first.
+
+    The file is only opened while a chunk is read, so a view can render the first
+    chunk and fetch the rest between event-loop iterations.
+    """
+    if get_storage() is not None:
+        bookings = load_bookings_for_user(username)
+        for start in range(0, len(bookings), chunk_size):
+            yield bookings[start:start + chunk_size]
+        return
+    
+    if not os.path.exists(BOOKINGS_FILE):
+        return
+    
+    try:
+        _catch_up_booking_status()
+        with booking_index_lock:
+            _catch_up_booking_index()
+            offsets = booking_index.get(username, [])[::-1]
+        rebuilt = False
+        done = 0
+        while done < len(offsets):
+            with booking_index_lock, clinic_trace.span("storage.read_booking_chunk"):
+                chunk = _read_indexed_bookings(username, offsets[done:done + chunk_size])
+                if chunk is None:
+                    if rebuilt:
+                        return
+                    clinic_trace.warning("Booking index does not match bookings file, rebuilding")
+                    rebuild_booking_index()
+                    offsets = booking_index.get(username, [])[::-1]
+                    rebuilt = True
+                    continue
+            done += len(chunk)
+            yield chunk
+    except OSError as e:
+        clinic_trace.error("Error reading bookings file: %s", e)
+
+
+def parse_appointment_date(appointment_date):
+    """Parse an appointment date as stored by the app (ISO or the DateEntry m/d/yy format)."""
+    for date_format in ('%Y-%m-%d', '%m/%d/%y', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(appointment_date, date_format).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def file_identity(path):
+    """(device, inode) of `path`, which changes when a compaction replaces the file; None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def identities_match(saved, current):
+    """True if the file_identity() values `current` name the same files as `saved`.
+
+    A file that did not exist yet counts as empty, so creating it (cancellations.txt
+    on the first cancel) is not mistaken for a rewrite.
+    """
+    if saved is None or len(saved) != len(current):
+        return False
+    return all(old is None or (new is not None and list(old) == list(new)) for old, new in zip(saved, current))
+
+
+def is_line_boundary(path, size):
+    """True if `path` still has a line boundary at byte `size`, i.e. a watermark taken at `size` covers a prefix of it."""
+    if size == 0:
+        return True
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        return False
+    with open(path, 'rb') as f:
+        f.seek(size - 1)
+        return f.read(1) == b'\n'
+
+
+@clinic_trace.traced("storage.update_user_password")
+def update_user_password(username, new_password):
+    """Change a user's password by appending a password-change record to users.txt."""
+    if get_storage() is not None:
+        get_storage().update_password(username, new_password)
+        if users_loaded:
+            users[username] = new_password
+        return
+    
+    password_change = {
+        "username": username,
+        "password": new_password,
+        "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "type": "password_change"
+    }
+    
+    def count_superseded(offset, end):
+        global superseded_user_records
+        superseded_user_records += 1
+    
+    commit = get_writer(USERS_FILE, users_file_lock).append(
+        (json.dumps(password_change) + '\n').encode('utf-8'), on_written=count_superseded)
+    if not wait_for_commit(commit, USERS_FILE):
+        raise IOError(f"Failed to write password change: {commit.error}")
+    if users_loaded:
+        users[username] = new_password
+    
+    if superseded_user_records >= max(USERS_COMPACTION_MIN_RECORDS, user_count):
+        start_users_compaction()
+
+
+@clinic_trace.traced("storage.compact_users_file")
+def compact_users_file():
+    """Rewrite users.txt with one record per user, replacing the file atomically."""
+    global superseded_user_records, users_compaction_running
+    try:
+        with users_file_lock, file_lock(USERS_FILE).exclusive():
+            latest = {}
+            with open(USERS_FILE, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        user_data = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        clinic_trace.error("Error parsing user data: %s", e)
+                        continue
+                    if 'username' not in user_data or 'password' not in user_data:
+                        continue
+                    if user_data['username'] in latest:
+                        record = latest[user_data['username']]
+                        record['password'] = user_data['password']
+                        if 'updated_at' in user_data:
+                            record['updated_at'] = user_data['updated_at']
+                    else:
+                        user_data.pop('type', None)
+                        latest[user_data['username']] = user_data
+            
+            temp_file = USERS_FILE + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                for record in latest.values():
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, USERS_FILE)
+            superseded_user_records = 0
+            clinic_trace.info("Compacted users file to %s users", len(latest))
+    except Exception as e:
+        clinic_trace.error("Error compacting users file: %s", e)
+    finally:
+        users_compaction_running = False
+
+
+def start_users_compaction():
+    """Compact users.txt on a background thread unless a compaction is already running."""
+    global users_compaction_running
+    if users_compaction_running:
+        return
+    users_compaction_running = True
+    threading.Thread(target=compact_users_file, name="users-compaction", daemon=True).start()
+
+
+@clinic_trace.traced("storage.save_forgot_password_record")
+def save_forgot_password_record(username, new_password):
+    """Save forgot password reset record to forgot_password.txt file."""
+    os.makedirs(os.path.dirname(FORGOT_PASSWORD_FILE), exist_ok=True)
+    try:
+        reset_record = {
+            "reset_id": new_record_id("RST"),
+            "username": username,
+            "reset_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "completed"
+        }
+        if get_storage() is not None:
+            get_storage().save_forgot_password_record(reset_record)
+            return True
+        commit = get_writer(FORGOT_PASSWORD_FILE).append((json.dumps(reset_record) + '\n').encode('utf-8'))
+        if not wait_for_commit(commit, FORGOT_PASSWORD_FILE):
+            clinic_trace.error("Error writing forgot password record: %s", commit.error)
+            return False
+        return True
+    except Exception as e:
+        clinic_trace.error("Error saving forgot password record: %s", e)
+        return False
+
+
+@clinic_trace.traced("storage.load_forgot_password_history")
+def load_forgot_password_history(username, include_archived=False):
+    """Load password reset history for a specific user."""
+    if get_storage() is not None:
+        try:
+            return get_storage().forgot_password_history(username)
+        except Exception as e:
+            clinic_trace.error("Error loading forgot password history: %s", e)
+            return []
+    try:
+        return list(iter_forgot_password_records(username=username, include_archived=include_archived))
+    except Exception as e:
+        clinic_trace.error("Error loading forgot password history: %s", e)
+        return []
+
+
+@clinic_trace.traced("storage.save_cancellation_record")
+def save_cancellation_record(patient_name, booking_id, appointment_date, services_list, total_amount, reason=""):
+    """Save booking cancellation record to cancellations.txt file."""
+    os.makedirs(os.path.dirname(CANCELLATIONS_FILE), exist_ok=True)
+    try:
+        cancellation_data = {
+            "cancellation_id": new_record_id("CAN"),
+            "booking_id": booking_id,
+            "patient_name": patient_name,
+            "appointment_date": appointment_date,
+            "services": services_list,
+            "total_amount": total_amount,
+            "cancellation_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "reason": reason,
+            "status": "cancelled"
+        }
+        if get_storage() is not None:
+            get_storage().save_cancellation(cancellation_data)
+            return cancellation_data
+        commit = get_writer(CANCELLATIONS_FILE).append(
+            (json.dumps(cancellation_data) + '\n').encode('utf-8'),
+            on_written=lambda offset, end: _record_booking_status(booking_id, "cancelled", offset, end))
+        if not wait_for_commit(commit, CANCELLATIONS_FILE):
+            clinic_trace.error("Error writing cancellation record: %s", commit.error)
+            return None
+        return cancellation_data
+    except Exception as e:
+        clinic_trace.error("Error saving cancellation record: %s", e)
+        return None
+
+
+def _scan_booking_status_from(start):
+    """Apply the complete lines of cancellations.txt from byte offset `start` to the status overlay."""
+    global booking_status_size
+    with file_lock(CANCELLATIONS_FILE).shared(), open(CANCELLATIONS_FILE, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        f.seek(start)
+        offset = start
+        for line in f:
+            if offset + len(line) > size or not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            if b'"booking_id"' not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                clinic_trace.warning("Skipping unreadable cancellation at byte %s: %s", offset - len(line), e)
+                continue
+            if isinstance(record, dict) and record.get('booking_id') is not None:
+                booking_status[record['booking_id']] = record.get('status') or "cancelled"
+        booking_status_size = offset
+
+
+def _catch_up_booking_status():
+    """Bring the booking_id -> status overlay up to date with cancellations.txt."""
+    global booking_status_size, booking_status_identity
+    with booking_status_lock:
+        if not os.path.exists(CANCELLATIONS_FILE):
+            return
+        size = os.path.getsize(CANCELLATIONS_FILE)
+        identity = file_identity(CANCELLATIONS_FILE)
+        if size < booking_status_size or identity != booking_status_identity:
+            
+            booking_status.clear()
+            booking_status_size = 0
+            booking_status_identity = identity
+        if size > booking_status_size:
+            _scan_booking_status_from(booking_status_size)
+
+
+def _record_booking_status(booking_id, status, offset, end):
+    """Apply a just-appended cancellation to the status overlay without rescanning the file."""
+    global booking_status_size
+    with booking_status_lock:
+        if offset == booking_status_size:
+            booking_status[booking_id] = status
+            booking_status_size = end
+        else:
+            _catch_up_booking_status()
+
+
+@clinic_trace.traced("storage.load_cancellations_for_user")
+def load_cancellations_for_user(username, include_archived=False):
+    """Load all cancellation records for a specific user."""
+    if get_storage() is not None:
+        try:
+            return get_storage().cancellations_for_patient(username)
+        except Exception as e:
+            clinic_trace.error("Error loading cancellations: %s", e)
+            return []
+    try:
+        return list(iter_cancellations(patient_name=username, include_archived=include_archived))
+    except Exception as e:
+        clinic_trace.error("Error loading cancellations: %s", e)
+        return []
+
+
+def _raw_value_needles(value):
+    """Byte strings, one of which must occur in a raw JSON line whose record holds `value`."""
+    return {json.dumps(value).encode('utf-8'), json.dumps(value, ensure_ascii=False).encode('utf-8')}
+
+
+def _as_day(value):
+    if value is None or hasattr(value, 'toordinal'):
+        return value
+    return parse_appointment_date(str(value)[:10])
+
+
+def iter_json_records(path, equals=None, date_field=None, date_from=None, date_to=None):
+    """Lazily yield the JSON records in `path`, oldest first.
+
+    The file is memory-mapped. `equals` maps fields to required values; the mapping
+    is searched for the raw bytes of the first value, so only lines that contain it
+    are copied out and checked for the others before json.loads.
+    `date_from`/`date_to` (dates or ISO strings, inclusive) filter on `date_field`.
+    """
+    equals = {field: value for field, value in (equals or {}).items() if value is not None}
+    needles = [_raw_value_needles(value) for value in equals.values()]
+    date_from, date_to = _as_day(date_from), _as_day(date_to)
+    if not os.path.exists(path):
+        return
+    
+    with file_lock(path).shared():
+        f = open(path, 'rb')
+        size = os.fstat(f.fileno()).st_size
+    with f:
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+            for start, end in _line_spans(mapped, 0, size, needles[0] if needles else None):
+                line = mapped[start:end]
+                if any(not any(needle in line for needle in alternatives) for alternatives in needles[1:]):
+                    continue
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    clinic_trace.error("Error parsing JSON at byte %s of %s: %s", start, os.path.basename(path), e)
+                    continue
+                if not isinstance(record, dict):
+                    continue
+                if any(record.get(field) != value for field, value in equals.items()):
+                    continue
+                if date_from is not None or date_to is not None:
+                    day = _as_day(record.get(date_field))
+                    if (day is None or (date_from is not None and day < date_from)
+                            or (date_to is not None and day > date_to)):
+                        continue
+                yield record
+
+
+def _iter_storage_records(table, equals, date_field, date_from, date_to):
+    date_from, date_to = _as_day(date_from), _as_day(date_to)
+    for record in get_storage().iter_records(table, equals):
+        if date_from is not None or date_to is not None:
+            day = _as_day(record.get(date_field))
+            if day is None or (date_from is not None and day < date_from) or (date_to is not None and day > date_to):
+                continue
+        yield record
+
+
+def iter_users(username=None):
+    """Yield user records (including later password-change records) from the selected backend."""
+    if get_storage() is not None:
+        return _iter_storage_records("users", {'username': username}, None, None, None)
+    return iter_json_records(USERS_FILE, {'username': username})
+
+
+def iter_bookings(patient_name=None, date_from=None, date_to=None, status=None, include_archived=False):
+    """Yield raw booking records, filtered by patient, appointment date range and status.
+
+    `status` is matched against the current status, i.e. after the cancellation
+    overlay, not the status stored in the booking line.
+    With include_archived=True the archived bookings (see clinic_archive) come first.
+    """
+    equals = {'patient_name': patient_name}
+    if get_storage() is not None:
+        equals['status'] = status
+        return _iter_storage_records("bookings", equals, 'appointment_date', date_from, date_to)
+    records = iter_json_records(BOOKINGS_FILE, equals, 'appointment_date', date_from, date_to)
+    if include_archived:
+        records = chain(iter_archived_records("bookings", equals, 'appointment_date', date_from, date_to), records)
+    if status is None:
+        return records
+    _catch_up_booking_status()
+    return (record for record in records if booking_status_of(record) == status)
+
+
+def booking_status_of(booking_data):
+    """The current status of a raw booking record: its cancellation status if it has one, else the stored status."""
+    status = booking_status.get(booking_record_id(booking_data))
+    if status is not None:
+        return status
+    return booking_data.get('status') or "confirmed"
+
+
+def iter_booking_records(patient_name=None, date_from=None, date_to=None, status=None, include_archived=False):
+    """Like iter_bookings, but normalized the way load_bookings_for_user returns bookings."""
+    if get_storage() is None:
+        _catch_up_booking_status()
+    return (_booking_from_json(booking)
+            for booking in iter_bookings(patient_name, date_from, date_to, status, include_archived))
+
+
+def iter_forgot_password_records(username=None, date_from=None, date_to=None, status=None, include_archived=False):
+    """Yield password reset records, filtered by username, reset date range and status."""
+    equals = {'username': username, 'status': status}
+    if get_storage() is not None:
+        return _iter_storage_records("forgot_password", equals, 'reset_date', date_from, date_to)
+    records = iter_json_records(FORGOT_PASSWORD_FILE, equals, 'reset_date', date_from, date_to)
+    if include_archived:
+        return chain(iter_archived_records("forgot_password", equals, 'reset_date', date_from, date_to), records)
+    return records
+
+
+def iter_cancellations(patient_name=None, date_from=None, date_to=None, status=None, include_archived=False):
+    """Yield cancellation records, filtered by patient, appointment date range and status."""
+    equals = {'patient_name': patient_name, 'status': status}
+    if get_storage() is not None:
+        return _iter_storage_records("cancellations", equals, 'appointment_date', date_from, date_to)
+    records = iter_json_records(CANCELLATIONS_FILE, equals, 'appointment_date', date_from, date_to)
+    if include_archived:
+        return chain(iter_archived_records("cancellations", equals, 'appointment_date', date_from, date_to), records)
+    return records
+
+
+def archive_segments(name):
+    """Archive segment files of one log ("bookings", "cancellations", "forgot_password"), oldest month first."""
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    prefix = name + "-"
+    return sorted(os.path.join(ARCHIVE_DIR, file_name) for file_name in os.listdir(ARCHIVE_DIR)
+                  if file_name.startswith(prefix) and file_name.endswith((".jsonl", ".jsonl.gz")))
+
+
+def iter_archived_records(name, equals=None, date_field=None, date_from=None, date_to=None):
+    """Yield the records archived from one log, filtered like iter_json_records.
+
+    Segments are per month of `date_field`, so segments outside the date range are
+    not opened. A record archived twice (a compaction interrupted after writing the
+    archive but before replacing the hot file) is yielded once.
+    """
+    equals = {field: value for field, value in (equals or {}).items() if value is not None}
+    needles = [_raw_value_needles(value) for value in equals.values()]
+    date_from, date_to = _as_day(date_from), _as_day(date_to)
+    id_field = ARCHIVE_ID_FIELDS.get(name)
+    seen = set()
+    for path in archive_segments(name):
+        month = os.path.basename(path)[len(name) + 1:len(name) + 8]
+        if (date_from is not None and month < date_from.isoformat()[:7]) or \
+                (date_to is not None and month > date_to.isoformat()[:7]):
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, 'rb') as f:
+                for line in f:
+                    if any(not any(needle in line for needle in alternatives) for alternatives in needles):
+                        continue
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        clinic_trace.error("Error parsing archived record in %s: %s", os.path.basename(path), e)
+                        continue
+                    if not isinstance(record, dict):
+                        continue
+                    if any(record.get(field) != value for field, value in equals.items()):
+                        continue
+                    if date_from is not None or date_to is not None:
+                        day = _as_day(record.get(date_field))
+                        if (day is None or (date_from is not None and day < date_from)
+                                or (date_to is not None and day > date_to)):
+                            continue
+                    record_id = record.get(id_field)
+                    if record_id is not None:
+                        if record_id in seen:
+                            continue
+                        seen.add(record_id)
+                    yield record
+        except (OSError, EOFError) as e:
+            clinic_trace.error("Error reading archive segment %s: %s", os.path.basename(path), e)
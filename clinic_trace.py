@@ -0,0 +1,188 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+LOG_LEVEL = LEVELS.get(os.environ.get("CLINIC_LOG_LEVEL", "info").lower(), LEVELS["info"])
+TRACE_ENABLED = os.environ.get("CLINIC_TRACE", "off").lower() not in ("", "0", "off", "false", "no")
+TRACE_FILE = os.environ.get("CLINIC_TRACE_FILE")
+PREFIXES = {"debug": "DEBUG: ", "info": "", "warning": "Warning: ", "error": ""}
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+_spans = {}
+_spans_lock = threading.Lock()
+
+
+def log(level, message, *args):
+    """Print `message` (%-formatted with `args` only if it is printed) when `level` is enabled."""
+    if LEVELS[level] < LOG_LEVEL:
+        return
+    if args:
+        message = message % args
+    print(f"{PREFIXES[level]}{message}")
+
+
+def debug(message, *args):
+    log("debug", message, *args)
+
+
+def info(message, *args):
+    log("info", message, *args)
+
+
+def warning(message, *args):
+    log("warning", message, *args)
+
+
+def error(message, *args):
+    log("error", message, *args)
+
+
+def enabled(level):
+    return LEVELS[level] >= LOG_LEVEL
+
+
+def set_log_level(level):
+    global LOG_LEVEL
+    LOG_LEVEL = LEVELS[level]
+
+
+def enable_tracing(on=True):
+    global TRACE_ENABLED
+    TRACE_ENABLED = on
+
+
+class SpanStats:
+    """Count, total and max duration plus a latency histogram for one span name."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        milliseconds = seconds * 1000
+        for n, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if milliseconds <= bound:
+                self.buckets[n] += 1
+                return
+        self.buckets[-1] += 1
+
+    def as_dict(self):
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "histogram": {label: n for label, n in zip(labels, self.buckets) if n},
+        }
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Context manager timing a block as span `name`; a shared no-op when tracing is off."""
+    if not TRACE_ENABLED:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def traced(name):
+    """Decorator timing every call of a function as span `name` while tracing is on."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACE_ENABLED:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds):
+    """Add one duration to the stats of span `name`."""
+    with _spans_lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = SpanStats()
+        stats.add(seconds)
+    if enabled("debug"):
+        debug("%s took %.2f ms", name, seconds * 1000)
+
+
+def summary():
+    """{span name: {count, total_ms, mean_ms, max_ms, histogram}}."""
+    with _spans_lock:
+        return {name: stats.as_dict() for name, stats in sorted(_spans.items())}
+
+
+def reset():
+    with _spans_lock:
+        _spans.clear()
+
+
+def dump_summary(file=None):
+    """Print per-span counts and latencies, slowest total first."""
+    file = file or sys.stdout
+    spans = summary()
+    if not spans:
+        return
+    print(f"{'span':<36} {'count':>8} {'total ms':>11} {'mean ms':>9} {'max ms':>9}", file=file)
+    for name, stats in sorted(spans.items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{name:<36} {stats['count']:>8} {stats['total_ms']:>11.1f} {stats['mean_ms']:>9.2f} "
+              f"{stats['max_ms']:>9.2f}", file=file)
+
+
+def _dump_on_exit():
+    if not TRACE_ENABLED:
+        return
+    dump_summary()
+    if TRACE_FILE:
+        try:
+            with open(TRACE_FILE, 'w', encoding='utf-8') as f:
+                json.dump(summary(), f, indent=2)
+        except OSError as e:
+            print(f"Error writing trace summary: {e}")
+
+
+atexit.register(_dump_on_exit)
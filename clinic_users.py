@@ -0,0 +1,343 @@
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+import clinic_storage
+import clinic_trace
+from clinic_locks import file_lock
+
+
+USER_INDEX_FILE = os.path.join(clinic_storage.DATA_DIR, "users.idx")
+USER_INDEX_MAGIC = b"CLINUSRS"
+USER_INDEX_VERSION = 1
+USER_CACHE_SIZE = int(os.environ.get("CLINIC_USER_CACHE", "4096"))
+USER_INDEX_MAX_TAIL = 10000
+BLOOM_BITS_PER_USER = 10
+BLOOM_HASHES = 7
+_USER_RECORD = re.compile(rb'"username"\s*:\s*"([^"\\]*)"')
+
+
+def _user_hash(username):
+    """Two independent 64-bit hashes of `username`, stable across processes (unlike hash())."""
+    return struct.unpack('<QQ', hashlib.blake2b(username.encode('utf-8'), digest_size=16).digest())
+
+
+def _raw_username(line):
+    """The username of a users.txt line that holds a password, decoding only that field when it can."""
+    if line.count(b'"username"') == 1 and b'"password"' in line:
+        match = _USER_RECORD.search(line)
+        if match:
+            return match.group(1).decode('utf-8')
+    record = json.loads(line)
+    if isinstance(record, dict) and 'username' in record and 'password' in record:
+        return record['username']
+    return None
+
+
+def _add_to_bloom(bloom, bits, hashes):
+    """Set the BLOOM_HASHES bits of every (h1, h2) in `hashes` (double hashing)."""
+    for h1, h2 in hashes:
+        for i in range(BLOOM_HASHES):
+            bit = (h1 + i * h2) % bits
+            bloom[bit >> 3] |= 1 << (bit & 7)
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+class UserDirectory:
+    """Resolves usernames to their current password without loading users.txt into memory.
+
+    users.idx holds a Bloom filter over every username and the byte offset of each
+    user's latest record in users.txt, sorted by username hash. A lookup is a Bloom
+    filter check (a definite "no such user" for almost every free username), a
+    binary search, and one line read from users.txt. Records appended after the
+    index was written are found by scanning just that tail; once the tail reaches
+    USER_INDEX_MAX_TAIL records the index is rewritten. The last USER_CACHE_SIZE
+    resolved accounts are kept in an LRU. Nothing is read until the first lookup,
+    and a users.txt replaced by compaction is detected by its file identity.
+    With the SQLite backend lookups go to the users table, behind the same LRU.
+    """
+
+    def __init__(self, path=USER_INDEX_FILE, cache_size=USER_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self.lock = threading.RLock()
+        self.cache = OrderedDict()
+        self.keys = array('Q')
+        self.offsets = array('Q')
+        self.bloom = bytearray()
+        self.bloom_bits = 0
+        self.tail = {}
+        self.users_size = 0
+        self.records = 0
+        self.identity = None
+        self.loaded = False
+
+    def password_for(self, username):
+        """The current password of `username`, or None if there is no such user."""
+        with self.lock:
+            database = clinic_storage.get_storage() is not None
+            if not database:
+                self._catch_up()
+            password = self.cache.get(username)
+            if password is None:
+                password = self._password_from_database(username) if database else self._read_password(username)
+            if password is not None:
+                self.remember(username, password)
+            return password
+
+    def exists(self, username):
+        return self.password_for(username) is not None
+
+    def remember(self, username, password):
+        """Put a just-registered or just-changed account in the LRU."""
+        with self.lock:
+            self.cache[username] = password
+            self.cache.move_to_end(username)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def __len__(self):
+        """Number of distinct usernames in users.txt (text backend)."""
+        with self.lock:
+            self._catch_up()
+            return len(self.keys) + sum(1 for username in self.tail if not self._indexed_offsets(username))
+
+    def _password_from_database(self, username):
+        password = None
+        for record in clinic_storage.iter_users(username):
+            password = record.get('password', password)
+        return password
+
+    def _read_password(self, username):
+        h1, h2 = _user_hash(username)
+        if not self._might_contain(h1, h2):
+            return None
+        offset = self.tail.get(username)
+        offsets = [offset] if offset is not None else self._indexed_offsets(username, h1)
+        if not offsets:
+            return None
+        with open(clinic_storage.USERS_FILE, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                try:
+                    record = json.loads(f.readline())
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and record.get('username') == username:
+                    return record.get('password')
+        return None
+
+    def _indexed_offsets(self, username, h1=None):
+        if h1 is None:
+            h1 = _user_hash(username)[0]
+        position = bisect.bisect_left(self.keys, h1)
+        offsets = []
+        while position < len(self.keys) and self.keys[position] == h1:
+            offsets.append(self.offsets[position])
+            position += 1
+        return offsets
+
+    def _might_contain(self, h1, h2):
+        if not self.bloom_bits:
+            return False
+        for i in range(BLOOM_HASHES):
+            bit = (h1 + i * h2) % self.bloom_bits
+            if not self.bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _catch_up(self):
+        """Load the index on first use, then fold in whatever was appended to users.txt since."""
+        identity = clinic_storage.file_identity(clinic_storage.USERS_FILE)
+        if not self.loaded or identity != self.identity:
+            self.load()
+            return
+        if identity is not None:
+            size = os.path.getsize(clinic_storage.USERS_FILE)
+            if size > self.users_size:
+                self._scan_tail()
+            elif size < self.users_size:
+                self.rebuild()
+
+    def load(self):
+        """Read users.idx if it still describes users.txt, rebuilding it otherwise."""
+        with self.lock:
+            self.cache.clear()
+            self.tail = {}
+            self.loaded = True
+            if not self._read_index():
+                self.rebuild()
+            elif os.path.getsize(clinic_storage.USERS_FILE) > self.users_size:
+                self._scan_tail()
+
+    def _read_index(self):
+        if not os.path.exists(self.path) or not os.path.exists(clinic_storage.USERS_FILE):
+            return False
+        try:
+            with file_lock(self.path).shared(), open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < len(USER_INDEX_MAGIC) + 4:
+                    return False
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                    if view[:len(USER_INDEX_MAGIC)] != USER_INDEX_MAGIC:
+                        return False
+                    header_length = struct.unpack_from('<I', mapped, len(USER_INDEX_MAGIC))[0]
+                    header_start = len(USER_INDEX_MAGIC) + 4
+                    header = json.loads(bytes(view[header_start:header_start + header_length]))
+                    if header.get('version') != USER_INDEX_VERSION or header.get('byteorder') != sys.byteorder:
+                        return False
+                    if (tuple(header['identity'] or ()) != tuple(clinic_storage.file_identity(clinic_storage.USERS_FILE))
+                            or not clinic_storage.is_line_boundary(clinic_storage.USERS_FILE, header['users_size'])):
+                        clinic_trace.warning("User index is stale, rebuilding")
+                        return False
+                    data_start = _aligned(header_start + header_length)
+                    spans = {name: (data_start + offset, data_start + offset + length)
+                             for name, (offset, length) in header['blocks'].items()}
+                    keys, offsets = array('Q'), array('Q')
+                    keys.frombytes(view[slice(*spans['keys'])])
+                    offsets.frombytes(view[slice(*spans['offsets'])])
+                    bloom = bytearray(view[slice(*spans['bloom'])])
+        except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+            clinic_trace.error("Error reading user index: %s", e)
+            return False
+        if len(keys) != len(offsets) or len(bloom) * 8 < header['bloom_bits']:
+            return False
+        self.keys, self.offsets, self.bloom = keys, offsets, bloom
+        self.bloom_bits = header['bloom_bits']
+        self.users_size = header['users_size']
+        self.records = header['records']
+        _publish_counts(len(keys), self.records)
+        self.identity = clinic_storage.file_identity(clinic_storage.USERS_FILE)
+        return True
+
+    @clinic_trace.traced("users.rebuild_index")
+    def rebuild(self):
+        """Scan users.txt once and rewrite users.idx (temp file, then rename)."""
+        with self.lock:
+            self.cache.clear()
+            self.tail = {}
+            self.loaded = True
+            self.identity = clinic_storage.file_identity(clinic_storage.USERS_FILE)
+            latest, self.users_size, records = self._scan(0)
+            self.records = records
+            _publish_counts(len(latest), records)
+            hashes = [_user_hash(username) for username in latest]
+            entries = sorted(zip([h1 for h1, _h2 in hashes], latest.values()))
+            self.keys = array('Q', [key for key, _offset in entries])
+            self.offsets = array('Q', [offset for _key, offset in entries])
+            self.bloom_bits = _aligned(max(1024, len(entries) * BLOOM_BITS_PER_USER))
+            self.bloom = bytearray(self.bloom_bits // 8)
+            _add_to_bloom(self.bloom, self.bloom_bits, hashes)
+            del latest, hashes, entries
+            if self.identity is None:
+                return
+            try:
+                self._write_index()
+            except OSError as e:
+                clinic_trace.error("Error writing user index: %s", e)
+            clinic_trace.info("Indexed %s users", len(self.keys))
+
+    def _write_index(self):
+        blobs = {"keys": self.keys.tobytes(), "offsets": self.offsets.tobytes(), "bloom": bytes(self.bloom)}
+        header = {
+            "version": USER_INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "users_size": self.users_size,
+            "identity": list(self.identity) if self.identity else None,
+            "users": len(self.keys),
+            "records": self.records,
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": BLOOM_HASHES,
+            "blocks": {},
+        }
+        offset = 0
+        for name, blob in blobs.items():
+            header["blocks"][name] = [offset, len(blob)]
+            offset = _aligned(offset + len(blob))
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = _aligned(len(USER_INDEX_MAGIC) + 4 + len(header_bytes))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_file = self.path + ".tmp"
+        with file_lock(self.path).exclusive():
+            with open(temp_file, 'wb') as f:
+                f.write(USER_INDEX_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+                for blob in blobs.values():
+                    f.write(b'\0' * (data_start - f.tell()))
+                    f.write(blob)
+                    data_start = _aligned(f.tell())
+            os.replace(temp_file, self.path)
+
+    def _scan_tail(self):
+        """Fold the records appended to users.txt since the last scan into the tail and the Bloom filter."""
+        latest, self.users_size, _records = self._scan(self.users_size)
+        for username, offset in latest.items():
+            self.tail[username] = offset
+            self.cache.pop(username, None)
+        _add_to_bloom(self.bloom, self.bloom_bits, [_user_hash(username) for username in latest])
+        if len(self.tail) >= USER_INDEX_MAX_TAIL:
+            self.rebuild()
+
+    def _scan(self, start):
+        """{username: offset of its latest record} for the complete lines of users.txt after `start`,
+        the end of the last one and the number of user records read."""
+        latest = {}
+        end = start
+        records = 0
+        if not os.path.exists(clinic_storage.USERS_FILE):
+            return latest, end, records
+        with file_lock(clinic_storage.USERS_FILE).shared(), open(clinic_storage.USERS_FILE, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= start:
+                return latest, end, records
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+                for offset, end in clinic_storage._line_spans(mapped, start, size):
+                    line = mapped[offset:end]
+                    if not line.strip():
+                        continue
+                    try:
+                        username = _raw_username(line)
+                    except (ValueError, UnicodeDecodeError) as e:
+                        clinic_trace.warning("Skipping unreadable user record at byte %s: %s", offset, e)
+                        continue
+                    if username is not None:
+                        latest[username] = offset
+                        records += 1
+        return latest, end, records
+
+
+def _publish_counts(users, records):
+    """Tell clinic_storage how many users and superseded records users.txt holds, for its compaction trigger."""
+    clinic_storage.user_count = users
+    clinic_storage.superseded_user_records = records - users
+
+
+user_directory = UserDirectory()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update or rebuild the username index of users.txt.")
+    parser.add_argument("--rebuild", action="store_true", help="rescan users.txt even if the index is current")
+    args = parser.parse_args(argv)
+    started = time.perf_counter()
+    if args.rebuild:
+        user_directory.rebuild()
+    else:
+        user_directory.load()
+    print(f"{USER_INDEX_FILE}: {len(user_directory)} users in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+import clinic_storage
+import clinic_trace
+
+
+WATCHDOG_ENABLED = os.environ.get("CLINIC_WATCHDOG", "off").lower() not in ("", "0", "off", "false", "no")
+DEFAULT_STALL_THRESHOLD_MS = 250
+HEARTBEAT_MS = 50
+MAX_SAMPLES_PER_STALL = 5
+STALL_REPORT_FILE = os.path.join(clinic_storage.DATA_DIR, "stalls.jsonl")
+
+
+def _stall_threshold_ms():
+    """CLINIC_WATCHDOG_MS as a positive int, or the default if it is unset or invalid."""
+    value = os.environ.get("CLINIC_WATCHDOG_MS", "").strip()
+    if not value:
+        return DEFAULT_STALL_THRESHOLD_MS
+    try:
+        threshold = int(value)
+    except ValueError:
+        threshold = 0
+    if threshold <= 0:
+        clinic_trace.warning("Ignoring CLINIC_WATCHDOG_MS=%r, using %s ms", value, DEFAULT_STALL_THRESHOLD_MS)
+        return DEFAULT_STALL_THRESHOLD_MS
+    return threshold
+
+
+STALL_THRESHOLD_MS = _stall_threshold_ms()
+
+
+class StallWatchdog:
+    """Detects event-loop stalls in a Tk app and records what the main thread was doing.
+
+    A heartbeat rescheduled with root.after every HEARTBEAT_MS measures how late Tk
+    runs it. A background thread watches the last heartbeat; once the main thread
+    has been stuck for `threshold_ms` it samples the main thread's stack (again
+    every further `threshold_ms`, up to MAX_SAMPLES_PER_STALL). When the loop comes
+    back, the stall (duration, the app method it happened in and the stack samples)
+    is appended to the JSON-lines report and counted as the "ui.stall" span.
+    """
+
+    def __init__(self, root, owner=None, threshold_ms=STALL_THRESHOLD_MS, report_file=STALL_REPORT_FILE):
+        self.root = root
+        self.owner_prefix = type(owner).__name__ + "." if owner is not None else None
+        self.threshold = threshold_ms / 1000
+        self.interval = HEARTBEAT_MS / 1000
+        self.report_file = report_file
+        self.main_thread_id = threading.get_ident()
+        self.lock = threading.Lock()
+        self.last_beat = time.perf_counter()
+        self.samples = []
+        self.finished = []
+        self.stalls = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.last_beat = time.perf_counter()
+        self.root.after(HEARTBEAT_MS, self._beat)
+        self.thread = threading.Thread(target=self._watch, name="tk-watchdog", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _beat(self):
+        now = time.perf_counter()
+        with self.lock:
+            lag = now - self.last_beat - self.interval
+            self.last_beat = now
+            samples, self.samples = self.samples, []
+            if lag >= self.threshold:
+                self.finished.append((lag, samples))
+        if self.running:
+            self.root.after(HEARTBEAT_MS, self._beat)
+
+    def _watch(self):
+        while self.running:
+            time.sleep(self.interval / 2)
+            with self.lock:
+                stalled = time.perf_counter() - self.last_beat - self.interval
+                if (stalled >= self.threshold * (len(self.samples) + 1)
+                        and len(self.samples) < MAX_SAMPLES_PER_STALL):
+                    self._sample(stalled)
+                finished, self.finished = self.finished, []
+            for lag, samples in finished:
+                self._record(lag, samples)
+
+    def _sample(self, stalled):
+        frame = sys._current_frames().get(self.main_thread_id)
+        if frame is None:
+            return
+        self.samples.append({
+            "after_ms": round(stalled * 1000, 1),
+            "method": self._app_method(frame),
+            "stack": traceback.format_stack(frame),
+        })
+
+    def _app_method(self, frame):
+        """The outermost method of the owner on the stack (the screen or action that is blocking)."""
+        method = None
+        while frame is not None:
+            name = _qualified_name(frame)
+            if self.owner_prefix is None or name.startswith(self.owner_prefix):
+                method = name
+            frame = frame.f_back
+        return method
+
+    def _record(self, lag, samples):
+        stall = {
+            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": round(lag * 1000, 1),
+            "method": samples[0]["method"] if samples else None,
+            "samples": samples,
+        }
+        self.stalls += 1
+        clinic_trace.record("ui.stall", lag)
+        clinic_trace.warning("UI stalled for %.0f ms in %s", stall["duration_ms"], stall["method"] or "unknown code")
+        try:
+            os.makedirs(os.path.dirname(self.report_file), exist_ok=True)
+            with open(self.report_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(stall) + '\n')
+        except OSError as e:
+            clinic_trace.error("Error writing stall report: %s", e)
+
+
+def _qualified_name(frame):
+    """Class.method for a frame; before Python 3.11 (no co_qualname) the class comes from `self`."""
+    code = frame.f_code
+    qualname = getattr(code, "co_qualname", None)
+    if qualname is not None:
+        return qualname
+    instance = frame.f_locals.get("self")
+    return f"{type(instance).__name__}.{code.co_name}" if instance is not None else code.co_name
+
+
+def summarize(report_file=STALL_REPORT_FILE):
+    """[(method, count, total_ms, max_ms, innermost sampled frame)] from a stall report, worst total first."""
+    groups = {}
+    if not os.path.exists(report_file):
+        return []
+    with open(report_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                stall = json.loads(line)
+            except ValueError:
+                continue
+            group = groups.setdefault(stall.get("method") or "unknown", [0, 0.0, 0.0, None])
+            group[0] += 1
+            group[1] += stall["duration_ms"]
+            if stall["duration_ms"] >= group[2]:
+                group[2] = stall["duration_ms"]
+                samples = stall.get("samples") or []
+                group[3] = samples[0]["stack"][-1].strip() if samples and samples[0]["stack"] else None
+    return sorted(((method, count, total, worst, frame) for method, (count, total, worst, frame) in groups.items()),
+                  key=lambda row: -row[2])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize the UI stall report written by the Tk watchdog.")
+    parser.add_argument("report", nargs="?", default=STALL_REPORT_FILE)
+    args = parser.parse_args()
+    rows = summarize(args.report)
+    if not rows:
+        print("No stalls recorded")
+    for method, count, total, worst, frame in rows:
+        print(f"{method:<48} {count:>5} stalls {total:>10.0f} ms total {worst:>8.0f} ms worst")
+        if frame:
+            print(f"    worst stall at: {frame.splitlines()[0]}")
@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clinic_snapshot
+import clinic_stats
+import clinic_storage
+import clinic_users
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Point the text backend, the patient stats and the user index at an empty booking_data directory."""
+    for name, filename in (("USERS_FILE", "users.txt"), ("BOOKINGS_FILE", "bookings.txt"),
+                           ("CANCELLATIONS_FILE", "cancellations.txt"),
+                           ("FORGOT_PASSWORD_FILE", "forgot_password.txt"),
+                           ("BOOKINGS_INDEX_FILE", "bookings.idx"), ("SQLITE_FILE", "clinic.db"),
+                           ("ARCHIVE_DIR", "archive")):
+        monkeypatch.setattr(clinic_storage, name, str(tmp_path / filename))
+    monkeypatch.setattr(clinic_storage, "STORAGE_BACKEND", "text")
+    monkeypatch.setattr(clinic_storage, "storage", None)
+    monkeypatch.setattr(clinic_storage, "users", {})
+    monkeypatch.setattr(clinic_storage, "users_loaded", False)
+    monkeypatch.setattr(clinic_storage, "booking_index", {})
+    monkeypatch.setattr(clinic_storage, "booking_index_size", 0)
+    monkeypatch.setattr(clinic_storage, "booking_index_identity", None)
+    monkeypatch.setattr(clinic_storage, "booking_index_loaded", False)
+    monkeypatch.setattr(clinic_storage, "booking_status", {})
+    monkeypatch.setattr(clinic_storage, "booking_status_size", 0)
+    monkeypatch.setattr(clinic_storage, "booking_status_identity", None)
+    monkeypatch.setattr(clinic_stats, "stats_table",
+                        clinic_stats.PatientStatsTable(str(tmp_path / "patient_stats.json")))
+    monkeypatch.setattr(clinic_users, "user_directory", clinic_users.UserDirectory(str(tmp_path / "users.idx")))
+    monkeypatch.setattr(clinic_snapshot, "SNAPSHOT_ENABLED", False)
+    yield tmp_path
+    clinic_storage.close_writers()
+    if clinic_storage.storage is not None:
+        clinic_storage.storage.close()
+
+
+@pytest.fixture
+def sqlite_dir(data_dir, monkeypatch):
+    """Like data_dir, with the SQLite backend selected."""
+    monkeypatch.setattr(clinic_storage, "STORAGE_BACKEND", "sqlite")
+    return data_dir
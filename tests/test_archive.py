@@ -0,0 +1,53 @@
+import os
+from datetime import date
+
+import pytest
+
+import clinic_archive
+import clinic_stats
+import clinic_storage
+
+
+def book(patient_name, appointment_date):
+    return clinic_storage.save_booking(patient_name, appointment_date, [("Dental Cleaning", 1, 1000.0)], 1000.0)
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_archived_bookings_round_trip(data_dir, compress):
+    january = book("alice", "2020-01-10")
+    february = book("alice", "02/15/20")
+    upcoming = book("alice", "2030-01-02")
+    clinic_storage.save_cancellation_record("alice", january['booking_id'], "2020-01-10", january['services'],
+                                            1000.0)
+    assert clinic_stats.patient_stats("alice")['total'] == 3
+
+    counts = clinic_archive.archive_booking_data(before=date(2025, 1, 1), compress=compress)
+    assert counts == {"bookings": 2, "cancellations": 1, "forgot_password": 0}
+    suffix = ".jsonl.gz" if compress else ".jsonl"
+    assert [os.path.basename(path) for path in clinic_storage.archive_segments("bookings")] == [
+        "bookings-2020-01" + suffix, "bookings-2020-02" + suffix]
+
+    assert [b['booking_id'] for b in clinic_storage.load_bookings_for_user("alice")] == [upcoming['booking_id']]
+    bookings = clinic_storage.load_bookings_for_user("alice", include_archived=True)
+    assert {b['booking_id']: b['status'] for b in bookings} == {
+        january['booking_id']: "cancelled", february['booking_id']: "confirmed", upcoming['booking_id']: "confirmed"}
+    assert os.path.getsize(clinic_storage.CANCELLATIONS_FILE) == 0
+
+    stats = clinic_stats.patient_stats("alice")
+    assert (stats['total'], stats['archived'], stats['cancelled']) == (3, 2, 1)
+    assert clinic_archive.archive_booking_data(before=date(2025, 1, 1), compress=compress)['bookings'] == 0
+
+
+def test_torn_last_line_does_not_swallow_the_next_booking(data_dir):
+    book("alice", "2020-01-10")
+    book("alice", "2030-01-02")
+    with open(clinic_storage.BOOKINGS_FILE, 'a', encoding='utf-8') as f:
+        f.write('{"booking_id": "BK-TORN", "patient_na')
+
+    clinic_archive.archive_booking_data(before=date(2025, 1, 1))
+    with open(clinic_storage.BOOKINGS_FILE, 'rb') as f:
+        assert f.read().endswith(b'"patient_na\n')
+
+    later = book("alice", "2030-01-03")
+    assert [b['booking_id'] for b in clinic_storage.load_bookings_for_user("alice")][0] == later['booking_id']
+    assert len(list(clinic_storage.iter_bookings(patient_name="alice"))) == 2
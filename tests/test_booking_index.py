@@ -0,0 +1,56 @@
+import json
+import os
+
+import clinic_storage
+
+
+def book(patient_name, appointment_date, amount=1000.0):
+    return clinic_storage.save_booking(patient_name, appointment_date, [("Dental Cleaning", 1, amount)], amount)
+
+
+def test_bookings_for_user_come_from_the_index(data_dir):
+    first = book("alice", "2030-01-02")
+    book("bob", "2030-01-03")
+    second = book("alice", "2030-01-04")
+
+    bookings = clinic_storage.load_bookings_for_user("alice")
+    assert [b['booking_id'] for b in bookings] == [second['booking_id'], first['booking_id']]
+    assert clinic_storage.load_bookings_for_user("carol") == []
+
+    with open(clinic_storage.BOOKINGS_INDEX_FILE, 'r', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry[0] for entry in entries] == ["alice", "bob", "alice"]
+    assert entries[-1][2] == os.path.getsize(clinic_storage.BOOKINGS_FILE)
+
+
+def test_index_catches_up_with_lines_written_by_another_process(data_dir):
+    book("alice", "2030-01-02")
+    clinic_storage.load_bookings_for_user("alice")
+    with open(clinic_storage.BOOKINGS_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({"booking_id": "BK-OTHER", "patient_name": "alice", "appointment_date": "2030-02-01",
+                            "services": [], "total_amount": 0.0, "status": "confirmed"}) + '\n')
+
+    bookings = clinic_storage.load_bookings_for_user("alice")
+    assert [b['booking_id'] for b in bookings][0] == "BK-OTHER"
+    assert len(bookings) == 2
+
+
+def test_stale_index_is_rebuilt(data_dir):
+    book("alice", "2030-01-02")
+    book("bob", "2030-01-03")
+    clinic_storage.load_bookings_for_user("alice")
+    with open(clinic_storage.BOOKINGS_FILE, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(clinic_storage.BOOKINGS_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(reversed(lines))
+
+    assert [b['patient_name'] for b in clinic_storage.load_bookings_for_user("alice")] == ["alice"]
+    assert [b['patient_name'] for b in clinic_storage.load_bookings_for_user("bob")] == ["bob"]
+
+
+def test_chunks_are_newest_first(data_dir):
+    saved = [book("alice", f"2030-01-{day:02d}") for day in range(1, 6)]
+
+    chunks = list(clinic_storage.load_bookings_for_user_in_chunks("alice", chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [b['booking_id'] for chunk in chunks for b in chunk] == [b['booking_id'] for b in reversed(saved)]
@@ -0,0 +1,19 @@
+import clinic_storage
+
+
+def test_status_filter_sees_cancellations(data_dir):
+    kept = clinic_storage.save_booking("alice", "2030-01-02", [("Dental Cleaning", 1, 1000.0)], 1000.0)
+    cancelled = clinic_storage.save_booking("alice", "2030-01-03", [("Eye Check-up", 1, 1000.0)], 1000.0)
+    clinic_storage.save_cancellation_record("alice", cancelled['booking_id'], "2030-01-03",
+                                            [("Eye Check-up", 1, 1000.0)], 1000.0)
+
+    confirmed = list(clinic_storage.iter_booking_records(patient_name="alice", status="confirmed"))
+    assert [b['booking_id'] for b in confirmed] == [kept['booking_id']]
+    assert all(b['status'] == "confirmed" for b in confirmed)
+
+    cancelled_records = list(clinic_storage.iter_booking_records(patient_name="alice", status="cancelled"))
+    assert [b['booking_id'] for b in cancelled_records] == [cancelled['booking_id']]
+    assert cancelled_records[0]['status'] == "cancelled"
+
+    assert sum(1 for _ in clinic_storage.iter_bookings(status="confirmed")) == 1
+    assert sum(1 for _ in clinic_storage.iter_bookings(status="cancelled")) == 1
@@ -0,0 +1,92 @@
+import json
+import os
+from datetime import date, timedelta
+
+import pytest
+
+import clinic_storage
+from clinic_capacity import CapacityEngine
+from clinic_service import BookingError, BookingService
+
+
+SLOT_TIMES = ("09:00", "10:00")
+SLOT_CAPACITY = {"Dental Cleaning": 2, "Physical Therapy": 2, "Eye Check-up": 3}
+
+
+def engine(data_dir, name="capacity_counters.json", slot_capacity=SLOT_CAPACITY):
+    return CapacityEngine(SLOT_TIMES, slot_capacity, {}, path=str(data_dir / name))
+
+
+@pytest.fixture
+def service(data_dir):
+    service = BookingService(capacity=engine(data_dir))
+    service.register("alice", "secret")
+    return service
+
+
+def tomorrow():
+    return date.today() + timedelta(days=1)
+
+
+def test_quantity_is_capped_at_one_slot(service):
+    assert service.max_quantity("Dental Cleaning") == 2
+    with pytest.raises(BookingError, match="at most 2 patients"):
+        service.quote({"Dental Cleaning": 3})
+    assert service.capacity.next_free_slot([("Dental Cleaning", 3)], tomorrow()) is None
+
+
+def test_full_slot_points_to_the_next_one(service):
+    day = tomorrow().isoformat()
+    first = service.book("alice", day, {"Dental Cleaning": 2}, slot="09:00")
+    assert first['slot'] == "09:00"
+    assert service.capacity.remaining("Dental Cleaning", day, "09:00") == 0
+    with pytest.raises(BookingError, match="Next available: .* at 10:00"):
+        service.book("alice", day, {"Dental Cleaning": 1}, slot="09:00")
+
+    assert service.book("alice", day, {"Dental Cleaning": 1})['slot'] == "10:00"
+    service.cancel_booking("alice", first['booking_id'])
+    assert service.capacity.remaining("Dental Cleaning", day, "09:00") == 2
+
+
+def test_place_taken_by_another_process_is_rejected_under_the_lock(data_dir):
+    first, second = engine(data_dir, "first.json"), engine(data_dir, "second.json")
+    items, day = [("Dental Cleaning", 2)], tomorrow()
+    kept = first.reserve(items, day, "09:00", "BK-FIRST")
+    stale = second.reserve(items, day, "09:00", "BK-SECOND")
+    assert kept is not None and stale is not None
+
+    assert clinic_storage.save_booking("alice", day.isoformat(), [("Dental Cleaning", 2, 2000.0)], 2000.0,
+                                       slot="09:00", booking_id="BK-FIRST", check=lambda: first.confirm(kept))
+    assert clinic_storage.save_booking("bob", day.isoformat(), [("Dental Cleaning", 2, 2000.0)], 2000.0,
+                                       slot="09:00", booking_id="BK-SECOND",
+                                       check=lambda: second.confirm(stale)) is False
+    assert stale.conflict
+    second.release(stale)
+
+    with open(clinic_storage.BOOKINGS_FILE, 'r', encoding='utf-8') as f:
+        assert [json.loads(line)['booking_id'] for line in f] == ["BK-FIRST"]
+    assert second.remaining("Dental Cleaning", day, "09:00") == 0
+    assert second.remaining("Dental Cleaning", day, "10:00") == 2
+
+
+def test_counters_are_restored_without_rescanning(service, data_dir):
+    day = tomorrow()
+    service.book("alice", day.isoformat(), {"Eye Check-up": 2}, slot="10:00")
+    service.capacity.save()
+
+    restored = engine(data_dir)
+    assert not restored.loaded
+    restored.catch_up()
+    assert restored.bookings_size == os.path.getsize(clinic_storage.BOOKINGS_FILE)
+    assert not restored.dirty
+    assert restored.remaining("Eye Check-up", day, "10:00") == 1
+    assert restored.availability(day) == service.capacity.availability(day)
+
+
+def test_unreadable_booking_is_skipped(data_dir):
+    record = {"booking_id": "BK-BAD", "patient_name": "alice", "appointment_date": tomorrow().isoformat(),
+              "services": [{"service_name": "Dental Cleaning", "quantity": "two"}]}
+    with open(clinic_storage.BOOKINGS_FILE, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+    capacity = engine(data_dir)
+    assert capacity.remaining("Dental Cleaning", tomorrow(), "09:00") == 2
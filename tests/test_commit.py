@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from clinic_commit import CommitRejected, GroupCommitWriter
+
+
+@pytest.mark.parametrize("policy", ["record", "grouped", "interval"])
+def test_every_policy_writes_whole_lines(tmp_path, policy):
+    path = str(tmp_path / "log.txt")
+    writer = GroupCommitWriter(path, policy, window=0.01, interval=0.05)
+    written = []
+    commits = []
+    lock = threading.Lock()
+
+    def append(n):
+        commit = writer.append(f"line {n}\n".encode('utf-8'), on_written=lambda offset, end: written.append(end))
+        with lock:
+            commits.append(commit)
+
+    threads = [threading.Thread(target=append, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(commit.wait(5) for commit in commits)
+    writer.close()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert sorted(lines) == sorted(f"line {n}" for n in range(20))
+    assert len(written) == 20
+    assert all(commit.durable for commit in commits)
+    if policy == "grouped":
+        assert writer.syncs <= writer.batches <= 20
+
+
+def test_rejected_commit_is_not_written(tmp_path):
+    path = str(tmp_path / "log.txt")
+    writer = GroupCommitWriter(path, "grouped")
+    kept = writer.append(b"kept\n")
+    rejected = writer.append(b"rejected\n", check=lambda: False)
+    assert kept.wait(5)
+    assert not rejected.wait(5)
+    assert rejected.done
+    assert isinstance(rejected.error, CommitRejected)
+    writer.close()
+
+    with open(path, 'rb') as f:
+        assert f.read() == b"kept\n"
+
+
+def test_write_errors_reach_the_caller(tmp_path):
+    (tmp_path / "log.txt").mkdir()
+    writer = GroupCommitWriter(str(tmp_path / "log.txt"), "grouped")
+    commit = writer.append(b"line\n")
+    assert not commit.wait(5)
+    assert commit.done
+    assert isinstance(commit.error, OSError)
+    writer.close()
+
+
+def test_unknown_policy_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        GroupCommitWriter(str(tmp_path / "log.txt"), "sometimes")
@@ -0,0 +1,43 @@
+import threading
+
+import clinic_ids
+from clinic_ids import RecordIdGenerator, legacy_record_id, new_record_id
+
+
+def test_ids_are_unique_and_sorted_across_threads():
+    generator = RecordIdGenerator()
+    ids = []
+    lock = threading.Lock()
+
+    def generate():
+        batch = [generator.new_id("BK") for _ in range(500)]
+        assert batch == sorted(batch)
+        with lock:
+            ids.extend(batch)
+
+    threads = [threading.Thread(target=generate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == len(ids) == 4000
+
+
+def test_counter_overflow_moves_to_the_next_millisecond(monkeypatch):
+    monkeypatch.setattr(clinic_ids.time, "time", lambda: 1700000000.0)
+    generator = RecordIdGenerator()
+    ids = [generator.new_id("BK") for _ in range(clinic_ids.COUNTER_LIMIT + 2)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_new_ids_sort_after_second_resolution_ids():
+    assert new_record_id("BK") > "BK-20200101000000"
+    assert new_record_id("CAN").startswith("CAN-")
+
+
+def test_legacy_ids_are_stable():
+    record = {"patient_name": "alice", "appointment_date": "01/05/21", "created_at": "2021-01-01 10:00:00"}
+    assert legacy_record_id("BK", record) == legacy_record_id("BK", dict(record))
+    assert legacy_record_id("BK", record).startswith("BK-20210101100000-L")
+    assert legacy_record_id("BK", record) != legacy_record_id("BK", dict(record, patient_name="bob"))
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from datetime import date, timedelta
+from http import HTTPStatus
+
+import pytest
+
+from clinic_capacity import CapacityEngine
+from clinic_server import ClinicServer, HTTPError
+from clinic_service import BookingService
+
+
+@pytest.fixture
+def server(data_dir):
+    server = ClinicServer(BookingService(capacity=CapacityEngine(path=str(data_dir / "capacity_counters.json"))),
+                          workers=2)
+    yield server
+    server.executor.shutdown()
+
+
+def request(server, method, path, data=None, token=None, body=None):
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    if body is None:
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+    try:
+        return asyncio.run(server.dispatch(method, path, headers, body))
+    except HTTPError as e:
+        return e.status, {"error": e.message}
+
+
+def login(server):
+    assert request(server, "POST", "/register", {"username": "alice", "password": "secret"})[0] == HTTPStatus.CREATED
+    status, payload = request(server, "POST", "/login", {"username": "alice", "password": "secret"})
+    assert status == HTTPStatus.OK
+    return payload['token']
+
+
+def test_book_and_cancel(server):
+    token = login(server)
+    day = (date.today() + timedelta(days=1)).isoformat()
+    status, payload = request(server, "POST", "/bookings",
+                              {"appointment_date": day, "services": {"Eye Check-up": 2}, "slot": "09:00"}, token)
+    assert status == HTTPStatus.CREATED
+    booking_id = payload['booking']['booking_id']
+    assert request(server, "GET", f"/availability/{day}")[1]['availability']["Eye Check-up"]["09:00"] == 1
+
+    status, payload = request(server, "POST", f"/bookings/{booking_id}/cancel", {"reason": "sick"}, token)
+    assert status == HTTPStatus.OK
+    status, payload = request(server, "GET", "/bookings", token=token)
+    assert [b['status'] for b in payload['bookings']] == ["cancelled"]
+    assert request(server, "GET", "/stats", token=token)[1]['stats']['cancelled'] == 1
+
+
+@pytest.mark.parametrize("body", [b'{"username": ', b'["alice"]', b'{"username": 5, "password": "x"}',
+                                  b'{"username": "alice"}'])
+def test_bad_registration_bodies_are_400(server, body):
+    status, payload = request(server, "POST", "/register", body=body)
+    assert status == HTTPStatus.BAD_REQUEST
+    assert payload['error']
+
+
+def test_bad_booking_requests_are_400(server):
+    token = login(server)
+    day = (date.today() + timedelta(days=1)).isoformat()
+    for data in ({"appointment_date": day, "services": ["Eye Check-up"]},
+                 {"appointment_date": day, "services": {"Eye Check-up": 20}},
+                 {"appointment_date": "someday", "services": {"Eye Check-up": 1}},
+                 {"appointment_date": day, "services": {"Eye Check-up": 1}, "slot": "03:00"}):
+        assert request(server, "POST", "/bookings", data, token)[0] == HTTPStatus.BAD_REQUEST, data
+
+
+def test_routing_errors(server):
+    assert request(server, "GET", "/bookings")[0] == HTTPStatus.UNAUTHORIZED
+    assert request(server, "GET", "/bookings", token="expired")[0] == HTTPStatus.UNAUTHORIZED
+    assert request(server, "GET", "/register")[0] == HTTPStatus.METHOD_NOT_ALLOWED
+    assert request(server, "GET", "/nowhere")[0] == HTTPStatus.NOT_FOUND
+
+
+def test_request_framing(server):
+    def read(raw):
+        async def run():
+            reader = asyncio.StreamReader()
+            reader.feed_data(raw)
+            reader.feed_eof()
+            return await server.read_request(reader)
+        try:
+            return asyncio.run(run())
+        except HTTPError as e:
+            return e.status
+
+    assert read(b"GET /services HTTP/1.1\r\nHost: x\r\n\r\n") == ("GET", "/services", {"host": "x"}, b'')
+    assert read(b"POST /login?x=1 HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}") == (
+        "POST", "/login", {"content-length": "2"}, b'{}')
+    assert read(b"garbage\r\n\r\n") == HTTPStatus.BAD_REQUEST
+    assert read(b"POST /login HTTP/1.1\r\nContent-Length: x\r\n\r\n") == HTTPStatus.BAD_REQUEST
+    assert read(b"POST /login HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n") == HTTPStatus.REQUEST_ENTITY_TOO_LARGE
@@ -0,0 +1,75 @@
+import os
+
+import clinic_snapshot
+import clinic_storage
+
+
+SERVICES = [("Dental Cleaning", 1, 1000.0), ("Eye Check-up", 2, 2000.0)]
+
+
+def book(patient_name, appointment_date, slot=None):
+    return clinic_storage.save_booking(patient_name, appointment_date, SERVICES, 3000.0, slot=slot)
+
+
+def rebuild():
+    raise AssertionError("the snapshot should have been kept")
+
+
+def test_snapshot_round_trip(data_dir):
+    path = str(data_dir / "bookings.snap")
+    book("alice", "2030-01-02", "09:00")
+    book("bob", "01/03/30")
+    columns = clinic_snapshot.load_booking_columns(update=False, path=path)
+    clinic_snapshot.write_snapshot(columns, path)
+
+    restored = clinic_snapshot.read_snapshot(path)
+    assert list(restored.iter_bookings()) == list(columns.iter_bookings())
+    assert (restored.bookings_size, restored.cancellations_size) == (columns.bookings_size, columns.cancellations_size)
+    assert restored.bookings == 2 and len(restored) == 4
+    assert [b['appointment_date'] for b in restored.iter_bookings()] == ["2030-01-02", "2030-01-03"]
+
+
+def test_snapshot_catches_up_with_the_tail(data_dir, monkeypatch):
+    path = str(data_dir / "bookings.snap")
+    monkeypatch.setattr(clinic_snapshot, "SNAPSHOT_MIN_TAIL_BYTES", 0)
+    first = book("alice", "2030-01-02")
+    clinic_snapshot.load_booking_columns(path=path)
+    second = book("alice", "2030-01-03")
+    clinic_storage.save_cancellation_record("alice", first['booking_id'], "2030-01-02", first['services'], 3000.0)
+
+    columns = clinic_snapshot.load_booking_columns(update=False, path=path)
+    assert {b['booking_id']: b['status'] for b in columns.iter_bookings()} == {
+        first['booking_id']: "cancelled", second['booking_id']: "confirmed"}
+    assert columns.bookings_size == os.path.getsize(clinic_storage.BOOKINGS_FILE)
+    assert columns.cancellations_size == os.path.getsize(clinic_storage.CANCELLATIONS_FILE)
+
+
+def test_first_cancellation_keeps_the_snapshot(data_dir, monkeypatch):
+    path = str(data_dir / "bookings.snap")
+    monkeypatch.setattr(clinic_snapshot, "SNAPSHOT_MIN_TAIL_BYTES", 0)
+    booking = book("alice", "2030-01-02")
+    clinic_snapshot.load_booking_columns(path=path)
+    assert not os.path.exists(clinic_storage.CANCELLATIONS_FILE)
+    clinic_storage.save_cancellation_record("alice", booking['booking_id'], "2030-01-02", booking['services'],
+                                            3000.0)
+
+    monkeypatch.setattr(clinic_snapshot, "new_columns", rebuild)
+    columns = clinic_snapshot.load_booking_columns(update=False, path=path)
+    assert [b['status'] for b in columns.iter_bookings()] == ["cancelled"]
+
+
+def test_rewritten_file_invalidates_the_snapshot(data_dir, monkeypatch):
+    path = str(data_dir / "bookings.snap")
+    monkeypatch.setattr(clinic_snapshot, "SNAPSHOT_MIN_TAIL_BYTES", 0)
+    book("alice", "2030-01-02")
+    book("bob", "2030-01-03")
+    clinic_snapshot.load_booking_columns(path=path)
+
+    with open(clinic_storage.BOOKINGS_FILE, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    os.remove(clinic_storage.BOOKINGS_FILE)
+    with open(clinic_storage.BOOKINGS_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(lines[1:])
+
+    columns = clinic_snapshot.load_booking_columns(update=False, path=path)
+    assert [b['patient_name'] for b in columns.iter_bookings()] == ["bob"]
@@ -0,0 +1,81 @@
+import json
+from datetime import date, timedelta
+
+import clinic_stats
+import clinic_storage
+
+
+def write_lines(path, records):
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def test_duplicate_registration_keeps_the_password(sqlite_dir):
+    assert clinic_storage.save_user("alice", "first")
+    assert not clinic_storage.save_user("alice", "second")
+    assert clinic_storage.get_storage().load_users() == {"alice": "first"}
+
+
+def test_bookings_and_cancellations_round_trip(sqlite_dir):
+    booking = clinic_storage.save_booking("alice", "2030-01-02", [("Dental Cleaning", 2, 2000.0)], 2000.0,
+                                          slot="09:00")
+    bookings = clinic_storage.load_bookings_for_user("alice")
+    assert [b['booking_id'] for b in bookings] == [booking['booking_id']]
+    assert bookings[0]['services'] == [("Dental Cleaning", 2, 2000.0)]
+    assert bookings[0]['slot'] == "09:00"
+
+    clinic_storage.save_cancellation_record("alice", booking['booking_id'], "2030-01-02",
+                                            [("Dental Cleaning", 2, 2000.0)], 2000.0, "moved away")
+    assert clinic_storage.load_bookings_for_user("alice")[0]['status'] == "cancelled"
+
+
+def test_rejected_check_saves_nothing(sqlite_dir):
+    assert clinic_storage.save_booking("alice", "2030-01-02", [("Dental Cleaning", 1, 1000.0)], 1000.0,
+                                       check=lambda: False) is False
+    assert clinic_storage.load_bookings_for_user("alice") == []
+
+
+def test_import_matches_the_text_backend(data_dir):
+    legacy = {"patient_name": "alice", "appointment_date": "01/05/21",
+              "services": [{"service_name": "Eye Check-up", "quantity": 1, "subtotal": 1000.0}],
+              "total_amount": 1000.0, "created_at": "2021-01-01 10:00:00"}
+    write_lines(clinic_storage.USERS_FILE, [{"username": "alice", "password": "old"},
+                                            {"username": "alice", "password": "new"}])
+    write_lines(clinic_storage.BOOKINGS_FILE, [legacy])
+    clinic_storage.save_booking("alice", "2030-01-02", [("Dental Cleaning", 1, 1000.0)], 1000.0)
+    cancelled = clinic_storage.save_booking("alice", "2030-01-03", [("Physical Therapy", 1, 1500.0)], 1500.0)
+    clinic_storage.save_cancellation_record("alice", cancelled['booking_id'], "2030-01-03",
+                                            [("Physical Therapy", 1, 1500.0)], 1500.0)
+    text_bookings = clinic_storage.load_bookings_for_user("alice")
+    text_stats = clinic_stats.patient_stats("alice")
+
+    counts = clinic_storage.import_text_files_to_sqlite(clinic_storage.SQLITE_FILE)
+    assert counts == {"users": 2, "bookings": 3, "forgot_password": 0, "cancellations": 1}
+    clinic_storage.set_storage_backend("sqlite")
+
+    assert clinic_storage.get_storage().load_users() == {"alice": "new"}
+    sqlite_bookings = clinic_storage.load_bookings_for_user("alice")
+    assert ({b['booking_id']: b['status'] for b in sqlite_bookings}
+            == {b['booking_id']: b['status'] for b in text_bookings})
+    assert clinic_storage.booking_record_id(legacy) in {b['booking_id'] for b in sqlite_bookings}
+    sqlite_stats = clinic_stats.patient_stats("alice")
+    for key in ("total", "confirmed", "cancelled", "upcoming", "lifetime_spend", "last_visit"):
+        assert sqlite_stats[key] == text_stats[key], key
+
+
+def test_stats_are_aggregated_per_status(sqlite_dir):
+    past, future = date.today() - timedelta(days=10), date.today() + timedelta(days=10)
+    clinic_storage.save_booking("alice", past.isoformat(), [("Dental Cleaning", 1, 1000.0)], 1000.0)
+    clinic_storage.save_booking("alice", future.strftime('%m/%d/%y'), [("Eye Check-up", 1, 1000.0)], 1000.0)
+    cancelled = clinic_storage.save_booking("alice", future.isoformat(), [("Physical Therapy", 1, 1500.0)], 1500.0)
+    clinic_storage.save_cancellation_record("alice", cancelled['booking_id'], future.isoformat(),
+                                            [("Physical Therapy", 1, 1500.0)], 1500.0)
+
+    stats = clinic_stats.patient_stats("alice")
+    assert stats['total'] == 3
+    assert stats['by_status'] == {"confirmed": 2, "cancelled": 1}
+    assert stats['upcoming'] == 1
+    assert stats['lifetime_spend'] == 2000.0
+    assert stats['last_visit'] == past.isoformat()
+    assert clinic_stats.all_patient_stats().keys() == {"alice"}
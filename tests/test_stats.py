@@ -0,0 +1,74 @@
+import os
+from datetime import date, timedelta
+
+import clinic_stats
+import clinic_storage
+
+
+def book(patient_name, day, amount=1000.0):
+    return clinic_storage.save_booking(patient_name, day.isoformat(), [("Dental Cleaning", 1, amount)], amount)
+
+
+def test_stats_follow_bookings_and_cancellations(data_dir):
+    past, future = date.today() - timedelta(days=3), date.today() + timedelta(days=3)
+    book("alice", past)
+    upcoming = book("alice", future, 1500.0)
+    book("bob", future)
+
+    stats = clinic_stats.patient_stats("alice")
+    assert (stats['total'], stats['confirmed'], stats['upcoming']) == (2, 2, 1)
+    assert stats['lifetime_spend'] == 2500.0
+    assert stats['last_visit'] == past.isoformat()
+
+    clinic_storage.save_cancellation_record("alice", upcoming['booking_id'], future.isoformat(),
+                                            [("Dental Cleaning", 1, 1500.0)], 1500.0)
+    stats = clinic_stats.patient_stats("alice")
+    assert (stats['total'], stats['confirmed'], stats['cancelled'], stats['upcoming']) == (2, 1, 1, 0)
+    assert stats['lifetime_spend'] == 1000.0
+    assert clinic_stats.all_patient_stats().keys() == {"alice", "bob"}
+
+
+def test_first_cancellation_does_not_rebuild(data_dir, monkeypatch):
+    booking = book("alice", date.today() + timedelta(days=1))
+    table = clinic_stats.stats_table
+    table.catch_up()
+    loads = []
+    monkeypatch.setattr(table, "load", lambda: loads.append(True))
+
+    clinic_storage.save_cancellation_record("alice", booking['booking_id'], booking['appointment_date'],
+                                            booking['services'], booking['total_amount'])
+    assert clinic_stats.patient_stats("alice")['cancelled'] == 1
+    assert loads == []
+    assert table.cancellations_size == os.path.getsize(clinic_storage.CANCELLATIONS_FILE)
+
+
+def test_saved_table_is_restored_and_caught_up(data_dir, monkeypatch):
+    book("alice", date.today() + timedelta(days=1))
+    assert clinic_stats.patient_stats("alice")['total'] == 1
+    clinic_stats.stats_table.save()
+    book("alice", date.today() + timedelta(days=2))
+
+    def rebuild(name):
+        raise AssertionError("the saved table should have been restored")
+
+    restored = clinic_stats.PatientStatsTable(clinic_stats.stats_table.path)
+    with monkeypatch.context() as patch:
+        patch.setattr(clinic_storage, "iter_archived_records", rebuild)
+        restored.load()
+    assert restored.bookings_size == os.path.getsize(clinic_storage.BOOKINGS_FILE)
+    assert restored.get("alice")['total'] == 2
+    assert restored.get("alice") == clinic_stats.stats_table.get("alice")
+
+
+def test_rewritten_bookings_file_triggers_a_rebuild(data_dir):
+    book("alice", date.today() + timedelta(days=1))
+    book("bob", date.today() + timedelta(days=1))
+    assert clinic_stats.patient_stats("alice")['total'] == 1
+
+    with open(clinic_storage.BOOKINGS_FILE, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    os.remove(clinic_storage.BOOKINGS_FILE)
+    with open(clinic_storage.BOOKINGS_FILE, 'w', encoding='utf-8') as f:
+        f.writelines(lines[1:])
+    assert clinic_stats.patient_stats("alice")['total'] == 0
+    assert clinic_stats.patient_stats("bob")['total'] == 1
@@ -0,0 +1,51 @@
+import os
+
+import clinic_storage
+import clinic_users
+
+
+def test_lookups_follow_registrations_and_password_changes(data_dir):
+    directory = clinic_users.user_directory
+    for n in range(50):
+        clinic_storage.save_user(f"user{n}", f"password{n}")
+    assert directory.password_for("user7") == "password7"
+    assert directory.password_for("nobody") is None
+    assert len(directory) == 50
+
+    clinic_storage.save_user("late", "secret")
+    clinic_storage.update_user_password("user7", "changed")
+    assert directory.password_for("late") == "secret"
+    assert directory.password_for("user7") == "changed"
+    assert len(directory) == 51
+
+
+def test_index_is_reused_and_rebuilt_when_stale(data_dir):
+    clinic_storage.save_user("alice", "first")
+    clinic_storage.save_user("bob", "second")
+    clinic_users.user_directory.rebuild()
+    assert os.path.exists(clinic_users.user_directory.path)
+
+    reopened = clinic_users.UserDirectory(clinic_users.user_directory.path)
+    assert reopened._read_index()
+    assert reopened.password_for("bob") == "second"
+
+    clinic_storage.update_user_password("alice", "third")
+    clinic_storage.compact_users_file()
+    assert reopened.password_for("alice") == "third"
+    assert reopened.password_for("bob") == "second"
+
+
+def test_bloom_filter_rules_out_unknown_users(data_dir, monkeypatch):
+    for n in range(200):
+        clinic_storage.save_user(f"user{n}", "secret")
+    directory = clinic_users.user_directory
+    directory.rebuild()
+
+    reads = []
+    monkeypatch.setattr(directory, "_indexed_offsets", lambda *args: reads.append(args) or [])
+    misses = sum(directory.password_for(f"stranger{n}") is None for n in range(1000))
+    assert misses == 1000
+    assert len(reads) < 50
+    for n in range(200):
+        h1, h2 = clinic_users._user_hash(f"user{n}")
+        assert directory._might_contain(h1, h2)